@@ -1,7 +1,17 @@
-const users = {
-  "doc123": { password: "admin123", name: "Dr. Juan Pérez", type: "staff" },
-  "doc456": { password: "admin456", name: "Dra. María Gómez", type: "staff" }
-};
+// Servido por el backend (python "proyecto 1.2.py" --servidor) o abierto como archivo
+const API = location.protocol === "file:" ? "http://127.0.0.1:8080" : "";
+
+async function api(method, path, body) {
+  const sesion = JSON.parse(localStorage.getItem("sesion") || "null");
+  const headers = { "Content-Type": "application/json" };
+  if (sesion) headers["Authorization"] = `Bearer ${sesion.token}`;
+  const res = await fetch(API + path, {
+    method,
+    headers,
+    body: body ? JSON.stringify(body) : undefined
+  });
+  return { status: res.status, data: res.status === 204 ? null : await res.json() };
+}
 
 function toggleForm() {
   const type = document.getElementById("user-type").value;
@@ -24,57 +34,60 @@ function showLogin() {
   document.getElementById("login-form").style.display = "block";
 }
 
-function register() {
+async function register() {
   const name = document.getElementById("name").value.trim();
-  const userId = prompt("Ingrese documento (mínimo 8 caracteres):");
-  const password = prompt("Ingrese una contraseña:");
+  const userId = prompt("Ingrese documento (mínimo 8 caracteres):") || "";
+  const password = prompt("Ingrese una contraseña:") || "";
 
   if (userId.length < 8 || !password || !name) {
     showMessage("Todos los campos son obligatorios y el documento debe tener al menos 8 caracteres", true);
     return;
   }
 
-  if (users[userId]) {
-    showMessage("El ID ya existe", true);
-    return;
+  try {
+    const { data } = await api("POST", "/api/registro", { user_id: userId, password, name });
+    showMessage(data.message, !data.ok);
+    if (data.ok) showLogin();
+  } catch (e) {
+    showMessage("No se pudo contactar al servidor", true);
   }
-
-  users[userId] = { password, name, type: "patient" };
-  showMessage("Registro exitoso");
-  showLogin();
 }
 
-function login() {
+async function login() {
   const userId = document.getElementById("user-id").value.trim();
   const password = document.getElementById("password").value;
+  const staff = document.getElementById("user-type").value === "staff";
 
   if (!userId || !password) {
     showMessage("Complete todos los campos", true);
     return;
   }
 
-  const user = users[userId];
-  if (!user || user.password !== password) {
-    showMessage("Credenciales inválidas", true);
+  let data;
+  try {
+    ({ data } = await api("POST", "/api/login", { user_id: userId, password, staff }));
+  } catch (e) {
+    showMessage("No se pudo contactar al servidor", true);
     return;
   }
-  // Guardar en localStorage
-  localStorage.setItem("usuarioLogueado", JSON.stringify({ ...user, user_id: userId }));
+  if (!data.ok) {
+    showMessage(data.message, true);
+    return;
+  }
+  // Guardar la sesión en localStorage
+  localStorage.setItem("sesion", JSON.stringify({ token: data.token, staff: data.staff, ...data.user }));
+  showMessage(`Bienvenido, ${data.user.name}`, false);
 
   // Redireccionar según tipo
-  if (user.type === "patient") {
+  if (!data.staff) {
     window.location.href = "paciente.html";
   } else {
     alert("Interfaz de staff aún no implementada.");
   }
 }
-  showMessage(`Bienvenido, ${user.name}`, false);
-
 
 function showMessage(msg, isError = false) {
   const el = document.getElementById("message");
   el.textContent = msg;
   el.style.color = isError ? "red" : "green";
 }
-
-
@@ -1,7 +1,8 @@
-const turnos = JSON.parse(localStorage.getItem("turnos")) || [];
+// Servido por el backend (python "proyecto 1.2.py" --servidor) o abierto como archivo
+const API = location.protocol === "file:" ? "http://127.0.0.1:8080" : "";
 
-const user = JSON.parse(localStorage.getItem("usuarioLogueado"));
-if (!user || user.type !== "patient") {
+const user = JSON.parse(localStorage.getItem("sesion") || "null");
+if (!user || user.staff) {
   alert("Acceso denegado");
   location.href = "index.html";
 }
@@ -9,60 +10,90 @@ if (!user || user.type !== "patient") {
 document.getElementById("nombre-usuario").textContent = user.name;
 document.getElementById("doc-usuario").textContent = user.user_id;
 
-function solicitarTurno() {
-  const prioridad = parseInt(document.getElementById("prioridad").value);
-  const ahora = new Date().toISOString();
+// La cola se pide con If-None-Match: si no cambió el servidor responde 304
+let etag = null;
 
-  // Evitar duplicados
-  if (turnos.some(t => t.patient_id === user.user_id)) {
-    alert("Ya tiene un turno en espera");
-    return;
+async function api(method, path, body) {
+  const res = await fetch(API + path, {
+    method,
+    headers: { "Content-Type": "application/json", "Authorization": `Bearer ${user.token}` },
+    body: body ? JSON.stringify(body) : undefined
+  });
+  if (res.status === 401) {
+    logout();
   }
+  return { status: res.status, data: res.status === 204 ? null : await res.json() };
+}
 
-  turnos.push({
-    patient_id: user.user_id,
-    name: user.name,
-    prioridad,
-    timestamp: ahora
-  });
+async function solicitarTurno() {
+  const priority = parseInt(document.getElementById("prioridad").value);
+  const { data } = await api("POST", "/api/turnos", { priority });
+  if (!data.patient_id) {
+    alert(data.message);
+  }
+}
 
-  localStorage.setItem("turnos", JSON.stringify(turnos));
-  mostrarTurnos();
+async function cancelarTurno() {
+  const { status, data } = await api("DELETE", `/api/turnos/${encodeURIComponent(user.user_id)}`);
+  if (status !== 204) {
+    alert(data.message);
+  }
 }
 
-function mostrarTurnos() {
+async function mostrarTurnos() {
+  const res = await fetch(`${API}/api/cola`, { headers: etag ? { "If-None-Match": etag } : {} });
+  if (res.status === 304) return;
+  etag = res.headers.get("ETag");
+  const cola = await res.json();
+
   const cuerpo = document.getElementById("tabla-turnos");
   cuerpo.innerHTML = "";
-
-  const ordenados = [...turnos].sort((a, b) => {
-    if (a.prioridad !== b.prioridad) return a.prioridad - b.prioridad;
-    return new Date(a.timestamp) - new Date(b.timestamp);
-  });
-
-  for (const turno of ordenados) {
+  for (const turno of cola.rows) {
     const fila = document.createElement("tr");
-    fila.innerHTML = `
-      <td>${turno.patient_id}</td>
-      <td>${turno.name}</td>
-      <td>${nombrePrioridad(turno.prioridad)}</td>
-      <td>${new Date(turno.timestamp).toLocaleTimeString()}</td>
-    `;
+    for (const valor of [turno.patient_id, turno.name, nombrePrioridad(turno.priority), turno.specialty, turno.timestamp.slice(11)]) {
+      const celda = document.createElement("td");
+      celda.textContent = valor;
+      fila.appendChild(celda);
+    }
     cuerpo.appendChild(fila);
   }
 }
 
+async function mostrarMiTurno() {
+  const res = await fetch(`${API}/api/turnos/${encodeURIComponent(user.user_id)}`, {
+    headers: { "Authorization": `Bearer ${user.token}` }
+  });
+  const estado = document.getElementById("mi-turno");
+  if (res.status !== 200) {
+    estado.textContent = "Sin turno en espera";
+    return;
+  }
+  const turno = await res.json();
+  estado.textContent = `Su posición: ${turno.position + 1} de ${turno.size} | ` +
+    `Espera estimada: ~${Math.round(turno.estimated_wait / 60)} min`;
+}
+
 function nombrePrioridad(p) {
   switch (p) {
-    case 1: return "Crítico";
-    case 2: return "Urgente";
-    case 3: return "Regular";
+    case "CRITICAL": return "Crítico";
+    case "URGENT": return "Urgente";
+    case "REGULAR": return "Regular";
     default: return "-";
   }
 }
 
 function logout() {
-  localStorage.removeItem("usuarioLogueado");
+  fetch(`${API}/api/logout`, { method: "POST", headers: { "Authorization": `Bearer ${user.token}` } });
+  localStorage.removeItem("sesion");
   location.href = "index.html";
 }
 
-mostrarTurnos();
+function actualizar() {
+  mostrarTurnos();
+  mostrarMiTurno();
+}
+
+// El servidor avisa cada cambio de la cola (Server-Sent Events); el
+// navegador reconecta solo si se corta
+const eventos = new EventSource(`${API}/api/eventos`);
+eventos.addEventListener("changed", actualizar);
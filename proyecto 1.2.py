@@ -1,16 +1,71 @@
+import array
+import asyncio
+import gc
+import gzip
+import hashlib
 import heapq
+import hmac
+import itertools
+import secrets
+import socket
+import struct
+import sys
+import threading
+import time
+import unicodedata
+import urllib.parse
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from bisect import bisect_left, insort
+from operator import attrgetter, itemgetter
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Iterable, Optional, Tuple
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
 import json
 import os
+import queue as queue_module
+import sqlite3
 
 # --- Constantes ---
 USER_DB_FILE = "users.json"
 STAFF_DB_FILE = "staff.json"
+AUTH_DB_FILE = "usuarios.db"
+USER_STORE_BACKEND = "sqlite"  # "sqlite" o "json"
+PASSWORD_HASH_ITERATIONS = 200000
+AUTH_WORKERS = min(4, os.cpu_count() or 1)
+AUTH_MAX_PENDING = 32
+CHANGE_LOG_SIZE = 10000
+QUEUE_SERVER_HOST = "127.0.0.1"
+QUEUE_SERVER_PORT = 8765
+QUEUE_CLIENT_TIMEOUT = 5.0
+QUEUE_WAL_FILE = "cola.wal"
+QUEUE_SNAPSHOT_FILE = "cola.snap"
+GROUP_COMMIT_INTERVAL = 0.005
+SNAPSHOT_EVERY = 50000
+HTTP_HOST = "127.0.0.1"  # "0.0.0.0" para kioscos en otras máquinas
+HTTP_PORT = 8080
+HTTP_STATIC_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "intento de html y css - No tiene interfaz de medico ni se guardan los datos}"
+)
+HTTP_MAX_BODY = 64 * 1024
+HTTP_GZIP_MIN_BYTES = 1024
+HTTP_GZIP_LEVEL = 5
+SSE_HEARTBEAT_SECONDS = 15
+SCHEDULING_POLICY = "estricta"  # "estricta", "envejecimiento", "sla" o "wfq"
+GENERAL_SPECIALTY = "Guardia"
+SPECIALTIES = [GENERAL_SPECIALTY, "Cardiología", "Urología"]
+# Rol del personal (normalizado, sin tildes) -> especialidad que atiende
+ROLE_SPECIALTIES = {
+    "cardiologo": "Cardiología",
+    "cardiologa": "Cardiología",
+    "urologo": "Urología",
+    "urologa": "Urología"
+}
 
 # --- Backend ---
 
@@ -29,111 +84,2827 @@ class PatientStatus(Enum):
     COMPLETED = "Atendido"
     CANCELLED = "Cancelado"
 
-@dataclass(order=True)
+class QueueEvent(Enum):
+    ENQUEUED = "enqueued"
+    DISPATCHED = "dispatched"
+    CANCELLED = "cancelled"
+    REPRIORITIZED = "reprioritized"
+
+# slots=True: sin __dict__ por instancia. Medido con benchmark_turn_memory()
+# (ids de 8 caracteres, nombres cortos, CPython 3.11): ~286 bytes por registro
+# contra ~296 con __dict__, y ~489 contra ~498 por turno en HospitalQueue; un
+# ahorro de ~3%, porque 3.11 ya guarda los atributos sin un dict propio
+# mientras nadie lo pida. La cola original (tuplas (prioridad, float, turno)
+# y un índice de pacientes) ocupaba ~430 por turno: la diferencia son las
+# posiciones del heap y las vistas ordenadas, no el registro.
+@dataclass(order=True, slots=True)
 class MedicalTurn:
     patient_id: str
     name: str
     priority: PriorityLevel
     status: PatientStatus = PatientStatus.PENDING
     timestamp: datetime = field(default_factory=datetime.now)
+    specialty: str = GENERAL_SPECIALTY
     
     def __post_init__(self):
         if not isinstance(self.priority, PriorityLevel):
             raise ValueError("Prioridad debe ser instancia de PriorityLevel")
         if len(self.patient_id) < 8:
             raise ValueError("ID de paciente debe tener al menos 8 caracteres")
+        # Los ids se repiten como claves en varios índices: una sola copia
+        self.patient_id = sys.intern(self.patient_id)
+    
+    def to_dict(self) -> Dict:
+        return {
+            "patient_id": self.patient_id,
+            "name": self.name,
+            "priority": self.priority.name,
+            "status": self.status.name,
+            "timestamp": self.timestamp.timestamp(),
+            "specialty": self.specialty
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MedicalTurn":
+        return cls(
+            patient_id=data["patient_id"],
+            name=data["name"],
+            priority=PriorityLevel[data["priority"]],
+            status=PatientStatus[data["status"]],
+            timestamp=datetime.fromtimestamp(data["timestamp"]),
+            specialty=data.get("specialty", GENERAL_SPECIALTY)
+        )
+
+def specialty_for_role(role: Optional[str]) -> str:
+    normalized = unicodedata.normalize("NFKD", role or "").encode("ascii", "ignore").decode().lower().strip()
+    return ROLE_SPECIALTIES.get(normalized, GENERAL_SPECIALTY)
+
+class SortedEntryList:
+    # Lista ordenada por bloques: cada bloque es una lista ordenada corta y
+    # _maxes guarda el máximo de cada bloque para ubicar con bisect.
+    # Insertar y borrar cuesta O(log n) más un memmove acotado por _LOAD.
+    # Un árbol de Fenwick sobre los largos de bloque resuelve rank() y el
+    # inicio de islice() en O(log n); se reconstruye solo cuando cambia la
+    # cantidad de bloques.
+    _LOAD = 500
+    
+    def __init__(self):
+        self._lists = []
+        self._maxes = []
+        self._len = 0
+        self._index = None
+    
+    def add(self, entry) -> None:
+        if not self._maxes:
+            self._lists.append([entry])
+            self._maxes.append(entry)
+            self._index = None
+        else:
+            index = bisect_left(self._maxes, entry)
+            if index == len(self._maxes):
+                index -= 1
+                self._lists[index].append(entry)
+                self._maxes[index] = entry
+            else:
+                insort(self._lists[index], entry)
+            
+            if len(self._lists[index]) > 2 * self._LOAD:
+                self._split(index)
+            else:
+                self._update_index(index, 1)
+        self._len += 1
+    
+    def remove(self, entry) -> None:
+        index = bisect_left(self._maxes, entry)
+        block = self._lists[index]
+        position = bisect_left(block, entry)
+        del block[position]
+        self._len -= 1
+        
+        if not block:
+            del self._lists[index]
+            del self._maxes[index]
+            self._index = None
+        else:
+            self._update_index(index, -1)
+            if position == len(block):
+                self._maxes[index] = block[-1]
+    
+    def rank(self, entry) -> int:
+        # Cantidad de elementos menores que entry (esté o no en la lista)
+        block_index = bisect_left(self._maxes, entry)
+        offset = self._prefix(block_index)
+        if block_index == len(self._lists):
+            return offset
+        return offset + bisect_left(self._lists[block_index], entry)
+    
+    def islice(self, start: int = 0, stop: Optional[int] = None):
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return
+        block_index, offset = self._locate(start)
+        remaining = stop - start
+        for block in itertools.islice(self._lists, block_index, None):
+            chunk = block[offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            if remaining <= 0:
+                return
+            offset = 0
+    
+    def __len__(self) -> int:
+        return self._len
+    
+    def load_sorted(self, entries: List) -> None:
+        self._lists = [entries[i:i + self._LOAD] for i in range(0, len(entries), self._LOAD)]
+        self._maxes = [block[-1] for block in self._lists]
+        self._len = len(entries)
+        self._index = None
+    
+    def _split(self, index: int) -> None:
+        block = self._lists[index]
+        half = block[self._LOAD:]
+        del block[self._LOAD:]
+        self._lists.insert(index + 1, half)
+        self._maxes[index] = block[-1]
+        self._maxes.insert(index + 1, half[-1])
+        self._index = None
+    
+    # --- Árbol de Fenwick sobre los largos de bloque ---
+    
+    def _build_index(self) -> List[int]:
+        size = len(self._lists)
+        tree = [0] * (size + 1)
+        for i, block in enumerate(self._lists, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._index = tree
+        return tree
+    
+    def _update_index(self, block_index: int, delta: int) -> None:
+        tree = self._index
+        if tree is None:
+            return
+        i = block_index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+    
+    def _prefix(self, block_index: int) -> int:
+        # Elementos en los bloques [0, block_index)
+        tree = self._index if self._index is not None else self._build_index()
+        total = 0
+        while block_index > 0:
+            total += tree[block_index]
+            block_index -= block_index & -block_index
+        return total
+    
+    def _locate(self, position: int) -> Tuple[int, int]:
+        # (bloque, desplazamiento) del elemento en la posición dada
+        tree = self._index if self._index is not None else self._build_index()
+        block_index = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            candidate = block_index + step
+            if candidate < len(tree) and tree[candidate] <= position:
+                block_index = candidate
+                position -= tree[candidate]
+            step >>= 1
+        return block_index, position
+
+class QueueJournal:
+    # WAL binario de solo-agregado con commit agrupado: las operaciones se
+    # acumulan en memoria y un hilo las escribe y hace un único fsync cada
+    # commit_interval segundos. Cada snap_every registros se escribe un
+    # snapshot compacto de la cola y se trunca el WAL. El snapshot es por
+    # columnas (claves, niveles, timestamps, ids, nombres, especialidades) y
+    # guarda la clave de cada turno: al recuperar no se recalculan claves ni
+    # se ordena, y cada columna se decodifica de una vez en C. Recuperar 100k
+    # turnos lleva ~0,4 s (antes ~0,9 s, CPython 3.11); lo que queda es crear
+    # un MedicalTurn y su fecha por turno, así que mientras la cola guarde
+    # objetos el objetivo real es bajo el segundo, no milisegundos.
+    OP_ADD = 1
+    OP_NEXT = 2
+    OP_CANCEL = 3
+    OP_PRIORITY = 4
+    # Altas y reclasificaciones con la clave del turno delante, como en el
+    # snapshot. OP_ADD y OP_PRIORITY (sin clave) quedan de WAL anteriores
+    OP_ADD_KEYED = 5
+    OP_PRIORITY_KEYED = 6
+    
+    _HEADER = struct.Struct("<BII")     # operación, largo, crc32
+    _ADD = struct.Struct("<BdHH")       # prioridad, timestamp, largo del id y de la especialidad
+    _LENGTH = struct.Struct("<I")
+    _SNAPSHOT_MAGIC = b"HQSNAP3\n"
+    _SNAPSHOT_MAGIC_V2 = b"HQSNAP2\n"  # registros ADD sin clave
+    _SNAPSHOT_COLUMNS = 7
+    _KEY = struct.Struct("<16s")        # claves de hasta 128 bits, little endian
+    _LEVELS = {level.value: level for level in PriorityLevel}
+    
+    def __init__(self, wal_file: str = QUEUE_WAL_FILE, snapshot_file: str = QUEUE_SNAPSHOT_FILE,
+                 commit_interval: float = GROUP_COMMIT_INTERVAL, snapshot_every: int = SNAPSHOT_EVERY):
+        self.wal_file = wal_file
+        self.snapshot_file = snapshot_file
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every
+        
+        self._file = None
+        self._buffer = bytearray()
+        self._waiters = []
+        self._records = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._flusher = None
+    
+    def load(self) -> List[Tuple[Optional[int], MedicalTurn]]:
+        # Devuelve (clave, turno) en el orden del snapshot seguido de las
+        # altas del WAL. La clave es None si hay que calcularla: registros y
+        # snapshots escritos por versiones que no la guardaban.
+        patients = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, "rb") as f:
+                data = f.read()
+            # Se crean cientos de miles de objetos de una vez: el recolector
+            # de ciclos no encontraría nada y solo agregaría pasadas
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                if data.startswith(self._SNAPSHOT_MAGIC):
+                    patients = self._decode_snapshot(data)
+                elif data.startswith(self._SNAPSHOT_MAGIC_V2):
+                    offset = len(self._SNAPSHOT_MAGIC_V2)
+                    while offset < len(data):
+                        (length,) = self._LENGTH.unpack_from(data, offset)
+                        offset += self._LENGTH.size
+                        patient = self._decode_add(data[offset:offset + length])
+                        patients[patient.patient_id] = (None, patient)
+                        offset += length
+            finally:
+                if collecting:
+                    gc.enable()
+        
+        valid_size = 0
+        if os.path.exists(self.wal_file):
+            with open(self.wal_file, "rb") as f:
+                data = f.read()
+            valid_size = self._replay(data, patients)
+        
+        # Se descarta un registro final incompleto (caída a mitad de escritura)
+        self._file = open(self.wal_file, "ab")
+        self._file.truncate(valid_size)
+        self._records = 0
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        return list(patients.values())
+    
+    def append_add(self, patient: MedicalTurn, key: int) -> None:
+        self._append(self.OP_ADD_KEYED, key.to_bytes(self._KEY.size, "little") + self._encode_add(patient))
+    
+    def append_remove(self, op: int, patient_id: str) -> None:
+        self._append(op, patient_id.encode())
+    
+    def append_priority(self, patient_id: str, level: PriorityLevel, key: int) -> None:
+        self._append(
+            self.OP_PRIORITY_KEYED,
+            key.to_bytes(self._KEY.size, "little") + bytes([level.value]) + patient_id.encode()
+        )
+    
+    def durable(self) -> Future:
+        # Future que se resuelve cuando todo lo agregado hasta ahora está en disco
+        future = Future()
+        with self._cond:
+            if not self._buffer:
+                future.set_result(None)
+            else:
+                self._waiters.append(future)
+        return future
+    
+    def snapshot_due(self) -> bool:
+        return self._records >= self.snapshot_every
+    
+    def write_snapshot(self, entries: Iterable[Tuple[int, MedicalTurn]]) -> None:
+        # El snapshot refleja todas las operaciones agregadas, así que el
+        # buffer pendiente se descarta y el WAL se trunca
+        entries = list(entries)
+        patients = [entry[1] for entry in entries]
+        specialties = {}
+        columns = [
+            b"".join(entry[0].to_bytes(self._KEY.size, "little") for entry in entries),
+            bytes(patient.priority.value for patient in patients),
+            array.array("d", (patient.timestamp.timestamp() for patient in patients)).tobytes(),
+            "\0".join(patient.patient_id for patient in patients).encode(),
+            "\0".join(patient.name.replace("\0", "") for patient in patients).encode(),
+            array.array("H", (specialties.setdefault(p.specialty, len(specialties)) for p in patients)).tobytes(),
+            "\0".join(specialties).encode()
+        ]
+        parts = [self._SNAPSHOT_MAGIC, self._LENGTH.pack(len(entries))]
+        for column in columns:
+            parts.append(self._LENGTH.pack(len(column)))
+            parts.append(column)
+        
+        with self._io_lock:
+            temp_file = self.snapshot_file + ".tmp"
+            with open(temp_file, "wb") as f:
+                f.write(b"".join(parts))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.snapshot_file)
+            
+            with self._cond:
+                self._buffer.clear()
+                waiters, self._waiters = self._waiters, []
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._records = 0
+        
+        for future in waiters:
+            future.set_result(None)
+    
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._flusher:
+            self._flusher.join()
+        if self._file:
+            self._file.close()
+    
+    def _append(self, op: int, payload: bytes) -> None:
+        record = self._HEADER.pack(op, len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            self._buffer += record
+            self._cond.notify()
+        self._records += 1
+    
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._buffer:
+                    return
+            
+            # Se espera un intervalo corto para agrupar más escrituras en un fsync
+            if not self._closed:
+                time.sleep(self.commit_interval)
+            
+            with self._io_lock:
+                with self._cond:
+                    data = bytes(self._buffer)
+                    self._buffer.clear()
+                    waiters, self._waiters = self._waiters, []
+                if data:
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+            
+            for future in waiters:
+                future.set_result(None)
+    
+    def _decode_snapshot(self, data: bytes) -> Dict[str, Tuple[Optional[int], MedicalTurn]]:
+        offset = len(self._SNAPSHOT_MAGIC)
+        (count,) = self._LENGTH.unpack_from(data, offset)
+        offset += self._LENGTH.size
+        columns = []
+        for _ in range(self._SNAPSHOT_COLUMNS):
+            (length,) = self._LENGTH.unpack_from(data, offset)
+            offset += self._LENGTH.size
+            columns.append(data[offset:offset + length])
+            offset += length
+        if not count:
+            return {}
+        keys, levels, timestamps, ids, names, specialty_index, specialty_names = columns
+        
+        specialty_names = specialty_names.decode().split("\0")
+        patients = list(map(
+            MedicalTurn,
+            ids.decode().split("\0"),
+            names.decode().split("\0"),
+            map(self._LEVELS.__getitem__, levels),
+            itertools.repeat(PatientStatus.PENDING),
+            map(datetime.fromtimestamp, array.array("d", timestamps)),
+            map(specialty_names.__getitem__, array.array("H", specialty_index))
+        ))
+        keys = map(int.from_bytes, map(itemgetter(0), self._KEY.iter_unpack(keys)), itertools.repeat("little"))
+        # Los ids de los turnos ya están internados (__post_init__)
+        return dict(zip(map(attrgetter("patient_id"), patients), zip(keys, patients)))
+    
+    def _replay(self, data: bytes, patients: Dict[str, Tuple[Optional[int], MedicalTurn]]) -> int:
+        offset = 0
+        while offset + self._HEADER.size <= len(data):
+            op, length, checksum = self._HEADER.unpack_from(data, offset)
+            start = offset + self._HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            
+            key = None
+            if op in (self.OP_ADD_KEYED, self.OP_PRIORITY_KEYED):
+                key = int.from_bytes(payload[:self._KEY.size], "little")
+                payload = payload[self._KEY.size:]
+            if op in (self.OP_ADD, self.OP_ADD_KEYED):
+                patient = self._decode_add(payload)
+                patients[patient.patient_id] = (key, patient)
+            elif op in (self.OP_NEXT, self.OP_CANCEL):
+                patients.pop(payload.decode(), None)
+            elif op in (self.OP_PRIORITY, self.OP_PRIORITY_KEYED):
+                item = patients.get(payload[1:].decode())
+                if item:
+                    # Sin clave en el registro, se recalcula al cargar
+                    item[1].priority = self._LEVELS[payload[0]]
+                    patients[item[1].patient_id] = (key, item[1])
+            offset = start + length
+        return offset
+    
+    def _encode_add(self, patient: MedicalTurn) -> bytes:
+        patient_id = patient.patient_id.encode()
+        specialty = patient.specialty.encode()
+        return (
+            self._ADD.pack(patient.priority.value, patient.timestamp.timestamp(), len(patient_id), len(specialty))
+            + patient_id
+            + specialty
+            + patient.name.encode()
+        )
+    
+    def _decode_add(self, payload: bytes) -> MedicalTurn:
+        priority, timestamp, id_length, specialty_length = self._ADD.unpack_from(payload)
+        start = self._ADD.size
+        name_start = start + id_length + specialty_length
+        return MedicalTurn(
+            payload[start:start + id_length].decode(),
+            payload[name_start:].decode(),
+            self._LEVELS[priority],
+            PatientStatus.PENDING,
+            datetime.fromtimestamp(timestamp),
+            payload[start + id_length:name_start].decode()
+        )
+
+class SchedulingPolicy:
+    # Una política traduce cada turno en una clave entera fija, calculada al
+    # encolar o reclasificar: el paso del tiempo nunca obliga a re-ordenar el
+    # heap y despachar sigue siendo O(log n). La cola agrega en los bits bajos
+    # una secuencia de desempate.
+    SEQ_BITS = 32
+    name = ""
+    
+    def key(self, patient: MedicalTurn, seq: int) -> int:
+        # Una vez por turno encolado
+        return (self.rank(patient) << self.SEQ_BITS) | seq
+    
+    def rekey(self, patient: MedicalTurn, key: int, previous: PriorityLevel) -> int:
+        # Reclasificación: misma secuencia, rango del nuevo nivel. Las
+        # políticas con estado la redefinen para no avanzarlo
+        return self.key(patient, key & ((1 << self.SEQ_BITS) - 1))
+    
+    def rank(self, patient: MedicalTurn) -> int:
+        raise NotImplementedError
+    
+    def on_dispatch(self, key: int) -> None:
+        pass
+    
+    def on_load(self, entries: List[Tuple[int, MedicalTurn]]) -> None:
+        # Turnos recuperados con la clave que tenían; las políticas con estado
+        # lo reconstruyen a partir de ellas
+        pass
+    
+    @staticmethod
+    def _microseconds(timestamp: datetime) -> int:
+        return round(timestamp.timestamp() * 1000000)
+
+class StrictPriorityPolicy(SchedulingPolicy):
+    # (prioridad, hora de registro): un REGULAR espera mientras haya
+    # cualquier CRITICAL o URGENT en cola
+    name = "estricta"
+    
+    def rank(self, patient: MedicalTurn) -> int:
+        return (patient.priority.value << 64) | self._microseconds(patient.timestamp)
+
+class AgingPolicy(SchedulingPolicy):
+    # Envejecimiento lineal: la prioridad efectiva mejora un segundo por cada
+    # segundo de espera. Como todos envejecen al mismo ritmo, ordenar por
+    # registro + penalización del nivel equivale a recalcular prioridades en
+    # cada tick sin tocar el heap: un REGULAR que ya esperó su penalización
+    # pasa delante de un CRITICAL recién llegado.
+    name = "envejecimiento"
+    DEFAULT_PENALTIES = {
+        PriorityLevel.CRITICAL: 0,
+        PriorityLevel.URGENT: 15 * 60,
+        PriorityLevel.REGULAR: 60 * 60
+    }
+    
+    def __init__(self, penalties: Optional[Dict[PriorityLevel, float]] = None):
+        self.penalties = dict(penalties or self.DEFAULT_PENALTIES)
+    
+    def rank(self, patient: MedicalTurn) -> int:
+        return self._microseconds(patient.timestamp) + round(self.penalties[patient.priority] * 1000000)
+
+class MaxWaitPolicy(AgingPolicy):
+    # SLA de espera máxima por nivel. Atender primero el vencimiento más
+    # cercano (EDF) minimiza el peor incumplimiento; vencimiento = registro +
+    # espera máxima, la misma forma de clave que el envejecimiento
+    name = "sla"
+    DEFAULT_PENALTIES = {
+        PriorityLevel.CRITICAL: 0,
+        PriorityLevel.URGENT: 30 * 60,
+        PriorityLevel.REGULAR: 2 * 60 * 60
+    }
+
+class WeightedFairPolicy(SchedulingPolicy):
+    # Weighted fair queuing entre niveles: con todos los niveles en espera,
+    # cada uno recibe despachos en proporción a su peso. La clave es el
+    # tiempo de finalización virtual max(V, último del nivel) + 1/peso, con V
+    # el tiempo virtual del último despachado.
+    name = "wfq"
+    DEFAULT_WEIGHTS = {
+        PriorityLevel.CRITICAL: 6,
+        PriorityLevel.URGENT: 3,
+        PriorityLevel.REGULAR: 1
+    }
+    _SCALE = 1 << 20
+    
+    def __init__(self, weights: Optional[Dict[PriorityLevel, int]] = None):
+        self.weights = dict(weights or self.DEFAULT_WEIGHTS)
+        self._virtual_time = 0
+        self._last_finish = {level: 0 for level in PriorityLevel}
+    
+    def rank(self, patient: MedicalTurn) -> int:
+        start = max(self._virtual_time, self._last_finish[patient.priority])
+        finish = start + self._SCALE // self.weights[patient.priority]
+        self._last_finish[patient.priority] = finish
+        return finish
+    
+    def rekey(self, patient: MedicalTurn, key: int, previous: PriorityLevel) -> int:
+        # El turno conserva su inicio virtual y solo cambia el largo de su
+        # tramo: reclasificar no consume tiempo virtual del nivel
+        start = (key >> self.SEQ_BITS) - self._SCALE // self.weights[previous]
+        finish = start + self._SCALE // self.weights[patient.priority]
+        return (finish << self.SEQ_BITS) | (key & ((1 << self.SEQ_BITS) - 1))
+    
+    def on_dispatch(self, key: int) -> None:
+        self._virtual_time = max(self._virtual_time, key >> self.SEQ_BITS)
+    
+    def on_load(self, entries: List[Tuple[int, MedicalTurn]]) -> None:
+        # Cada nivel sigue desde su último tag recuperado; el tiempo virtual
+        # se aproxima con el inicio del primero en la cola
+        for key, patient in entries:
+            finish = key >> self.SEQ_BITS
+            self._last_finish[patient.priority] = max(self._last_finish[patient.priority], finish)
+        key, patient = min(entries, key=itemgetter(0))
+        start = (key >> self.SEQ_BITS) - self._SCALE // self.weights[patient.priority]
+        self._virtual_time = max(self._virtual_time, start)
 
-class HospitalQueue:
+SCHEDULING_POLICIES = {
+    policy.name: policy
+    for policy in (StrictPriorityPolicy, AgingPolicy, MaxWaitPolicy, WeightedFairPolicy)
+}
+
+class WaitTimeEstimator:
+    # Estadísticas incrementales para estimar esperas: EWMA del tiempo de
+    # atención por prioridad y por médico, e intervalo entre llegadas por
+    # prioridad. El tiempo de atención de un paciente se mide como el lapso
+    # hasta que el mismo médico pide el siguiente; lapsos mayores a
+    # MAX_SERVICE_SECONDS (fin de turno, pausas) se descartan.
+    ALPHA = 0.2
+    MAX_SERVICE_SECONDS = 4 * 60 * 60
+    ACTIVE_WINDOW_SECONDS = 2 * 60 * 60
+    DEFAULT_SERVICE_SECONDS = {
+        PriorityLevel.CRITICAL: 30 * 60,
+        PriorityLevel.URGENT: 20 * 60,
+        PriorityLevel.REGULAR: 10 * 60
+    }
+    
     def __init__(self):
+        self.service_time = dict(self.DEFAULT_SERVICE_SECONDS)
+        self.doctor_service_time: Dict[str, float] = {}
+        self.arrival_interval: Dict[PriorityLevel, float] = {}
+        self._mean_service_time = sum(self.service_time.values()) / len(self.service_time)
+        self._last_arrival: Dict[PriorityLevel, float] = {}
+        self._last_dispatch: Dict[str, Tuple[float, PriorityLevel]] = {}
+    
+    def record_arrival(self, level: PriorityLevel, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        last = self._last_arrival.get(level)
+        if last is not None:
+            self.arrival_interval[level] = self._ewma(self.arrival_interval.get(level), now - last)
+        self._last_arrival[level] = now
+    
+    def record_dispatch(self, doctor: Optional[str], level: PriorityLevel, now: Optional[float] = None) -> None:
+        if doctor is None:
+            return
+        now = time.time() if now is None else now
+        previous = self._last_dispatch.get(doctor)
+        if previous is not None and 0 <= now - previous[0] <= self.MAX_SERVICE_SECONDS:
+            sample = now - previous[0]
+            self.service_time[previous[1]] = self._ewma(self.service_time[previous[1]], sample)
+            self.doctor_service_time[doctor] = self._ewma(self.doctor_service_time.get(doctor), sample)
+            self._mean_service_time = self._ewma(self._mean_service_time, sample)
+        self._last_dispatch[doctor] = (now, level)
+    
+    def arrival_rate(self, level: PriorityLevel) -> float:
+        # Llegadas por hora
+        interval = self.arrival_interval.get(level)
+        return 3600 / interval if interval else 0.0
+    
+    def capacity(self, now: Optional[float] = None, doctors: Optional[Iterable[str]] = None) -> float:
+        # Médicos activos equivalentes (todos o solo `doctors`): uno el doble
+        # de rápido que el promedio cuenta como dos. Sin datos, un médico.
+        now = time.time() if now is None else now
+        total = 0.0
+        for doctor in self._last_dispatch if doctors is None else doctors:
+            last = self._last_dispatch.get(doctor, (None,))[0]
+            if last is not None and now - last <= self.ACTIVE_WINDOW_SECONDS:
+                total += self._mean_service_time / self.doctor_service_time.get(doctor, self._mean_service_time)
+        return max(total, 1.0)
+    
+    def estimate(self, ahead: Dict[PriorityLevel, int], now: Optional[float] = None,
+                 doctors: Optional[Iterable[str]] = None) -> float:
+        # Segundos de espera con `ahead` pacientes por prioridad adelante
+        work = sum(count * self.service_time[level] for level, count in ahead.items())
+        return work / self.capacity(now, doctors)
+    
+    def snapshot(self) -> Dict:
+        return {
+            "service_time": {level.name: seconds for level, seconds in self.service_time.items()},
+            "doctor_service_time": dict(self.doctor_service_time),
+            "arrival_rate": {level.name: self.arrival_rate(level) for level in PriorityLevel},
+            "capacity": self.capacity()
+        }
+    
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + self.ALPHA * (sample - current)
+
+class QueueEventPublisher:
+    # Observadores de cambios: callback(evento, patient_id). Los callbacks
+    # corren en el hilo que hizo el cambio, con sus locks tomados: deben ser
+    # rápidos y no tocar widgets (QueueEventBridge los lleva al mainloop).
+    def subscribe(self, callback: Callable[[QueueEvent, str], None]) -> Callable[[], None]:
+        self._subscribers = self._subscribers + [callback]
+        
+        def unsubscribe():
+            self._subscribers = [other for other in self._subscribers if other is not callback]
+        return unsubscribe
+    
+    def _publish(self, event: QueueEvent, patient_id: str) -> None:
+        for callback in self._subscribers:
+            callback(event, patient_id)
+
+class HospitalQueue(QueueEventPublisher):
+    # Heap binario indexado: _positions guarda la posición de cada paciente en
+    # _queue, así cancelar o reclasificar es O(log n) sin reconstruir el heap.
+    # Cada entrada es (clave, turno) con una clave entera única que calcula la
+    # política de planificación (orden) más una secuencia de desempate: ocupa
+    # menos que una tupla con float e int y se compara más rápido.
+    _SEQ_MASK = (1 << SchedulingPolicy.SEQ_BITS) - 1
+    
+    def __init__(self, journal: Optional["QueueJournal"] = None, policy: Optional[SchedulingPolicy] = None):
+        self.policy = policy if policy is not None else SCHEDULING_POLICIES[SCHEDULING_POLICY]()
         self._queue = []
-        self._patient_index = {}
+        self._positions = {}
+        self._counter = itertools.count()
+        # Vista ordenada y filas ya formateadas, mantenidas en cada operación
+        # para que get_queue_status no ordene ni formatee en cada refresco
+        self._ordered = SortedEntryList()
+        # Vista ordenada por prioridad: cuántos de cada nivel hay adelante de
+        # un turno, para estimar su espera sin recorrer la cola
+        self._by_level = {level: SortedEntryList() for level in PriorityLevel}
+        self.stats = WaitTimeEstimator()
+        self._rows = {}
+        # Registro de cambios (versión, patient_id) para refrescos incrementales
+        self._version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._subscribers = []
+        self.journal = journal
+    
+    @classmethod
+    def recover(cls, journal: "QueueJournal", policy: Optional[SchedulingPolicy] = None) -> "HospitalQueue":
+        # Reconstruye la cola desde el snapshot más la cola del WAL
+        queue = cls(policy=policy)
+        queue._load(journal.load())
+        queue.journal = journal
+        return queue
         
     def add_patient(self, patient: MedicalTurn) -> None:
-        if patient.patient_id in self._patient_index:
+        if patient.patient_id in self._positions:
             raise ValueError("Paciente ya en cola")
         
-        entry = (patient.priority.value, patient.timestamp.timestamp(), patient)
-        heapq.heappush(self._queue, entry)
-        self._patient_index[patient.patient_id] = patient
-        
-    def next_patient(self) -> Optional[MedicalTurn]:
+        entry = (self._make_key(patient), patient)
+        self._queue.append(entry)
+        self._positions[patient.patient_id] = len(self._queue) - 1
+        self._sift_up(len(self._queue) - 1)
+        self._ordered.add(entry)
+        self._by_level[patient.priority].add(entry)
+        self.stats.record_arrival(patient.priority)
+        self._record_change(patient.patient_id)
+        if self.journal:
+            self.journal.append_add(patient, entry[0])
+            self._maybe_snapshot()
+        self._publish(QueueEvent.ENQUEUED, patient.patient_id)
+        
+    def add_patients(self, patients: Iterable[MedicalTurn]) -> int:
+        # Carga masiva: valida todo el lote antes de tocar la cola. Si el lote
+        # es grande respecto de la cola conviene heapify + reordenar la vista
+        # (O(n + k)) en vez de k inserciones de O(log n) cada una.
+        batch = list(patients)
+        seen = set()
+        duplicates = []
+        for patient in batch:
+            if not isinstance(patient, MedicalTurn):
+                raise ValueError("Los turnos deben ser instancias de MedicalTurn")
+            if patient.patient_id in seen or patient.patient_id in self._positions:
+                duplicates.append(patient.patient_id)
+            seen.add(patient.patient_id)
+        if duplicates:
+            raise ValueError(f"Pacientes ya en cola: {', '.join(duplicates)}")
+        
+        size = len(self._queue) + len(batch)
+        entries = [(self._make_key(patient), patient) for patient in batch]
+        if len(batch) * size.bit_length() >= size:
+            self._queue.extend(entries)
+            heapq.heapify(self._queue)
+            self._positions = {entry[1].patient_id: i for i, entry in enumerate(self._queue)}
+            self._ordered.load_sorted(sorted(list(self._ordered.islice()) + entries))
+            for level, ordered in self._by_level.items():
+                added = [entry for entry in entries if entry[1].priority is level]
+                if added:
+                    ordered.load_sorted(sorted(list(ordered.islice()) + added))
+        else:
+            for entry in entries:
+                self._queue.append(entry)
+                self._positions[entry[1].patient_id] = len(self._queue) - 1
+                self._sift_up(len(self._queue) - 1)
+                self._ordered.add(entry)
+                self._by_level[entry[1].priority].add(entry)
+        
+        for key, patient in entries:
+            self.stats.record_arrival(patient.priority)
+            self._record_change(patient.patient_id)
+            if self.journal:
+                self.journal.append_add(patient, key)
+        if self.journal:
+            self._maybe_snapshot()
+        for patient in batch:
+            self._publish(QueueEvent.ENQUEUED, patient.patient_id)
+        return len(batch)
+        
+    def next_patient(self, doctor: Optional[str] = None) -> Optional[MedicalTurn]:
         if not self._queue:
             return None
             
-        _, _, patient = heapq.heappop(self._queue)
-        self._patient_index.pop(patient.patient_id, None)
+        self.policy.on_dispatch(self._queue[0][0])
+        patient = self._remove_at(0)
         patient.status = PatientStatus.IN_PROGRESS
+        self.stats.record_dispatch(doctor, patient.priority)
+        if self.journal:
+            self.journal.append_remove(QueueJournal.OP_NEXT, patient.patient_id)
+            self._maybe_snapshot()
+        self._publish(QueueEvent.DISPATCHED, patient.patient_id)
         return patient
         
+    def next_patients(self, count: int) -> List[MedicalTurn]:
+        # Despacho en lote, p. ej. un paciente para cada médico libre
+        patients = []
+        while self._queue and len(patients) < count:
+            patients.append(self.next_patient())
+        return patients
+    
+    def position_of(self, patient_id: str) -> Optional[int]:
+        # Posición (0 = el próximo) sin ordenar la cola: O(log n)
+        position = self._positions.get(patient_id)
+        if position is None:
+            return None
+        return self._ordered.rank(self._queue[position])
+    
+    def patient_status(self, patient_id: str, doctors: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        # Lo que necesita el kiosco o el teléfono de un paciente, sin la cola
+        position = self._positions.get(patient_id)
+        if position is None:
+            return None
+        entry = self._queue[position]
+        return {
+            **self._row(entry[1]),
+            "position": self._ordered.rank(entry),
+            "size": len(self._queue),
+            "estimated_wait": self._estimate(entry, doctors)
+        }
+    
+    def estimated_wait(self, patient_id: str, doctors: Optional[Iterable[str]] = None) -> Optional[float]:
+        # Segundos estimados hasta ser atendido: O(log n) por consulta
+        position = self._positions.get(patient_id)
+        if position is None:
+            return None
+        return self._estimate(self._queue[position], doctors)
+    
+    def estimated_waits(self, offset: int = 0, limit: Optional[int] = None) -> List[float]:
+        # Estimaciones para una ventana de la cola (en el orden de
+        # get_queue_status): un rank por nivel al inicio y después se acumula
+        stop = None if limit is None else offset + limit
+        entries = self._ordered.islice(offset, stop)
+        first = next(entries, None)
+        if first is None:
+            return []
+        ahead = {level: ordered.rank(first) for level, ordered in self._by_level.items()}
+        service_time = self.stats.service_time
+        work = sum(count * service_time[level] for level, count in ahead.items())
+        capacity = self.stats.capacity()
+        waits = [work / capacity]
+        previous = first
+        for entry in entries:
+            work += service_time[previous[1].priority]
+            waits.append(work / capacity)
+            previous = entry
+        return waits
+        
     def cancel_turn(self, patient_id: str) -> bool:
-        patient = self._patient_index.get(patient_id)
-        if not patient:
+        position = self._positions.get(patient_id)
+        if position is None:
             return False
             
+        patient = self._remove_at(position)
         patient.status = PatientStatus.CANCELLED
+        if self.journal:
+            self.journal.append_remove(QueueJournal.OP_CANCEL, patient_id)
+            self._maybe_snapshot()
+        self._publish(QueueEvent.CANCELLED, patient_id)
         return True
+    
+    def update_priority(self, patient_id: str, level: PriorityLevel) -> bool:
+        if not isinstance(level, PriorityLevel):
+            raise ValueError("Prioridad debe ser instancia de PriorityLevel")
         
-    def get_queue_status(self) -> List[Dict]:
-        return [
-            {
-                "patient_id": p.patient_id,
-                "name": p.name,
-                "priority": p.priority.name,
-                "status": p.status.value,
-                "timestamp": p.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            for _, _, p in sorted(self._queue)
-        ]
+        position = self._positions.get(patient_id)
+        if position is None:
+            return False
+        
+        old_entry = self._queue[position]
+        key, patient = old_entry
+        previous = patient.priority
+        self._by_level[previous].remove(old_entry)
+        patient.priority = level
+        entry = (self.policy.rekey(patient, key, previous), patient)
+        self._queue[position] = entry
+        self._restore(position)
+        
+        self._ordered.remove(old_entry)
+        self._ordered.add(entry)
+        self._by_level[level].add(entry)
+        self._rows.pop(patient_id, None)
+        self._record_change(patient_id)
+        if self.journal:
+            self.journal.append_priority(patient_id, level, entry[0])
+            self._maybe_snapshot()
+        self._publish(QueueEvent.REPRIORITIZED, patient_id)
+        return True
+        
+    def get_queue_status(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        stop = None if limit is None else offset + limit
+        return [dict(self._row(entry[1])) for entry in self._ordered.islice(offset, stop)]
+    
+    def checkpoint(self) -> None:
+        if self.journal:
+            self.journal.write_snapshot(self._ordered.islice())
+        
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def changes_since(self, version: int) -> Optional[Tuple[int, List[str], List[Tuple[int, Dict]]]]:
+        # Devuelve (versión actual, ids que salieron de la cola, filas cambiadas
+        # con su posición ascendente) o None si el registro ya no alcanza y hay
+        # que pedir la cola completa
+        if version == self._version:
+            return self._version, [], []
+        if version > self._version or not self._changes or self._changes[0][0] > version + 1:
+            return None
+        
+        changed = set()
+        for change_version, patient_id in reversed(self._changes):
+            if change_version <= version:
+                break
+            changed.add(patient_id)
+        
+        removed = []
+        updated = []
+        for patient_id in changed:
+            position = self._positions.get(patient_id)
+            if position is None:
+                removed.append(patient_id)
+            else:
+                index = self._ordered.rank(self._queue[position])
+                updated.append((index, dict(self._row(self._queue[position][1]))))
+        updated.sort(key=lambda item: item[0])
+        return self._version, removed, updated
         
     def __len__(self) -> int:
         return len(self._queue)
+    
+    def _record_change(self, patient_id: str) -> None:
+        self._version += 1
+        self._changes.append((self._version, patient_id))
+    
+    def _row(self, patient: MedicalTurn) -> Dict:
+        # Las filas se formatean la primera vez que se piden y quedan en caché
+        row = self._rows.get(patient.patient_id)
+        if row is None:
+            row = {
+                "patient_id": patient.patient_id,
+                "name": patient.name,
+                "priority": patient.priority.name,
+                "status": patient.status.value,
+                "timestamp": patient.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "specialty": patient.specialty
+            }
+            self._rows[patient.patient_id] = row
+        return row
+    
+    def _estimate(self, entry: Tuple[int, MedicalTurn], doctors: Optional[Iterable[str]] = None) -> float:
+        ahead = {level: ordered.rank(entry) for level, ordered in self._by_level.items()}
+        return self.stats.estimate(ahead, doctors=doctors)
+    
+    def _make_key(self, patient: MedicalTurn) -> int:
+        return self.policy.key(patient, next(self._counter) & self._SEQ_MASK)
+    
+    def _key_of(self, patient_id: str) -> int:
+        return self._queue[self._positions[patient_id]][0]
+    
+    def _maybe_snapshot(self) -> None:
+        if self.journal.snapshot_due():
+            self.checkpoint()
+    
+    def _load(self, items: Iterable[Tuple[Optional[int], MedicalTurn]]) -> None:
+        # Una lista ordenada ya es un heap válido: se carga todo de una vez.
+        # Los turnos del snapshot y del WAL traen su clave; los de archivos
+        # viejos reciben una, como al encolarlos, después de que la política
+        # recupere su estado y con secuencias mayores a las recuperadas
+        items = list(items)
+        entries = [item for item in items if item[0] is not None]
+        if entries:
+            self._counter = itertools.count(max(map(self._SEQ_MASK.__and__, map(itemgetter(0), entries))) + 1)
+            self.policy.on_load(entries)
+        entries.extend((self._make_key(item[1]), item[1]) for item in items if item[0] is None)
+        entries.sort(key=itemgetter(0))
+        self._queue = entries
+        self._positions = dict(zip(map(attrgetter("patient_id"), map(itemgetter(1), entries)), itertools.count()))
+        self._ordered.load_sorted(list(entries))
+        for level, ordered in self._by_level.items():
+            ordered.load_sorted([entry for entry in entries if entry[1].priority is level])
+        self._rows.clear()
+        self._changes.clear()
+        self._version += 1
+    
+    # --- Operaciones internas del heap ---
+    
+    def _remove_at(self, position: int) -> MedicalTurn:
+        last = self._queue.pop()
+        removed = last
+        if position < len(self._queue):
+            # Se mueve el último elemento al hueco y se reubica
+            removed = self._queue[position]
+            self._queue[position] = last
+            self._positions[last[1].patient_id] = position
+            self._restore(position)
+        patient = removed[1]
+        del self._positions[patient.patient_id]
+        self._ordered.remove(removed)
+        self._by_level[patient.priority].remove(removed)
+        self._rows.pop(patient.patient_id, None)
+        self._record_change(patient.patient_id)
+        return patient
+    
+    def _restore(self, position: int) -> None:
+        if position > 0 and self._queue[position] < self._queue[(position - 1) // 2]:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+    
+    def _sift_up(self, position: int) -> None:
+        entry = self._queue[position]
+        while position > 0:
+            parent = (position - 1) // 2
+            if entry >= self._queue[parent]:
+                break
+            self._queue[position] = self._queue[parent]
+            self._positions[self._queue[position][1].patient_id] = position
+            position = parent
+        self._queue[position] = entry
+        self._positions[entry[1].patient_id] = position
+    
+    def _sift_down(self, position: int) -> None:
+        size = len(self._queue)
+        entry = self._queue[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and self._queue[child + 1] < self._queue[child]:
+                child += 1
+            if entry <= self._queue[child]:
+                break
+            self._queue[position] = self._queue[child]
+            self._positions[self._queue[position][1].patient_id] = position
+            position = child
+        self._queue[position] = entry
+        self._positions[entry[1].patient_id] = position
 
-class AuthSystem:
+class ConcurrentHospitalQueue(HospitalQueue):
+    # Variante segura para hilos (kioscos y puestos de staff en el mismo
+    # proceso). Linealizable: cada operación tiene efecto en un único punto
+    # dentro de _heap_lock, y las lecturas (estado, versión, cambios) también
+    # se hacen bajo ese lock. _positions se modifica en cada sift junto con
+    # el heap, así que no se puede particionar; lo que se particiona es el
+    # índice de pertenencia _members (patient_id -> turno) con locks por
+    # franja: altas duplicadas, cancelaciones o reclasificaciones de
+    # pacientes que no están en cola se resuelven sin tocar el lock del heap.
+    # _members se modifica siempre dentro de _heap_lock, en la misma sección
+    # crítica que el heap; despachar no toma la franja (el orden de locks es
+    # franja -> heap, nunca al revés), y como solo quita pacientes, una
+    # lectura bajo la franja a lo sumo ve en cola a alguien que se está
+    # despachando, lo que equivale a ordenar esa operación antes.
+    _STRIPES = 16
+    
+    def __init__(self, journal: Optional["QueueJournal"] = None, policy: Optional[SchedulingPolicy] = None):
+        super().__init__(journal, policy)
+        self._members: Dict[str, MedicalTurn] = {}
+        self._stripes = [threading.Lock() for _ in range(self._STRIPES)]
+        self._heap_lock = threading.Lock()
+        self._not_empty = threading.Condition(self._heap_lock)
+    
+    def add_patient(self, patient: MedicalTurn) -> None:
+        with self._stripe(patient.patient_id):
+            if patient.patient_id in self._members:
+                raise ValueError("Paciente ya en cola")
+            with self._not_empty:
+                super().add_patient(patient)
+                self._members[patient.patient_id] = patient
+                self._not_empty.notify()
+    
+    def add_patients(self, patients: Iterable[MedicalTurn]) -> int:
+        # El lote abarca varias franjas: se toman todas, en orden
+        batch = list(patients)
+        for lock in self._stripes:
+            lock.acquire()
+        try:
+            with self._not_empty:
+                count = super().add_patients(batch)
+                self._members.update((patient.patient_id, patient) for patient in batch)
+                self._not_empty.notify(count)
+        finally:
+            for lock in reversed(self._stripes):
+                lock.release()
+        return count
+    
+    def next_patient(self, doctor: Optional[str] = None, timeout: Optional[float] = 0) -> Optional[MedicalTurn]:
+        # timeout=0 no espera, None espera hasta que haya un paciente
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._queue, timeout):
+                return None
+            patient = super().next_patient(doctor)
+            self._members.pop(patient.patient_id, None)
+        return patient
+    
+    def next_patients(self, count: int, timeout: Optional[float] = 0) -> List[MedicalTurn]:
+        # Espera como mucho por el primero y despacha el resto en la misma
+        # sección crítica
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._queue, timeout):
+                return []
+            patients = []
+            while self._queue and len(patients) < count:
+                patient = super().next_patient()
+                self._members.pop(patient.patient_id, None)
+                patients.append(patient)
+        return patients
+    
+    def cancel_turn(self, patient_id: str) -> bool:
+        with self._stripe(patient_id):
+            if patient_id not in self._members:
+                return False
+            with self._heap_lock:
+                cancelled = super().cancel_turn(patient_id)
+                self._members.pop(patient_id, None)
+        return cancelled
+    
+    def update_priority(self, patient_id: str, level: PriorityLevel) -> bool:
+        if not isinstance(level, PriorityLevel):
+            raise ValueError("Prioridad debe ser instancia de PriorityLevel")
+        with self._stripe(patient_id):
+            if patient_id not in self._members:
+                return False
+            with self._heap_lock:
+                return super().update_priority(patient_id, level)
+    
+    def get_queue_status(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        with self._heap_lock:
+            return super().get_queue_status(offset, limit)
+    
+    def position_of(self, patient_id: str) -> Optional[int]:
+        with self._heap_lock:
+            return super().position_of(patient_id)
+    
+    def patient_status(self, patient_id: str, doctors: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        with self._heap_lock:
+            return super().patient_status(patient_id, doctors)
+    
+    def estimated_wait(self, patient_id: str, doctors: Optional[Iterable[str]] = None) -> Optional[float]:
+        with self._heap_lock:
+            return super().estimated_wait(patient_id, doctors)
+    
+    def estimated_waits(self, offset: int = 0, limit: Optional[int] = None) -> List[float]:
+        with self._heap_lock:
+            return super().estimated_waits(offset, limit)
+    
+    def checkpoint(self) -> None:
+        with self._heap_lock:
+            super().checkpoint()
+    
+    def changes_since(self, version: int) -> Optional[Tuple[int, List[str], List[Tuple[int, Dict]]]]:
+        with self._heap_lock:
+            return super().changes_since(version)
+    
+    def _stripe(self, patient_id: str) -> threading.Lock:
+        return self._stripes[hash(patient_id) % self._STRIPES]
+    
+    def _maybe_snapshot(self) -> None:
+        # Se llama con _heap_lock tomado: checkpoint() volvería a tomarlo
+        if self.journal.snapshot_due():
+            super().checkpoint()
+    
+    def _load(self, items: Iterable[Tuple[Optional[int], MedicalTurn]]) -> None:
+        super()._load(items)
+        self._members = {entry[1].patient_id: entry[1] for entry in self._queue}
+
+class SpecialtyDispatcher(QueueEventPublisher):
+    # Una sub-cola (HospitalQueue) por especialidad, cada una con su lock:
+    # médicos de distintas especialidades despachan en paralelo sin pelear
+    # por un único heap. Un médico sin críticos propios "roba" la cabeza
+    # crítica de otra sub-cola, y si la suya está vacía roba la mejor de
+    # cualquier prioridad. El dispatcher lleva la versión global, el registro
+    # de cambios y el journal; las sub-colas no escriben en disco. Cada
+    # sub-cola tiene su instancia de la política; con "wfq" el tiempo virtual
+    # es por sub-cola y la comparación entre cabezas al robar es aproximada.
+    def __init__(self, journal: Optional["QueueJournal"] = None, policy: str = SCHEDULING_POLICY):
+        self.policy = policy
+        self._shards: Dict[str, HospitalQueue] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._owner: Dict[str, str] = {}
+        self._meta_lock = threading.Lock()
+        self._version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self.journal = journal
+        # Estadísticas compartidas por todas las sub-colas: un médico que roba
+        # sigue midiendo bien su tiempo de atención. _doctors agrupa a los
+        # médicos por especialidad para estimar la capacidad de cada sub-cola.
+        self.stats = WaitTimeEstimator()
+        self._doctors: Dict[str, set] = {}
+        self._subscribers = []
+        for specialty in SPECIALTIES:
+            self._shard(specialty)
+    
+    @classmethod
+    def recover(cls, journal: "QueueJournal", policy: str = SCHEDULING_POLICY) -> "SpecialtyDispatcher":
+        dispatcher = cls(policy=policy)
+        groups: Dict[str, List[Tuple[Optional[int], MedicalTurn]]] = {}
+        for item in journal.load():
+            groups.setdefault(item[1].specialty, []).append(item)
+        for specialty, items in groups.items():
+            dispatcher._shard(specialty)._load(items)
+            dispatcher._owner.update(zip(map(attrgetter("patient_id"), map(itemgetter(1), items)), itertools.repeat(specialty)))
+        dispatcher._version += 1
+        dispatcher.journal = journal
+        return dispatcher
+    
+    def add_patient(self, patient: MedicalTurn) -> None:
+        shard = self._shard(patient.specialty)
+        with self._locks[patient.specialty]:
+            with self._meta_lock:
+                if patient.patient_id in self._owner:
+                    raise ValueError("Paciente ya en cola")
+                self._owner[patient.patient_id] = patient.specialty
+            shard.add_patient(patient)
+            self._record([patient.patient_id], lambda: self.journal.append_add(patient, shard._key_of(patient.patient_id)))
+        self._committed(QueueEvent.ENQUEUED, [patient.patient_id])
+    
+    def add_patients(self, patients: Iterable[MedicalTurn]) -> int:
+        # Todo o nada: se toman los locks de las sub-colas afectadas (en el
+        # mismo orden que checkpoint) y la verificación de duplicados, la
+        # inserción y el WAL ocurren sin soltarlos
+        batch = list(patients)
+        seen = set()
+        duplicates = []
+        for patient in batch:
+            if not isinstance(patient, MedicalTurn):
+                raise ValueError("Los turnos deben ser instancias de MedicalTurn")
+            if patient.patient_id in seen:
+                duplicates.append(patient.patient_id)
+            seen.add(patient.patient_id)
+        if duplicates:
+            raise ValueError(f"Pacientes ya en cola: {', '.join(duplicates)}")
+        
+        groups: Dict[str, List[MedicalTurn]] = {}
+        for patient in batch:
+            groups.setdefault(patient.specialty, []).append(patient)
+            self._shard(patient.specialty)
+        locks = [self._locks[specialty] for specialty in sorted(groups)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            with self._meta_lock:
+                duplicates = [patient.patient_id for patient in batch if patient.patient_id in self._owner]
+                if duplicates:
+                    raise ValueError(f"Pacientes ya en cola: {', '.join(duplicates)}")
+                self._owner.update((patient.patient_id, patient.specialty) for patient in batch)
+            for specialty, group in groups.items():
+                self._shards[specialty].add_patients(group)
+            
+            def journal_batch():
+                for patient in batch:
+                    self.journal.append_add(patient, self._shards[patient.specialty]._key_of(patient.patient_id))
+            self._record([patient.patient_id for patient in batch], journal_batch)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        self._committed(QueueEvent.ENQUEUED, [patient.patient_id for patient in batch])
+        return len(batch)
+    
+    def next_patient(self, specialty: Optional[str] = None, doctor: Optional[str] = None) -> Optional[MedicalTurn]:
+        if specialty is not None and doctor is not None:
+            self._doctors.setdefault(specialty, set()).add(doctor)
+        patient = self._take(specialty, doctor)
+        if patient is None:
+            return None
+        self._committed(QueueEvent.DISPATCHED, [patient.patient_id])
+        return patient
+    
+    def next_patients(self, count: int, specialty: Optional[str] = None) -> List[MedicalTurn]:
+        patients = []
+        while len(patients) < count:
+            patient = self.next_patient(specialty)
+            if patient is None:
+                break
+            patients.append(patient)
+        return patients
+    
+    def cancel_turn(self, patient_id: str) -> bool:
+        specialty = self._owner.get(patient_id)
+        if specialty is None:
+            return False
+        with self._locks[specialty]:
+            if not self._shards[specialty].cancel_turn(patient_id):
+                return False
+            with self._meta_lock:
+                self._owner.pop(patient_id, None)
+            self._record([patient_id], lambda: self.journal.append_remove(QueueJournal.OP_CANCEL, patient_id))
+        self._committed(QueueEvent.CANCELLED, [patient_id])
+        return True
+    
+    def update_priority(self, patient_id: str, level: PriorityLevel) -> bool:
+        if not isinstance(level, PriorityLevel):
+            raise ValueError("Prioridad debe ser instancia de PriorityLevel")
+        specialty = self._owner.get(patient_id)
+        if specialty is None:
+            return False
+        with self._locks[specialty]:
+            if not self._shards[specialty].update_priority(patient_id, level):
+                return False
+            shard = self._shards[specialty]
+            self._record([patient_id], lambda: self.journal.append_priority(patient_id, level, shard._key_of(patient_id)))
+        self._committed(QueueEvent.REPRIORITIZED, [patient_id])
+        return True
+    
+    def get_queue_status(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        # Las vistas ordenadas de cada sub-cola se mezclan en orden global
+        stop = None if limit is None else offset + limit
+        views = self._views(stop, lambda shard, entry: dict(shard._row(entry[1])))
+        merged = heapq.merge(*views, key=lambda item: item[0])
+        return [row for _, row in itertools.islice(merged, offset, stop)]
+    
+    def checkpoint(self) -> None:
+        # Se toman los locks de todas las sub-colas (en orden de especialidad)
+        # y después _meta_lock: el snapshot no puede perder una operación que
+        # ya esté en el WAL que se trunca. Si mientras tanto apareció una
+        # sub-cola nueva, se reintenta.
+        if not self.journal:
+            return
+        while True:
+            with self._meta_lock:
+                specialties = sorted(self._locks)
+            locks = [self._locks[specialty] for specialty in specialties]
+            for lock in locks:
+                lock.acquire()
+            try:
+                with self._meta_lock:
+                    if len(self._locks) == len(specialties):
+                        merged = heapq.merge(
+                            *(self._shards[specialty]._ordered.islice() for specialty in specialties),
+                            key=itemgetter(0)
+                        )
+                        self.journal.write_snapshot(merged)
+                        return
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def changes_since(self, version: int) -> Optional[Tuple[int, List[str], List[Tuple[int, Dict]]]]:
+        # El registro de cambios se recorre bajo _meta_lock y cada fila se lee
+        # bajo el lock de su sub-cola
+        with self._meta_lock:
+            current = self._version
+            if version == current:
+                return current, [], []
+            if version > current or not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed = {}
+            for change_version, patient_id in reversed(self._changes):
+                if change_version <= version:
+                    break
+                changed[patient_id] = self._owner.get(patient_id)
+        
+        removed = []
+        updated = []
+        for patient_id, specialty in changed.items():
+            entry = None
+            if specialty is not None:
+                with self._locks[specialty]:
+                    shard = self._shards[specialty]
+                    position = shard._positions.get(patient_id)
+                    if position is not None:
+                        entry = shard._queue[position]
+                        row = dict(shard._row(entry[1]))
+            if entry is None:
+                removed.append(patient_id)
+            else:
+                updated.append((self._global_rank(entry), row))
+        updated.sort(key=lambda item: item[0])
+        return current, removed, updated
+    
+    def position_of(self, patient_id: str) -> Optional[int]:
+        # Posición global: elementos menores en todas las sub-colas
+        specialty = self._owner.get(patient_id)
+        if specialty is None:
+            return None
+        with self._locks[specialty]:
+            shard = self._shards[specialty]
+            position = shard._positions.get(patient_id)
+            if position is None:
+                return None
+            entry = shard._queue[position]
+        return self._global_rank(entry)
+    
+    def patient_status(self, patient_id: str) -> Optional[Dict]:
+        # "position" es la posición en la cola global; "specialty_position" y
+        # la espera estimada, en la sub-cola de su especialidad
+        specialty = self._owner.get(patient_id)
+        if specialty is None:
+            return None
+        with self._locks[specialty]:
+            status = self._shards[specialty].patient_status(patient_id, self._doctors.get(specialty, ()))
+        if status is None:
+            return None
+        status["specialty_position"] = status["position"]
+        status["position"] = self.position_of(patient_id)
+        status["size"] = len(self)
+        return status
+    
+    def estimated_wait(self, patient_id: str) -> Optional[float]:
+        specialty = self._owner.get(patient_id)
+        if specialty is None:
+            return None
+        with self._locks[specialty]:
+            return self._shards[specialty].estimated_wait(patient_id, self._doctors.get(specialty, ()))
+    
+    def estimated_waits(self, offset: int = 0, limit: Optional[int] = None) -> List[float]:
+        # Una consulta O(log n) por fila de la ventana pedida
+        stop = None if limit is None else offset + limit
+        views = self._views(stop, lambda shard, entry: shard.estimated_wait(
+            entry[1].patient_id, self._doctors.get(entry[1].specialty, ())
+        ))
+        merged = heapq.merge(*views, key=lambda item: item[0])
+        return [wait for _, wait in itertools.islice(merged, offset, stop)]
+    
+    def sizes(self) -> Dict[str, int]:
+        return {specialty: len(shard) for specialty, shard in self._shards.items()}
+    
+    def __len__(self) -> int:
+        return len(self._owner)
+    
+    def _shard(self, specialty: str) -> HospitalQueue:
+        shard = self._shards.get(specialty)
+        if shard is None:
+            with self._meta_lock:
+                shard = self._shards.get(specialty)
+                if shard is None:
+                    self._locks[specialty] = threading.Lock()
+                    shard = self._shards[specialty] = HospitalQueue(policy=SCHEDULING_POLICIES[self.policy]())
+                    shard.stats = self.stats
+        return shard
+    
+    def _take(self, specialty: Optional[str], doctor: Optional[str]) -> Optional[MedicalTurn]:
+        if specialty is None:
+            # Despacho general: la mejor cabeza de todas las sub-colas
+            return self._steal(lambda entry: True, doctor, blocking=True)
+        
+        own = self._shard(specialty)
+        with self._locks[specialty]:
+            if own._queue and self._is_critical(own._queue[0]):
+                return self._pop(specialty, doctor)
+        # Sin críticos propios: primero se roban críticos ajenos; si la
+        # sub-cola propia está vacía, cualquier cabeza ajena
+        stolen = self._steal(self._is_critical, doctor, exclude=specialty)
+        if stolen is not None:
+            return stolen
+        with self._locks[specialty]:
+            if own._queue:
+                return self._pop(specialty, doctor)
+        return self._steal(lambda entry: True, doctor, exclude=specialty)
+    
+    def _views(self, stop: Optional[int], read) -> List[List[Tuple[Tuple[int, MedicalTurn], object]]]:
+        # Copia de las primeras `stop` entradas de cada sub-cola, junto con
+        # read(sub-cola, entrada), hecha bajo el lock de esa sub-cola
+        with self._meta_lock:
+            shards = list(self._shards.items())
+        views = []
+        for specialty, shard in shards:
+            with self._locks[specialty]:
+                views.append([(entry, read(shard, entry)) for entry in shard._ordered.islice(0, stop)])
+        return views
+    
+    def _global_rank(self, entry: Tuple[int, MedicalTurn]) -> int:
+        # Posición global = elementos menores en todas las sub-colas
+        with self._meta_lock:
+            shards = list(self._shards.items())
+        rank = 0
+        for specialty, shard in shards:
+            with self._locks[specialty]:
+                rank += shard._ordered.rank(entry)
+        return rank
+    
     @staticmethod
-    def load_db(filename: str) -> Dict:
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                return json.load(f)
-        return {}
+    def _is_critical(entry: Tuple[int, MedicalTurn]) -> bool:
+        return entry[1].priority == PriorityLevel.CRITICAL
+    
+    def _steal(self, accept, doctor: Optional[str] = None, exclude: Optional[str] = None,
+               blocking: bool = False) -> Optional[MedicalTurn]:
+        # Se elige la mejor cabeza con una lectura sin lock y se confirma
+        # tomando sólo el lock de esa sub-cola (sin bloquear si es un robo)
+        while True:
+            best = None
+            for specialty, shard in list(self._shards.items()):
+                if specialty == exclude:
+                    continue
+                # Sin lock la sub-cola puede vaciarse entre la consulta y el índice
+                try:
+                    head = shard._queue[0]
+                except IndexError:
+                    continue
+                if accept(head) and (best is None or head < best[1]):
+                    best = (specialty, head)
+            if best is None:
+                return None
+            specialty, head = best
+            lock = self._locks[specialty]
+            if not lock.acquire(blocking):
+                return None
+            try:
+                queue = self._shards[specialty]._queue
+                if queue and queue[0] is head:
+                    return self._pop(specialty, doctor)
+            finally:
+                lock.release()
+            # La cabeza cambió entre la lectura y el lock: se reintenta
+    
+    def _pop(self, specialty: str, doctor: Optional[str] = None) -> MedicalTurn:
+        # Requiere el lock de la sub-cola tomado
+        patient = self._shards[specialty].next_patient(doctor)
+        with self._meta_lock:
+            self._owner.pop(patient.patient_id, None)
+        self._record([patient.patient_id], lambda: self.journal.append_remove(QueueJournal.OP_NEXT, patient.patient_id))
+        return patient
+    
+    def _record(self, patient_ids: List[str], journal_write) -> None:
+        # Requiere tomados los locks de las sub-colas modificadas: dos
+        # operaciones sobre la misma sub-cola quedan en el WAL y en el registro
+        # de cambios en el mismo orden en que se aplicaron en memoria
+        with self._meta_lock:
+            for patient_id in patient_ids:
+                self._version += 1
+                self._changes.append((self._version, patient_id))
+            if self.journal:
+                journal_write()
+    
+    def _committed(self, event: QueueEvent, patient_ids: List[str]) -> None:
+        # Fuera de todos los locks: checkpoint toma los de las sub-colas primero
+        if self.journal and self.journal.snapshot_due():
+            self.checkpoint()
+        for patient_id in patient_ids:
+            self._publish(event, patient_id)
+
+class PasswordHasher:
+    # Contraseñas con PBKDF2-SHA256 y sal aleatoria, guardadas como
+    # "pbkdf2_sha256$iteraciones$sal$hash". Las entradas heredadas en texto
+    # plano se reconocen por no tener el prefijo y se actualizan al loguearse.
+    ALGORITHM = "pbkdf2_sha256"
+    
+    @classmethod
+    def hash(cls, password: str, iterations: int = None) -> str:
+        iterations = iterations or PASSWORD_HASH_ITERATIONS
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+        return f"{cls.ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+    
+    @classmethod
+    def verify(cls, password: str, stored: str) -> Tuple[bool, bool]:
+        # Devuelve (es válida, hay que rehashear)
+        if not stored.startswith(cls.ALGORITHM + "$"):
+            return hmac.compare_digest(password.encode(), stored.encode()), True
+        
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+        valid = hmac.compare_digest(digest.hex(), expected)
+        return valid, int(iterations) < PASSWORD_HASH_ITERATIONS
+
+class JsonUserStore:
+    # Backend original: un archivo JSON completo por tipo de usuario. Cada
+    # alta reescribe el archivo (de forma atómica, vía archivo temporal).
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._lock = threading.Lock()
+        # Aciertos de la caché de JSON parseados para este archivo
+        self._stats_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        users, hit = AuthSystem._load_cached(self.filename)
+        with self._stats_lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        return users.get(user_id)
+    
+    def cache_counts(self) -> Tuple[int, int]:
+        with self._stats_lock:
+            return self.cache_hits, self.cache_misses
+    
+    def add(self, user_id: str, record: Dict) -> bool:
+        with self._lock:
+            users = AuthSystem.load_db(self.filename)
+            if user_id in users:
+                return False
+            users[user_id] = record
+            AuthSystem.save_db(users, self.filename)
+            return True
+    
+    def update(self, user_id: str, fields: Dict) -> None:
+        with self._lock:
+            users = AuthSystem.load_db(self.filename)
+            if user_id in users:
+                users[user_id].update(fields)
+                AuthSystem.save_db(users, self.filename)
+
+class SqliteUserStore:
+    # Backend indexado: una tabla por tipo de usuario con user_id como clave
+    # primaria, así login y registro son una búsqueda por índice. La primera
+    # vez que se abre una tabla vacía se importa el JSON heredado.
+    _connections = {}
+    _connections_lock = threading.Lock()
+    
+    def __init__(self, table: str, legacy_file: Optional[str] = None, db_file: str = AUTH_DB_FILE):
+        self.table = table
+        self.db_file = db_file
+        self._conn, self._lock = self._connect(db_file)
+        # Registros ya leídos; se invalidan si otra conexión hizo commit
+        # (PRAGMA data_version cambia) y se actualizan con las escrituras propias
+        self._records = {}
+        self._data_version = None
+        # Se cuentan bajo self._lock, que get() ya tiene tomado
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        with self._lock, self._conn:
+            self._conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    user_id TEXT PRIMARY KEY,
+                    password TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    role TEXT
+                ) WITHOUT ROWID
+            ''')
+        
+        if legacy_file:
+            self.migrate_from_json(legacy_file)
+    
+    @classmethod
+    def _connect(cls, db_file: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+        # Una conexión por archivo compartida entre tablas e hilos
+        with cls._connections_lock:
+            if db_file not in cls._connections:
+                conn = sqlite3.connect(db_file, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                cls._connections[db_file] = (conn, threading.Lock())
+            return cls._connections[db_file]
+    
+    def migrate_from_json(self, filename: str) -> int:
+        with self._lock:
+            if self._conn.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone():
+                return 0
+            users = AuthSystem.load_db(filename)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (user_id, password, name, type, role) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (user_id, data["password"], data["name"], data["type"], data.get("role"))
+                        for user_id, data in users.items()
+                    ]
+                )
+            return len(users)
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._records.clear()
+                self._data_version = data_version
+            
+            record = self._records.get(user_id)
+            if record is not None:
+                self.cache_hits += 1
+                return record
+            self.cache_misses += 1
+            
+            row = self._conn.execute(
+                f"SELECT password, name, type, role FROM {self.table} WHERE user_id=?",
+                (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            record = {"password": row[0], "name": row[1], "type": row[2]}
+            if row[3] is not None:
+                record["role"] = row[3]
+            self._records[user_id] = record
+            return record
+    
+    def add(self, user_id: str, record: Dict) -> bool:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT INTO {self.table} (user_id, password, name, type, role) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, record["password"], record["name"], record["type"], record.get("role"))
+                )
+                self._records[user_id] = dict(record)
+            return True
+        except sqlite3.IntegrityError:
+            return False
+    
+    def update(self, user_id: str, fields: Dict) -> None:
+        columns = ", ".join(f"{column}=?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE {self.table} SET {columns} WHERE user_id=?",
+                (*fields.values(), user_id)
+            )
+            if user_id in self._records:
+                self._records[user_id].update(fields)
+    
+    def cache_counts(self) -> Tuple[int, int]:
+        with self._lock:
+            return self.cache_hits, self.cache_misses
+
+class AuthSystem:
+    _stores = {}
+    # Pool acotado para el hashing (pbkdf2_hmac libera el GIL); si hay
+    # demasiadas verificaciones en curso se rechaza en vez de encolar sin límite
+    _pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+    _pending = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+    # Caché de los JSON ya parseados: filename -> (firma del archivo, datos).
+    # La firma (mtime, inodo, tamaño) detecta cambios hechos por otro proceso.
+    # Los datos devueltos son compartidos: solo se modifican para guardarlos.
+    _db_cache = {}
+    _cache_lock = threading.Lock()
     
     @staticmethod
-    def save_db(data: Dict, filename: str) -> None:
-        with open(filename, 'w') as f:
+    def _file_signature(filename: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+    
+    @classmethod
+    def load_db(cls, filename: str) -> Dict:
+        return cls._load_cached(filename)[0]
+    
+    @classmethod
+    def _load_cached(cls, filename: str) -> Tuple[Dict, bool]:
+        # Devuelve (datos, salió de la caché)
+        signature = cls._file_signature(filename)
+        if signature is None:
+            return {}, False
+        
+        with cls._cache_lock:
+            cached = cls._db_cache.get(filename)
+            if cached and cached[0] == signature:
+                return cached[1], True
+        
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        with cls._cache_lock:
+            cls._db_cache[filename] = (signature, data)
+        return data, False
+    
+    @classmethod
+    def save_db(cls, data: Dict, filename: str) -> None:
+        # Escritura atómica: nunca queda un JSON a medio escribir
+        temp_file = filename + ".tmp"
+        with open(temp_file, 'w') as f:
             json.dump(data, f, indent=2)
+        os.replace(temp_file, filename)
+        
+        # La caché se actualiza con lo guardado en vez de releer el archivo
+        with cls._cache_lock:
+            cls._db_cache[filename] = (cls._file_signature(filename), data)
+    
+    @classmethod
+    def cache_stats(cls) -> Dict:
+        # Suma de los contadores de cada store (JSON o SQLite), que los
+        # llevan bajo su propio lock
+        hits = misses = 0
+        for store in list(cls._stores.values()):
+            store_hits, store_misses = store.cache_counts()
+            hits += store_hits
+            misses += store_misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0
+        }
+    
+    @classmethod
+    def get_store(cls, is_staff: bool = False):
+        if is_staff not in cls._stores:
+            legacy_file = STAFF_DB_FILE if is_staff else USER_DB_FILE
+            if USER_STORE_BACKEND == "sqlite":
+                table = "personal" if is_staff else "pacientes"
+                cls._stores[is_staff] = SqliteUserStore(table, legacy_file)
+            else:
+                cls._stores[is_staff] = JsonUserStore(legacy_file)
+        return cls._stores[is_staff]
     
     @classmethod
     def register_patient(cls, user_id: str, password: str, name: str) -> Tuple[bool, str]:
-        users = cls.load_db(USER_DB_FILE)
-        
-        if user_id in users:
-            return False, "El ID de usuario ya existe"
-        
-        users[user_id] = {
-            "password": password,
+        record = {
+            "password": PasswordHasher.hash(password),
             "name": name,
             "type": UserType.PATIENT.value
         }
         
-        cls.save_db(users, USER_DB_FILE)
+        if not cls.get_store().add(user_id, record):
+            return False, "El ID de usuario ya existe"
         return True, "Registro exitoso"
     
     @classmethod
     def login(cls, user_id: str, password: str, is_staff: bool = False) -> Tuple[bool, str, Optional[Dict]]:
-        db_file = STAFF_DB_FILE if is_staff else USER_DB_FILE
-        users = cls.load_db(db_file)
+        store = cls.get_store(is_staff)
+        record = store.get(user_id)
         
-        if user_id not in users:
+        if record is None:
             return False, "Usuario no encontrado", None
         
-        if users[user_id]["password"] != password:
+        valid, needs_rehash = PasswordHasher.verify(password, record["password"])
+        if not valid:
             return False, "Contraseña incorrecta", None
+        
+        if needs_rehash:
+            store.update(user_id, {"password": PasswordHasher.hash(password)})
             
-        user_data = users[user_id].copy()
+        user_data = record.copy()
+        user_data.pop("password", None)
         user_data["user_id"] = user_id
         return True, "Inicio de sesión exitoso", user_data
+    
+    @classmethod
+    def submit(cls, func, *args) -> Future:
+        if not cls._pending.acquire(blocking=False):
+            future = Future()
+            future.set_exception(RuntimeError("Demasiadas solicitudes en curso, intente nuevamente"))
+            return future
+        
+        future = cls._pool.submit(func, *args)
+        future.add_done_callback(lambda _: cls._pending.release())
+        return future
+    
+    @classmethod
+    def login_async(cls, user_id: str, password: str, is_staff: bool = False) -> Future:
+        return cls.submit(cls.login, user_id, password, is_staff)
+    
+    @classmethod
+    def register_patient_async(cls, user_id: str, password: str, name: str) -> Future:
+        return cls.submit(cls.register_patient, user_id, password, name)
+
+# --- Servidor de cola compartida ---
+
+class QueueServer:
+    # Único proceso dueño de la cola. Protocolo: una línea JSON por mensaje,
+    # {"id", "op", "args"} o una lista de ellos (lote). Cada respuesta lleva la
+    # versión y el tamaño de la cola; los suscriptores reciben {"event":
+    # "changed", "changes": [[evento, patient_id], ...]} con los cambios de
+    # cada vuelta del loop, vengan de un mensaje TCP o de la API HTTP.
+    def __init__(self, queue: Optional[SpecialtyDispatcher] = None):
+        self.queue = queue if queue is not None else SpecialtyDispatcher()
+        self._subscribers = set()
+        self._changes = []
+        self._loop = None
+        self.queue.subscribe(self._on_change)
+    
+    async def serve(self, host: str = QUEUE_SERVER_HOST, port: int = QUEUE_SERVER_PORT) -> None:
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                
+                version = self.queue.version
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    message = None
+                if isinstance(message, list):
+                    response = [self._dispatch(request, writer) for request in message]
+                else:
+                    response = self._dispatch(message, writer)
+                
+                # Commit agrupado: se responde recién cuando el WAL hizo fsync
+                if self.queue.version != version and self.queue.journal:
+                    await asyncio.wrap_future(self.queue.journal.durable())
+                
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+    
+    def _dispatch(self, request, writer: asyncio.StreamWriter) -> Dict:
+        # Cualquier línea recibe respuesta: un JSON inválido, algo que no es
+        # un objeto o argumentos mal formados se contestan con ok: false
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("La solicitud debe ser un objeto JSON")
+            args = request.get("args", {})
+            if not isinstance(args, dict):
+                raise ValueError("args debe ser un objeto JSON")
+            response["result"] = self._execute(request["op"], args, writer)
+            response["ok"] = True
+        except (ValueError, KeyError, TypeError) as e:
+            response["ok"] = False
+            response["error"] = str(e)
+        response["version"] = self.queue.version
+        response["size"] = len(self.queue)
+        return response
+    
+    def _execute(self, op: str, args: Dict, writer: asyncio.StreamWriter):
+        if op == "add":
+            self.queue.add_patient(MedicalTurn.from_dict(args["turn"]))
+            return None
+        if op == "add_many":
+            return self.queue.add_patients(MedicalTurn.from_dict(turn) for turn in args["turns"])
+        if op == "next":
+            patient = self.queue.next_patient(args.get("specialty"), args.get("doctor"))
+            return patient.to_dict() if patient else None
+        if op == "next_many":
+            return [patient.to_dict() for patient in self.queue.next_patients(args["count"], args.get("specialty"))]
+        if op == "cancel":
+            return self.queue.cancel_turn(args["patient_id"])
+        if op == "estimated_wait":
+            return self.queue.estimated_wait(args["patient_id"])
+        if op == "position":
+            return self.queue.position_of(args["patient_id"])
+        if op == "patient_status":
+            return self.queue.patient_status(args["patient_id"])
+        if op == "update_priority":
+            return self.queue.update_priority(args["patient_id"], PriorityLevel[args["level"]])
+        if op == "status":
+            return self.queue.get_queue_status(args.get("offset", 0), args.get("limit"))
+        if op == "changes_since":
+            return self.queue.changes_since(args["version"])
+        if op == "subscribe":
+            self._subscribers.add(writer)
+            return None
+        if op == "ping":
+            return None
+        raise ValueError(f"Operación desconocida: {op}")
+    
+    def _on_change(self, event: QueueEvent, patient_id: str) -> None:
+        # El primer cambio de una tanda agenda el aviso; los que llegan antes
+        # de que salga viajan en el mismo evento
+        self._changes.append([event.value, patient_id])
+        if len(self._changes) == 1 and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule_notify)
+    
+    def _schedule_notify(self) -> None:
+        # Como las respuestas, los avisos salen recién cuando el WAL hizo fsync
+        if self.queue.journal:
+            asyncio.wrap_future(self.queue.journal.durable()).add_done_callback(lambda _: self._notify())
+        else:
+            self._notify()
+    
+    def _notify(self) -> None:
+        if not self._changes:
+            return
+        event = json.dumps({
+            "event": "changed",
+            "version": self.queue.version,
+            "size": len(self.queue),
+            "changes": self._changes
+        }).encode() + b"\n"
+        self._changes = []
+        for writer in list(self._subscribers):
+            if writer.is_closing():
+                self._subscribers.discard(writer)
+            else:
+                writer.write(event)
+
+class QueueClient(QueueEventPublisher):
+    # Cliente liviano con la misma interfaz que SpecialtyDispatcher. Un hilo lector
+    # reparte las respuestas a sus Future por id y publica los cambios que
+    # empuja el servidor a los suscriptores locales.
+    def __init__(self, host: str = QUEUE_SERVER_HOST, port: int = QUEUE_SERVER_PORT,
+                 timeout: float = QUEUE_CLIENT_TIMEOUT):
+        self.timeout = timeout
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.settimeout(None)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {}
+        self._version = 0
+        self._size = 0
+        self._subscribers = []
+        
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        self._call("ping")
+    
+    def add_patient(self, patient: MedicalTurn) -> None:
+        self._call("add", turn=patient.to_dict())
+    
+    def add_patients(self, patients: Iterable[MedicalTurn]) -> int:
+        return self._call("add_many", turns=[patient.to_dict() for patient in patients])
+    
+    def next_patient(self, specialty: Optional[str] = None, doctor: Optional[str] = None) -> Optional[MedicalTurn]:
+        data = self._call("next", specialty=specialty, doctor=doctor)
+        return MedicalTurn.from_dict(data) if data else None
+    
+    def next_patients(self, count: int, specialty: Optional[str] = None) -> List[MedicalTurn]:
+        return [MedicalTurn.from_dict(data) for data in self._call("next_many", count=count, specialty=specialty)]
+    
+    def cancel_turn(self, patient_id: str) -> bool:
+        return self._call("cancel", patient_id=patient_id)
+    
+    def estimated_wait(self, patient_id: str) -> Optional[float]:
+        return self._call("estimated_wait", patient_id=patient_id)
+    
+    def position_of(self, patient_id: str) -> Optional[int]:
+        return self._call("position", patient_id=patient_id)
+    
+    def patient_status(self, patient_id: str) -> Optional[Dict]:
+        return self._call("patient_status", patient_id=patient_id)
+    
+    def update_priority(self, patient_id: str, level: PriorityLevel) -> bool:
+        return self._call("update_priority", patient_id=patient_id, level=level.name)
+    
+    def get_queue_status(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        return self._call("status", offset=offset, limit=limit)
+    
+    def changes_since(self, version: int):
+        return self._call("changes_since", version=version)
+    
+    def subscribe(self, callback: Callable[[QueueEvent, str], None]) -> Callable[[], None]:
+        # El servidor empieza a empujar cambios con el primer suscriptor
+        if not self._subscribers:
+            self._call("subscribe")
+        return super().subscribe(callback)
+    
+    def batch(self, requests: List[Tuple[str, Dict]]) -> List:
+        # Envía varias operaciones en un solo mensaje; devuelve un resultado
+        # (o la excepción ValueError) por operación
+        messages = [{"id": next(self._ids), "op": op, "args": args} for op, args in requests]
+        futures = [self._register(message["id"]) for message in messages]
+        self._send(messages)
+        return [self._result(future, raise_errors=False) for future in futures]
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def close(self) -> None:
+        self._sock.close()
+    
+    def _call(self, op: str, **args):
+        message = {"id": next(self._ids), "op": op, "args": args}
+        future = self._register(message["id"])
+        self._send(message)
+        return self._result(future)
+    
+    def _register(self, request_id: int) -> Future:
+        future = Future()
+        self._pending[request_id] = future
+        return future
+    
+    def _send(self, message) -> None:
+        data = json.dumps(message).encode() + b"\n"
+        with self._send_lock:
+            self._sock.sendall(data)
+    
+    def _result(self, future: Future, raise_errors: bool = True):
+        response = future.result(timeout=self.timeout)
+        if response["ok"]:
+            return response["result"]
+        error = ValueError(response["error"])
+        if raise_errors:
+            raise error
+        return error
+    
+    def _read_loop(self) -> None:
+        try:
+            for line in self._reader:
+                message = json.loads(line)
+                for response in (message if isinstance(message, list) else [message]):
+                    self._version = response["version"]
+                    self._size = response["size"]
+                    if "event" in response:
+                        for event, patient_id in response.get("changes", []):
+                            self._publish(QueueEvent(event), patient_id)
+                    else:
+                        future = self._pending.pop(response["id"], None)
+                        if future is not None:
+                            future.set_result(response)
+        except (OSError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                future.set_exception(ConnectionError("Conexión con el servidor de cola perdida"))
+            self._pending.clear()
+
+def connect_queue():
+    # Usa el servidor de cola compartida si está levantado; si no, una cola local
+    try:
+        return QueueClient()
+    except OSError:
+        return SpecialtyDispatcher()
+
+def run_queue_server(host: str = QUEUE_SERVER_HOST, port: int = QUEUE_SERVER_PORT) -> None:
+    # Las terminales Tk (protocolo JSON por líneas) y los navegadores (HTTP)
+    # comparten la misma cola en el mismo loop
+    journal = QueueJournal()
+    queue = SpecialtyDispatcher.recover(journal)
+    print(f"Servidor de cola escuchando en {host}:{port} ({len(queue)} turnos recuperados)")
+    print(f"API web en http://{HTTP_HOST}:{HTTP_PORT}/")
+    
+    async def serve_all():
+        await asyncio.gather(QueueServer(queue).serve(host, port), HttpApiServer(queue).serve())
+    
+    try:
+        asyncio.run(serve_all())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.checkpoint()
+        journal.close()
+
+# --- API HTTP para los front-ends web ---
+
+@dataclass
+class HttpResponse:
+    status: int
+    body: bytes = b""
+    content_type: str = "application/json"
+    headers: Dict[str, str] = field(default_factory=dict)
+    gzipped: Optional[bytes] = None
+
+class HttpApiServer:
+    # API REST + Server-Sent Events sobre la misma cola que QueueServer, para
+    # los front-ends HTML/JS. HTTP/1.1 con keep-alive; los JSON grandes van
+    # con gzip si el navegador lo acepta. La foto de la cola se serializa y
+    # comprime una sola vez por versión y lleva ETag: los kioscos que ya la
+    # tienen reciben 304 sin cuerpo. Las sesiones son tokens en memoria que
+    # se obtienen con /api/login.
+    STATUS_TEXT = {
+        200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified",
+        400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+        405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+        500: "Internal Server Error", 503: "Service Unavailable"
+    }
+    CONTENT_TYPES = {
+        ".html": "text/html; charset=utf-8",
+        ".js": "application/javascript; charset=utf-8",
+        ".css": "text/css; charset=utf-8"
+    }
+    CORS_HEADERS = {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "GET, POST, DELETE, OPTIONS",
+        "Access-Control-Allow-Headers": "Content-Type, Authorization, If-None-Match",
+        "Access-Control-Expose-Headers": "ETag"
+    }
+    
+    def __init__(self, queue: Optional[SpecialtyDispatcher] = None, static_dir: str = HTTP_STATIC_DIR):
+        self.queue = queue if queue is not None else SpecialtyDispatcher()
+        self.static_dir = os.path.realpath(static_dir)
+        self.requests = 0
+        self._sessions: Dict[str, Dict] = {}
+        # El ETag incluye un prefijo por proceso: las versiones se reinician
+        # al recuperar la cola y no deben validar fotos de otra ejecución
+        self._etag_prefix = secrets.token_hex(4)
+        self._snapshot = None
+        self._streams = set()
+        self._changes = []
+        self._loop = None
+        self.queue.subscribe(self._on_change)
+    
+    async def serve(self, host: str = HTTP_HOST, port: int = HTTP_PORT) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+    
+    async def start(self, host: str = HTTP_HOST, port: int = HTTP_PORT) -> asyncio.AbstractServer:
+        self._loop = asyncio.get_running_loop()
+        return await asyncio.start_server(self._handle_client, host, port)
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body, keep_alive = request
+                self.requests += 1
+                
+                if method == "GET" and path == "/api/eventos":
+                    await self._stream_events(reader, writer)
+                    break
+                
+                version = self.queue.version
+                try:
+                    response = await self._route(method, path, query, headers, body)
+                except (ValueError, KeyError) as e:
+                    response = self._json(400, {"ok": False, "message": str(e)})
+                except Exception as e:
+                    # Un error inesperado no corta la conexión sin respuesta
+                    print(f"Error atendiendo {method} {path}: {e!r}", file=sys.stderr)
+                    response = self._json(500, {"ok": False, "message": "Error interno del servidor"})
+                
+                # Igual que en QueueServer: lo que modifica la cola se responde
+                # recién cuando el WAL hizo fsync
+                if self.queue.version != version and self.queue.journal:
+                    await asyncio.wrap_future(self.queue.journal.durable())
+                writer.write(self._encode(response, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._streams.discard(writer)
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return None
+        
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        
+        length = int(headers.get("content-length", 0))
+        if length > HTTP_MAX_BODY:
+            raise ValueError("Cuerpo demasiado grande")
+        body = await reader.readexactly(length) if length else b""
+        
+        path, _, query_string = target.partition("?")
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, urllib.parse.unquote(path), dict(urllib.parse.parse_qsl(query_string)), headers, body, keep_alive
+    
+    async def _route(self, method: str, path: str, query: Dict, headers: Dict, body: bytes) -> HttpResponse:
+        if method == "OPTIONS":
+            return HttpResponse(204)
+        if not path.startswith("/api/"):
+            return self._static(method, path)
+        
+        parts = path.strip("/").split("/")[1:]
+        if not parts:
+            return self._json(404, {"ok": False, "message": "Recurso inexistente"})
+        data = json.loads(body) if body else {}
+        if not isinstance(data, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON")
+        session = self._sessions.get(headers.get("authorization", "").removeprefix("Bearer ").strip())
+        
+        if parts == ["login"] and method == "POST":
+            return await self._login(data)
+        if parts == ["registro"] and method == "POST":
+            return await self._register(data)
+        if parts == ["logout"] and method == "POST":
+            self._sessions.pop(headers.get("authorization", "").removeprefix("Bearer ").strip(), None)
+            return HttpResponse(204)
+        if parts == ["cola"] and method == "GET":
+            return self._queue_status(query, headers)
+        if parts == ["cola", "cambios"] and method == "GET":
+            return self._json(200, {"result": self.queue.changes_since(int(query["desde"]))})
+        
+        # El resto requiere sesión
+        if session is None:
+            return self._json(401, {"ok": False, "message": "Inicie sesión"})
+        staff = session["staff"]
+        
+        if parts[0] == "turnos" and len(parts) == 2 and method == "GET":
+            if not staff and parts[1] != session["user_id"]:
+                return self._json(403, {"ok": False, "message": "Solo puede consultar su propio turno"})
+            status = self.queue.patient_status(parts[1])
+            return self._json(200, status) if status else self._json(404, {"ok": False, "message": "Sin turno en espera"})
+        
+        if parts == ["turnos"] and method == "POST":
+            patient_id = self._text(data, "patient_id", session["user_id"]) if staff else session["user_id"]
+            name = self._text(data, "name", session["name"]) if staff else session["name"]
+            patient = MedicalTurn(
+                patient_id=patient_id,
+                name=name,
+                priority=self._priority(data["priority"]),
+                specialty=self._text(data, "specialty") or GENERAL_SPECIALTY
+            )
+            try:
+                self.queue.add_patient(patient)
+            except ValueError as e:
+                return self._json(409, {"ok": False, "message": str(e)})
+            return self._json(201, self.queue.patient_status(patient_id))
+        if parts[0] == "turnos" and len(parts) == 2 and method == "DELETE":
+            if not staff and parts[1] != session["user_id"]:
+                return self._json(403, {"ok": False, "message": "Solo puede cancelar su propio turno"})
+            if not self.queue.cancel_turn(parts[1]):
+                return self._json(404, {"ok": False, "message": "Sin turno en espera"})
+            return HttpResponse(204)
+        
+        if not staff:
+            return self._json(403, {"ok": False, "message": "Operación reservada al personal"})
+        if parts[0] == "turnos" and len(parts) == 3 and parts[2] == "prioridad" and method == "POST":
+            if not self.queue.update_priority(parts[1], self._priority(data["priority"])):
+                return self._json(404, {"ok": False, "message": "El paciente ya no está en espera"})
+            return self._json(200, self.queue.patient_status(parts[1]))
+        if parts == ["siguiente"] and method == "POST":
+            specialty = self._text(data, "specialty") or specialty_for_role(session.get("role"))
+            patient = self.queue.next_patient(specialty, session["user_id"])
+            return self._json(200, {"patient": patient.to_dict() if patient else None})
+        return self._json(404, {"ok": False, "message": "Recurso inexistente"})
+    
+    async def _login(self, data: Dict) -> HttpResponse:
+        if not isinstance(data.get("user_id"), str) or not isinstance(data.get("password"), str):
+            return self._json(400, {"ok": False, "message": "Documento y contraseña son requeridos"})
+        staff = bool(data.get("staff"))
+        try:
+            success, message, user_data = await asyncio.wrap_future(
+                AuthSystem.login_async(data["user_id"], data["password"], staff)
+            )
+        except RuntimeError as e:
+            return self._json(503, {"ok": False, "message": str(e)})
+        if not success:
+            return self._json(401, {"ok": False, "message": message})
+        
+        token = secrets.token_urlsafe(24)
+        self._sessions[token] = {**user_data, "staff": staff}
+        return self._json(200, {"ok": True, "message": message, "token": token, "user": user_data, "staff": staff})
+    
+    async def _register(self, data: Dict) -> HttpResponse:
+        if (not all(isinstance(data.get(key), str) for key in ("user_id", "password", "name"))
+                or len(data["user_id"]) < 8 or not data["password"] or not data["name"]):
+            return self._json(400, {"ok": False, "message": "Complete todos los campos (documento de al menos 8 caracteres)"})
+        try:
+            success, message = await asyncio.wrap_future(
+                AuthSystem.register_patient_async(data["user_id"], data["password"], data["name"])
+            )
+        except RuntimeError as e:
+            return self._json(503, {"ok": False, "message": str(e)})
+        return self._json(201 if success else 409, {"ok": success, "message": message})
+    
+    def _queue_status(self, query: Dict, headers: Dict) -> HttpResponse:
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+        version = self.queue.version
+        etag = f'"{self._etag_prefix}-{version}-{offset}-{limit}"'
+        if headers.get("if-none-match") == etag:
+            return HttpResponse(304, headers={"ETag": etag})
+        
+        if offset == 0 and limit is None:
+            # Foto completa: una serialización y una compresión por versión
+            if self._snapshot is None or self._snapshot[0] != version:
+                body = self._dumps({"version": version, "size": len(self.queue), "rows": self.queue.get_queue_status()})
+                self._snapshot = (version, body, gzip.compress(body, HTTP_GZIP_LEVEL))
+            return HttpResponse(200, self._snapshot[1], headers={"ETag": etag}, gzipped=self._snapshot[2])
+        
+        rows = self.queue.get_queue_status(offset, limit)
+        return HttpResponse(200, self._dumps({"version": version, "size": len(self.queue), "rows": rows}), headers={"ETag": etag})
+    
+    def _static(self, method: str, path: str) -> HttpResponse:
+        if method != "GET":
+            return self._json(405, {"ok": False, "message": "Método no permitido"})
+        filename = os.path.realpath(os.path.join(self.static_dir, path.lstrip("/") or "index.html"))
+        extension = os.path.splitext(filename)[1]
+        if not filename.startswith(self.static_dir + os.sep) or extension not in self.CONTENT_TYPES or not os.path.isfile(filename):
+            return self._json(404, {"ok": False, "message": "Recurso inexistente"})
+        with open(filename, "rb") as f:
+            return HttpResponse(200, f.read(), self.CONTENT_TYPES[extension])
+    
+    async def _stream_events(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Server-Sent Events: un "changed" por tanda de cambios y un
+        # comentario cada SSE_HEARTBEAT_SECONDS para mantener viva la conexión
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache", "Connection: keep-alive"]
+        head += [f"{name}: {value}" for name, value in self.CORS_HEADERS.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+        writer.write(self._sse_event({"version": self.queue.version, "size": len(self.queue), "changes": []}))
+        await writer.drain()
+        
+        self._streams.add(writer)
+        while True:
+            try:
+                if not await asyncio.wait_for(reader.read(1024), SSE_HEARTBEAT_SECONDS):
+                    break
+            except asyncio.TimeoutError:
+                writer.write(b": ping\n\n")
+                await writer.drain()
+    
+    def _on_change(self, event: QueueEvent, patient_id: str) -> None:
+        # Los cambios de una misma vuelta del loop salen en un solo evento
+        self._changes.append([event.value, patient_id])
+        if len(self._changes) == 1 and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_changes)
+    
+    def _flush_changes(self) -> None:
+        changes, self._changes = self._changes, []
+        if not self._streams:
+            return
+        message = self._sse_event({"version": self.queue.version, "size": len(self.queue), "changes": changes})
+        for writer in list(self._streams):
+            if writer.is_closing():
+                self._streams.discard(writer)
+            else:
+                writer.write(message)
+    
+    def _encode(self, response: HttpResponse, request_headers: Dict, keep_alive: bool) -> bytes:
+        body = response.body
+        headers = {**self.CORS_HEADERS, **response.headers}
+        if body and response.status != 304:
+            headers["Content-Type"] = response.content_type
+            if len(body) >= HTTP_GZIP_MIN_BYTES and "gzip" in request_headers.get("accept-encoding", ""):
+                body = response.gzipped if response.gzipped is not None else gzip.compress(body, HTTP_GZIP_LEVEL)
+                headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        headers["Content-Length"] = str(len(body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        
+        lines = [f"HTTP/1.1 {response.status} {self.STATUS_TEXT[response.status]}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+    
+    def _json(self, status: int, data) -> HttpResponse:
+        return HttpResponse(status, self._dumps(data))
+    
+    @staticmethod
+    def _dumps(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    
+    def _sse_event(self, data: Dict) -> bytes:
+        return b"event: changed\ndata: " + self._dumps(data) + b"\n\n"
+    
+    @staticmethod
+    def _priority(value) -> PriorityLevel:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError("Prioridad inválida")
+        return PriorityLevel(int(value)) if str(value).isdigit() else PriorityLevel[value]
+    
+    @staticmethod
+    def _text(data: Dict, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = data.get(key, default)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"El campo {key} debe ser texto")
+        return value
 
 # --- Frontend ---
 
+class UITask:
+    def __init__(self, future: Future, on_success, on_error, busy: bool, cancellable: bool = False):
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        self.busy = busy
+        self.cancellable = cancellable
+        self.cancelled = False
+    
+    def cancel(self) -> bool:
+        # Solo las consultas se pueden cancelar: si ya empezó a correr no se
+        # puede frenar, pero su resultado se descarta. Las operaciones que
+        # modifican la cola siempre entregan su resultado, porque el cambio
+        # ocurre igual aunque nadie lo espere
+        if not self.cancellable:
+            return False
+        self.cancelled = True
+        self.future.cancel()
+        return True
+
+class UITaskRunner:
+    # Ejecuta las llamadas al backend (AuthSystem, HospitalQueue) en hilos de
+    # trabajo y devuelve los resultados al hilo de Tk sondeando con root.after.
+    # Con max_workers=1 las operaciones sobre una cola local quedan serializadas.
+    POLL_MS = 16
+    
+    def __init__(self, root, max_workers: int = 1, busy_var: Optional[tk.StringVar] = None):
+        self.root = root
+        self.busy_var = busy_var
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui")
+        self._active = set()
+        self._done = queue_module.SimpleQueue()
+        self._polling = False
+    
+    def run(self, func, *args, on_success=None, on_error=None, busy: bool = True,
+            cancellable: bool = False) -> UITask:
+        return self.watch(self._executor.submit(func, *args), on_success, on_error, busy, cancellable)
+    
+    def watch(self, future: Future, on_success=None, on_error=None, busy: bool = True,
+              cancellable: bool = False) -> UITask:
+        # También sirve para futures creados por otros pools (p. ej. el de AuthSystem)
+        task = UITask(future, on_success, on_error, busy, cancellable)
+        self._active.add(task)
+        future.add_done_callback(lambda _: self._done.put(task))
+        self._update_busy()
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return task
+    
+    def cancel_all(self) -> None:
+        # Las tareas no cancelables (y los refrescos en segundo plano) siguen
+        # activas y sus callbacks se llaman al terminar
+        for task in list(self._active):
+            if task.busy and task.cancel():
+                self._active.discard(task)
+        self._update_busy()
+    
+    def _poll(self) -> None:
+        while True:
+            try:
+                task = self._done.get_nowait()
+            except queue_module.Empty:
+                break
+            if task not in self._active:
+                continue
+            self._active.discard(task)
+            self._update_busy()
+            if task.cancelled or task.future.cancelled():
+                continue
+            
+            error = task.future.exception()
+            if error is None:
+                if task.on_success:
+                    task.on_success(task.future.result())
+            elif task.on_error:
+                task.on_error(error)
+            else:
+                messagebox.showerror("Error", str(error))
+        
+        if self._active:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+    
+    def _update_busy(self) -> None:
+        busy = any(task.busy for task in self._active)
+        self.root.config(cursor="watch" if busy else "")
+        if self.busy_var is not None:
+            self.busy_var.set("Procesando... (Esc para cancelar)" if busy else "")
+
+class QueueEventBridge:
+    # Lleva los eventos de la cola (publicados en hilos de trabajo o en el
+    # hilo lector del cliente) al mainloop de Tk, agrupados por cuadro: el
+    # primer evento programa una entrega a frame_ms y los que llegan antes se
+    # suman a ella. Sin cambios no hay ningún timer activo. Con un Tcl sin
+    # soporte de hilos root.after no puede llamarse desde otro hilo: los
+    # eventos del propio mainloop se programan igual y los de otros hilos se
+    # recogen con un sondeo que arranca en frame_ms y se duplica mientras no
+    # haya nada, hasta IDLE_MAX_MS.
+    FRAME_MS = 16
+    IDLE_MAX_MS = 500
+    
+    def __init__(self, root, queue, callback: Callable[[List[Tuple[QueueEvent, str]]], None],
+                 frame_ms: int = FRAME_MS):
+        self.root = root
+        self.callback = callback
+        self.frame_ms = frame_ms
+        self._pending = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._threaded = bool(root.tk.call("info", "exists", "tcl_platform(threaded)"))
+        self._tk_thread = threading.get_ident()
+        self._poll_interval = frame_ms
+        self._poll_id = None
+        self._unsubscribe = queue.subscribe(self._on_event)
+        if not self._threaded:
+            self._poll_id = self.root.after(self.frame_ms, self._poll)
+    
+    def close(self) -> None:
+        self._unsubscribe()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+    
+    def _on_event(self, event: QueueEvent, patient_id: str) -> None:
+        with self._lock:
+            self._pending.append((event, patient_id))
+            if self._scheduled:
+                return
+            if not self._threaded and threading.get_ident() != self._tk_thread:
+                return
+            self._scheduled = True
+        self.root.after(self.frame_ms, self._flush)
+    
+    def _flush(self) -> None:
+        with self._lock:
+            events, self._pending = self._pending, []
+            self._scheduled = False
+        if events:
+            self.callback(events)
+    
+    def _poll(self) -> None:
+        with self._lock:
+            busy = bool(self._pending)
+        self._flush()
+        self._poll_interval = self.frame_ms if busy else min(self._poll_interval * 2, self.IDLE_MAX_MS)
+        self._poll_id = self.root.after(self._poll_interval, self._poll)
+
+class QueueTable:
+    # Treeview de la cola que se reconcilia con el registro de cambios de
+    # HospitalQueue: solo inserta, mueve, actualiza o borra las filas que
+    # cambiaron desde el último refresco. Con un UITaskRunner la lectura de
+    # la cola corre en su hilo y solo la actualización del Treeview queda en
+    # el mainloop.
+    PRIORITY_TAGS = {"CRITICAL": "critical", "URGENT": "urgent", "REGULAR": "regular"}
+    
+    def __init__(self, parent, column_width: int, tasks: Optional[UITaskRunner] = None):
+        columns = ("id", "name", "priority", "specialty", "status", "time")
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings")
+        
+        self.tree.heading("id", text="Documento")
+        self.tree.heading("name", text="Nombre")
+        self.tree.heading("priority", text="Prioridad")
+        self.tree.heading("specialty", text="Especialidad")
+        self.tree.heading("status", text="Estado")
+        self.tree.heading("time", text="Hora Registro")
+        
+        for col in columns:
+            self.tree.column(col, width=column_width, anchor=tk.W)
+        
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Configurar tags para colores
+        self.tree.tag_configure("critical", background="#dc3545", foreground="white")
+        self.tree.tag_configure("urgent", background="#fd7e14")
+        self.tree.tag_configure("regular", background="#ffc107")
+        
+        self.tasks = tasks
+        self.size = 0
+        self._items = {}
+        self._version = None
+        self._refreshing = False
+        self._refresh_again = None
+    
+    def refresh(self, queue, on_done=None) -> None:
+        if self.tasks is None:
+            self._apply(self._fetch(queue, self._fetch_state()))
+            if on_done:
+                on_done()
+            return
+        
+        # Si ya hay un refresco en curso se agenda uno solo al terminar
+        if self._refreshing:
+            self._refresh_again = (queue, on_done)
+            return
+        self._refreshing = True
+        
+        def finished(payload):
+            self._refreshing = False
+            self._apply(payload)
+            if on_done:
+                on_done()
+            if self._refresh_again:
+                pending, self._refresh_again = self._refresh_again, None
+                self.refresh(*pending)
+        
+        def failed(error):
+            self._refreshing = False
+            self._refresh_again = None
+            messagebox.showerror("Error", f"No se pudo actualizar la cola: {error}")
+        
+        self.tasks.run(self._fetch, queue, self._fetch_state(), on_success=finished, on_error=failed, busy=False)
+    
+    def _fetch_state(self):
+        return self._version
+    
+    @staticmethod
+    def _fetch(queue, version):
+        # Corre fuera del mainloop: no toca widgets
+        changes = None if version is None else queue.changes_since(version)
+        if changes is None:
+            current = queue.version
+            return len(queue), ("full", current, queue.get_queue_status())
+        return len(queue), ("diff", changes)
+    
+    def _apply(self, payload) -> None:
+        self.size, (kind, *data) = payload
+        if kind == "full":
+            self._rebuild(*data)
+            return
+        
+        self._version, removed, updated = data[0]
+        
+        for patient_id in removed:
+            item = self._items.pop(patient_id, None)
+            if item is not None:
+                self.tree.delete(item)
+        
+        # Se separan primero las filas cambiadas; las que quedan ya están en
+        # orden relativo correcto y cada reinserción en orden ascendente cae
+        # en su posición final
+        for _, row in updated:
+            item = self._items.get(row["patient_id"])
+            if item is not None:
+                self.tree.detach(item)
+        
+        for index, row in updated:
+            item = self._items.get(row["patient_id"])
+            if item is None:
+                self._items[row["patient_id"]] = self.tree.insert(
+                    "", index, values=self._values(row), tags=self._tags(row)
+                )
+            else:
+                self.tree.item(item, values=self._values(row), tags=self._tags(row))
+                self.tree.move(item, "", index)
+    
+    def _rebuild(self, version: int, rows: List[Dict]) -> None:
+        self.tree.delete(*self.tree.get_children())
+        self._items.clear()
+        self._version = version
+        
+        for row in rows:
+            self._items[row["patient_id"]] = self.tree.insert(
+                "", tk.END, values=self._values(row), tags=self._tags(row)
+            )
+    
+    @staticmethod
+    def _values(row: Dict) -> Tuple:
+        return (row["patient_id"], row["name"], row["priority"], row["specialty"], row["status"], row["timestamp"])
+    
+    def _tags(self, row: Dict) -> Tuple:
+        return (self.PRIORITY_TAGS.get(row["priority"], "regular"),)
+    
+    def selected_patient(self) -> Optional[str]:
+        selection = self.tree.selection()
+        return self.tree.item(selection[0], "values")[0] if selection else None
+
+class VirtualQueueTable(QueueTable):
+    # Tabla con scroll virtual: solo existen visible_rows items en el Treeview,
+    # que se reutilizan al desplazarse. Las filas se piden por rango a la cola
+    # (get_queue_status(offset, limit)) con un margen de buffer_rows a cada lado.
+    def __init__(self, parent, column_width: int, tasks: Optional[UITaskRunner] = None,
+                 visible_rows: int = 25, buffer_rows: int = 50):
+        super().__init__(parent, column_width, tasks)
+        self.visible_rows = visible_rows
+        self.buffer_rows = buffer_rows
+        self.tree.configure(height=visible_rows)
+        self.tree.pack_configure(side=tk.LEFT)
+        
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, before=self.tree)
+        
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll_by(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(1, "units"))
+        # Los items se reutilizan para otras filas: la selección se guarda por
+        # documento y se vuelve a aplicar en cada redibujado
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self._selected_id = None
+        
+        self._slots = [self.tree.insert("", tk.END) for _ in range(visible_rows)]
+        self.tree.detach(*self._slots)
+        self._source = None
+        self._offset = 0
+        self._cache = []
+        self._cache_start = 0
+    
+    def refresh(self, queue, on_done=None) -> None:
+        self._source = queue
+        super().refresh(queue, on_done)
+    
+    def _fetch_state(self):
+        return self._offset, self._cache_start, len(self._cache), self._version
+    
+    def _fetch(self, queue, state):
+        offset, cache_start, cache_size, version = state
+        total = len(queue)
+        offset = max(0, min(offset, total - self.visible_rows))
+        
+        current = queue.version
+        if current == version and self._window_cached(offset, total, cache_start, cache_size):
+            return total, offset, None
+        
+        cache_start = max(0, offset - self.buffer_rows)
+        rows = queue.get_queue_status(cache_start, self.visible_rows + 2 * self.buffer_rows)
+        return total, offset, (current, cache_start, rows)
+    
+    def _apply(self, payload) -> None:
+        self.size, self._offset, cache = payload
+        if cache is not None:
+            self._version, self._cache_start, self._cache = cache
+        self._render()
+    
+    def _window_cached(self, offset: int, total: int, cache_start: int, cache_size: int) -> bool:
+        return cache_start <= offset and min(offset + self.visible_rows, total) <= cache_start + cache_size
+    
+    def _render(self) -> None:
+        selected = ()
+        for slot_index, slot in enumerate(self._slots):
+            cache_index = self._offset + slot_index - self._cache_start
+            if 0 <= cache_index < len(self._cache):
+                row = self._cache[cache_index]
+                self.tree.item(slot, values=self._values(row), tags=self._tags(row))
+                self.tree.move(slot, "", slot_index)
+                if row["patient_id"] == self._selected_id:
+                    selected = (slot,)
+            else:
+                self.tree.detach(slot)
+        
+        # El paciente elegido queda marcado solo mientras está en la ventana
+        if self.tree.selection() != selected:
+            self.tree.selection_set(selected)
+        
+        if self.size:
+            self.scrollbar.set(self._offset / self.size, min(1.0, (self._offset + self.visible_rows) / self.size))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _on_scroll(self, action, *args) -> None:
+        if action == tk.MOVETO:
+            self._scroll_to(int(float(args[0]) * self.size))
+        elif action == tk.SCROLL:
+            self._scroll_by(int(args[0]), args[1])
+    
+    def _scroll_by(self, amount: int, what: str) -> None:
+        step = self.visible_rows if what == tk.PAGES else 1
+        self._scroll_to(self._offset + amount * step)
+    
+    def _scroll_to(self, offset: int) -> None:
+        if self._source is None:
+            return
+        self._offset = max(0, min(offset, self.size - self.visible_rows))
+        # Dentro de la ventana en caché se redibuja sin consultar la cola
+        if self._window_cached(self._offset, self.size, self._cache_start, len(self._cache)):
+            self._render()
+        else:
+            self.refresh(self._source)
+    
+    def _on_select(self, _) -> None:
+        # Una selección vacía puede venir del propio _render; solo un clic
+        # sobre una fila cambia el paciente elegido
+        selection = self.tree.selection()
+        if selection:
+            self._selected_id = self.tree.item(selection[0], "values")[0]
+    
+    def selected_patient(self) -> Optional[str]:
+        return self._selected_id if self.tree.selection() else None
+
 class LoginApp:
     def __init__(self, root):
         self.root = root
@@ -146,6 +2917,9 @@ class LoginApp:
         # Variables de control
         self.user_type = tk.StringVar(value=UserType.PATIENT.value)
         self.showing_register = False
+        self.busy_var = tk.StringVar()
+        self.tasks = UITaskRunner(self.root, busy_var=self.busy_var)
+        self.root.bind("<Escape>", lambda e: self.tasks.cancel_all())
         
         # UI
         self.setup_ui()
@@ -155,13 +2929,13 @@ class LoginApp:
         if not os.path.exists(STAFF_DB_FILE):
             staff_db = {
                 "doc123": {
-                    "password": "admin123",
+                    "password": PasswordHasher.hash("admin123"),
                     "name": "Dr. Juan Pérez",
                     "type": UserType.STAFF.value,
                     "role": "Médico"
                 },
                 "doc456": {
-                    "password": "admin456",
+                    "password": PasswordHasher.hash("admin456"),
                     "name": "Dra. María Gómez",
                     "type": UserType.STAFF.value,
                     "role": "Enfermera Jefe"
@@ -213,6 +2987,8 @@ class LoginApp:
             command=self.toggle_form
         )
         self.toggle_form_btn.pack(pady=10)
+        
+        ttk.Label(main_frame, textvariable=self.busy_var).pack()
     
     def setup_login_form(self):
         # Limpiar frame
@@ -288,23 +3064,34 @@ class LoginApp:
                 messagebox.showerror("Error", "Nombre completo es requerido")
                 return
             
-            success, msg = AuthSystem.register_patient(user_id, password, name)
-            if success:
-                messagebox.showinfo("Éxito", msg)
-                self.toggle_form()
-            else:
-                messagebox.showerror("Error", msg)
+            self.tasks.watch(
+                AuthSystem.register_patient_async(user_id, password, name),
+                on_success=lambda result: self.on_registered(*result)
+            )
         else:
             is_staff = self.user_type.get() == UserType.STAFF.value
-            success, msg, user_data = AuthSystem.login(user_id, password, is_staff)
-            
-            if success:
-                messagebox.showinfo("Éxito", msg)
-                self.open_main_app(user_data)
-            else:
-                messagebox.showerror("Error", msg)
+            self.tasks.watch(
+                AuthSystem.login_async(user_id, password, is_staff),
+                on_success=lambda result: self.on_logged_in(*result),
+                cancellable=True
+            )
+    
+    def on_registered(self, success, msg):
+        if success:
+            messagebox.showinfo("Éxito", msg)
+            self.toggle_form()
+        else:
+            messagebox.showerror("Error", msg)
+    
+    def on_logged_in(self, success, msg, user_data):
+        if success:
+            messagebox.showinfo("Éxito", msg)
+            self.open_main_app(user_data)
+        else:
+            messagebox.showerror("Error", msg)
     
     def open_main_app(self, user_data):
+        self.tasks.cancel_all()
         self.root.destroy()
         
         root = tk.Tk()
@@ -321,10 +3108,16 @@ class PatientApp:
         self.root.title(f"Turnos Hospitalarios - Paciente: {user_data['name']}")
         self.root.geometry("800x600")
         
-        self.queue = HospitalQueue()
+        self.queue = connect_queue()
+        # Un solo hilo de trabajo: las operaciones sobre la cola quedan en orden
+        self.busy_var = tk.StringVar()
+        self.tasks = UITaskRunner(self.root, busy_var=self.busy_var)
+        self.root.bind("<Escape>", lambda e: self.tasks.cancel_all())
         
         self.setup_ui()
         self.refresh_queue()
+        # Los cambios de cualquier terminal llegan como eventos: sin sondeo
+        self.queue_events = QueueEventBridge(self.root, self.queue, lambda events: self.refresh_queue())
     
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding=10)
@@ -349,38 +3142,39 @@ class PatientApp:
         ], state="readonly")
         self.priority_combobox.pack(fill=tk.X, pady=5)
         
+        ttk.Label(turn_frame, text="Especialidad:").pack(anchor=tk.W)
+        self.specialty_combobox = ttk.Combobox(turn_frame, values=SPECIALTIES, state="readonly")
+        self.specialty_combobox.set(GENERAL_SPECIALTY)
+        self.specialty_combobox.pack(fill=tk.X, pady=5)
+        
+        buttons_frame = ttk.Frame(turn_frame)
+        buttons_frame.pack(pady=5)
+        
         ttk.Button(
-            turn_frame,
+            buttons_frame,
             text="Solicitar Turno",
             command=self.request_turn
-        ).pack(pady=5)
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(
+            buttons_frame,
+            text="Cancelar mi Turno",
+            command=self.cancel_turn
+        ).pack(side=tk.LEFT, padx=5)
         
         # Panel de cola de espera
         queue_frame = ttk.LabelFrame(main_frame, text="Cola de Espera", padding=10)
         queue_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        columns = ("id", "name", "priority", "status", "time")
-        self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show="headings")
-        
-        self.queue_tree.heading("id", text="Documento")
-        self.queue_tree.heading("name", text="Nombre")
-        self.queue_tree.heading("priority", text="Prioridad")
-        self.queue_tree.heading("status", text="Estado")
-        self.queue_tree.heading("time", text="Hora Registro")
-        
-        for col in columns:
-            self.queue_tree.column(col, width=120, anchor=tk.W)
-        
-        self.queue_tree.pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar tags para colores
-        self.queue_tree.tag_configure("critical", background="#dc3545", foreground="white")
-        self.queue_tree.tag_configure("urgent", background="#fd7e14")
-        self.queue_tree.tag_configure("regular", background="#ffc107")
+        self.queue_table = QueueTable(queue_frame, column_width=120, tasks=self.tasks)
+        self.queue_tree = self.queue_table.tree
         
         # Barra de estado
         self.status_var = tk.StringVar()
-        ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN).pack(fill=tk.X)
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(fill=tk.X)
+        ttk.Label(status_frame, textvariable=self.busy_var).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN).pack(side=tk.LEFT, fill=tk.X, expand=True)
     
     def request_turn(self):
         priority_text = self.priority_combobox.get()
@@ -401,43 +3195,46 @@ class PatientApp:
             patient = MedicalTurn(
                 patient_id=self.user_data['user_id'],
                 name=self.user_data['name'],
-                priority=priority
+                priority=priority,
+                specialty=self.specialty_combobox.get() or GENERAL_SPECIALTY
             )
-            self.queue.add_patient(patient)
-            messagebox.showinfo("Éxito", "Turno registrado correctamente")
-            self.refresh_queue()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        
+        self.tasks.run(self.queue.add_patient, patient, on_success=self.on_turn_requested)
+    
+    def on_turn_requested(self, _):
+        messagebox.showinfo("Éxito", "Turno registrado correctamente")
+    
+    def cancel_turn(self):
+        self.tasks.run(self.queue.cancel_turn, self.user_data['user_id'], on_success=self.on_turn_cancelled)
+    
+    def on_turn_cancelled(self, cancelled):
+        if cancelled:
+            messagebox.showinfo("Éxito", "Turno cancelado correctamente")
+        else:
+            messagebox.showwarning("Error", "No tiene un turno en espera")
     
     def refresh_queue(self):
-        for item in self.queue_tree.get_children():
-            self.queue_tree.delete(item)
-            
-        patients = self.queue.get_queue_status()
-        
-        for patient in patients:
-            priority = patient["priority"]
-            tags = ()
-            
-            if priority == "CRITICAL":
-                tags = ("critical",)
-            elif priority == "URGENT":
-                tags = ("urgent",)
-            else:
-                tags = ("regular",)
-            
-            self.queue_tree.insert("", tk.END, 
-                values=(
-                    patient["patient_id"],
-                    patient["name"],
-                    patient["priority"],
-                    patient["status"],
-                    patient["timestamp"]
-                ),
-                tags=tags
+        self.queue_table.refresh(self.queue, on_done=self.update_status)
+    
+    def update_status(self):
+        self.tasks.run(self.queue.patient_status, self.user_data['user_id'], on_success=self.on_patient_status,
+                       cancellable=True)
+    
+    def on_patient_status(self, status):
+        if status is None:
+            turn_text = "Sin turno en espera"
+        else:
+            turn_text = (
+                f"Su posición: {status['position'] + 1} de {status['size']} | "
+                f"Espera estimada: ~{round(status['estimated_wait'] / 60)} min"
             )
-        
-        self.status_var.set(f"Pacientes en espera: {len(self.queue)} | Última actualización: {datetime.now().strftime('%H:%M:%S')}")
+        self.status_var.set(
+            f"{turn_text} | Pacientes en espera: {self.queue_table.size} | "
+            f"Última actualización: {datetime.now().strftime('%H:%M:%S')}"
+        )
 
 class StaffApp:
     def __init__(self, root, user_data):
@@ -445,11 +3242,19 @@ class StaffApp:
         self.user_data = user_data
         self.root.title(f"Gestión Hospitalaria - {user_data['name']} ({user_data.get('role', 'Staff')})")
         self.root.geometry("1000x700")
+        # Cada médico atiende su especialidad y roba críticos de las demás
+        self.specialty = specialty_for_role(user_data.get('role'))
         
-        self.queue = HospitalQueue()
+        self.queue = connect_queue()
+        # Un solo hilo de trabajo: las operaciones sobre la cola quedan en orden
+        self.busy_var = tk.StringVar()
+        self.tasks = UITaskRunner(self.root, busy_var=self.busy_var)
+        self.root.bind("<Escape>", lambda e: self.tasks.cancel_all())
         
         self.setup_ui()
         self.refresh_queue()
+        # Los cambios de cualquier terminal llegan como eventos: sin sondeo
+        self.queue_events = QueueEventBridge(self.root, self.queue, lambda events: self.refresh_queue())
     
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding=10)
@@ -462,6 +3267,7 @@ class StaffApp:
         ttk.Label(staff_frame, text=f"Nombre: {self.user_data['name']}").pack(anchor=tk.W)
         ttk.Label(staff_frame, text=f"Documento: {self.user_data['user_id']}").pack(anchor=tk.W)
         ttk.Label(staff_frame, text=f"Rol: {self.user_data.get('role', 'No especificado')}").pack(anchor=tk.W)
+        ttk.Label(staff_frame, text=f"Especialidad: {self.specialty}").pack(anchor=tk.W)
         
         # Panel de control
         control_frame = ttk.Frame(main_frame)
@@ -473,88 +3279,304 @@ class StaffApp:
             command=self.attend_next
         ).pack(side=tk.LEFT, padx=5)
         
+        ttk.Label(control_frame, text="Reclasificar seleccionado:").pack(side=tk.LEFT, padx=(20, 5))
+        self.priority_combobox = ttk.Combobox(
+            control_frame,
+            values=[level.name for level in PriorityLevel],
+            state="readonly",
+            width=10
+        )
+        self.priority_combobox.pack(side=tk.LEFT)
+        
         ttk.Button(
             control_frame,
-            text="Actualizar Cola",
-            command=self.refresh_queue
+            text="Reclasificar",
+            command=self.reprioritize_selected
         ).pack(side=tk.LEFT, padx=5)
         
         # Panel de cola de espera
         queue_frame = ttk.LabelFrame(main_frame, text="Cola de Pacientes", padding=10)
         queue_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        columns = ("id", "name", "priority", "status", "time")
-        self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show="headings")
-        
-        self.queue_tree.heading("id", text="Documento")
-        self.queue_tree.heading("name", text="Nombre")
-        self.queue_tree.heading("priority", text="Prioridad")
-        self.queue_tree.heading("status", text="Estado")
-        self.queue_tree.heading("time", text="Hora Registro")
-        
-        for col in columns:
-            self.queue_tree.column(col, width=150, anchor=tk.W)
-        
-        self.queue_tree.pack(fill=tk.BOTH, expand=True)
-        
-        # Configurar tags para colores
-        self.queue_tree.tag_configure("critical", background="#dc3545", foreground="white")
-        self.queue_tree.tag_configure("urgent", background="#fd7e14")
-        self.queue_tree.tag_configure("regular", background="#ffc107")
+        self.queue_table = VirtualQueueTable(queue_frame, column_width=150, tasks=self.tasks)
+        self.queue_tree = self.queue_table.tree
         
         # Barra de estado
         self.status_var = tk.StringVar()
-        ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN).pack(fill=tk.X)
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(fill=tk.X)
+        ttk.Label(status_frame, textvariable=self.busy_var).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN).pack(side=tk.LEFT, fill=tk.X, expand=True)
     
     def attend_next(self):
-        if len(self.queue) == 0:
+        self.tasks.run(
+            self.queue.next_patient, self.specialty, self.user_data['user_id'],
+            on_success=self.on_patient_dispatched
+        )
+    
+    def on_patient_dispatched(self, patient):
+        if patient is None:
             messagebox.showinfo("Info", "No hay pacientes en espera")
             return
-            
-        patient = self.queue.next_patient()
         messagebox.showinfo(
             "Paciente Atendido", 
             f"Atendiendo a:\n\n"
             f"Nombre: {patient.name}\n"
             f"Documento: {patient.patient_id}\n"
             f"Prioridad: {patient.priority.name}\n"
+            f"Especialidad: {patient.specialty}\n"
             f"Hora registro: {patient.timestamp.strftime('%H:%M:%S')}"
         )
-        self.refresh_queue()
     
-    def refresh_queue(self):
-        for item in self.queue_tree.get_children():
-            self.queue_tree.delete(item)
-            
-        patients = self.queue.get_queue_status()
+    def reprioritize_selected(self):
+        patient_id = self.queue_table.selected_patient()
+        level_name = self.priority_combobox.get()
         
-        for patient in patients:
-            priority = patient["priority"]
-            tags = ()
-            
-            if priority == "CRITICAL":
-                tags = ("critical",)
-            elif priority == "URGENT":
-                tags = ("urgent",)
-            else:
-                tags = ("regular",)
-            
-            self.queue_tree.insert("", tk.END, 
-                values=(
-                    patient["patient_id"],
-                    patient["name"],
-                    patient["priority"],
-                    patient["status"],
-                    patient["timestamp"]
-                ),
-                tags=tags
-            )
+        if not patient_id or not level_name:
+            messagebox.showwarning("Error", "Seleccione un paciente y una prioridad")
+            return
         
-        self.status_var.set(f"Pacientes en espera: {len(self.queue)} | Última actualización: {datetime.now().strftime('%H:%M:%S')} | Rol: {self.user_data.get('role', 'Staff')}")
+        self.tasks.run(
+            self.queue.update_priority, patient_id, PriorityLevel[level_name],
+            on_success=self.on_reprioritized
+        )
+    
+    def on_reprioritized(self, updated):
+        if not updated:
+            messagebox.showwarning("Error", "El paciente ya no está en espera")
+    
+    def refresh_queue(self):
+        self.queue_table.refresh(self.queue, on_done=self.update_status)
+    
+    def update_status(self):
+        self.status_var.set(f"Pacientes en espera: {self.queue_table.size} | Última actualización: {datetime.now().strftime('%H:%M:%S')} | Rol: {self.user_data.get('role', 'Staff')}")
+
+# --- Benchmarks ---
+
+def benchmark_login(seconds: float = 3.0) -> None:
+    # Verificaciones de contraseña por segundo con el costo configurado,
+    # secuencial (un núcleo) y con el pool de AuthSystem
+    stored = PasswordHasher.hash("benchmark")
+    
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        PasswordHasher.verify("benchmark", stored)
+        count += 1
+    single = count / (time.perf_counter() - start)
+    
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        futures = [AuthSystem._pool.submit(PasswordHasher.verify, "benchmark", stored) for _ in range(AUTH_WORKERS)]
+        for future in futures:
+            future.result()
+        count += len(futures)
+    pooled = count / (time.perf_counter() - start)
+    
+    print(f"PBKDF2-SHA256, {PASSWORD_HASH_ITERATIONS} iteraciones")
+    print(f"  1 núcleo: {single:.1f} logins/s")
+    print(f"  pool de {AUTH_WORKERS} hilos: {pooled:.1f} logins/s ({pooled / AUTH_WORKERS:.1f} por núcleo)")
+
+def benchmark_turn_memory(count: int = 100000) -> None:
+    # Bytes por turno: registro solo y registro + índices de la cola. La
+    # línea de base es la cola original (dataclass con __dict__, heap de
+    # tuplas (prioridad, float, turno) e índice de pacientes aparte); las
+    # otras dos usan HospitalQueue con el dataclass con __dict__ y con slots
+    import tracemalloc
+    from dataclasses import fields, make_dataclass
+    
+    legacy_turn = make_dataclass(
+        "LegacyTurn", [(f.name, f.type) for f in fields(MedicalTurn)], order=True
+    )
+    levels = list(PriorityLevel)
+    
+    def original_queue(turns):
+        heap = []
+        index = {}
+        for turn in turns:
+            heapq.heappush(heap, (turn.priority.value, turn.timestamp.timestamp(), turn))
+            index[turn.patient_id] = turn
+        return heap, index
+    
+    def current_queue(turns):
+        queue = HospitalQueue()
+        for turn in turns:
+            queue.add_patient(turn)
+        return queue
+    
+    cases = (
+        ("original", legacy_turn, original_queue),
+        ("HospitalQueue, __dict__", legacy_turn, current_queue),
+        ("HospitalQueue, slots", MedicalTurn, current_queue)
+    )
+    for label, turn_class, build in cases:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        turns = [
+            turn_class(f"{i:08d}", f"Paciente {i}", levels[i % 3], PatientStatus.PENDING, datetime.now(), GENERAL_SPECIALTY)
+            for i in range(count)
+        ]
+        records = tracemalloc.get_traced_memory()[0]
+        queue = build(turns)
+        total = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        
+        print(f"{label}: {(records - before) / count:.0f} bytes/turno, "
+              f"{(total - before) / count:.0f} bytes/turno en cola")
+        del turns, queue
+
+def benchmark_concurrency(thread_counts: Iterable[int] = (1, 2, 4, 8, 16, 32, 64), seconds: float = 2.0) -> None:
+    # Stress de ConcurrentHospitalQueue: cada hilo mezcla altas, despachos,
+    # reclasificaciones y cancelaciones; se reporta throughput y latencia p99
+    import random
+    
+    levels = list(PriorityLevel)
+    print(f"{'hilos':>5} {'ops/s':>10} {'p99 (µs)':>10}")
+    for thread_count in thread_counts:
+        queue = ConcurrentHospitalQueue()
+        queue.add_patients(
+            MedicalTurn(f"pre{i:08d}", f"Paciente {i}", levels[i % 3]) for i in range(10000)
+        )
+        latencies = [[] for _ in range(thread_count)]
+        start_barrier = threading.Barrier(thread_count + 1)
+        deadline = [0.0]
+        
+        def worker(index: int) -> None:
+            rng = random.Random(index)
+            samples = latencies[index]
+            own = []
+            counter = 0
+            start_barrier.wait()
+            while time.perf_counter() < deadline[0]:
+                op = rng.random()
+                begin = time.perf_counter()
+                if op < 0.4:
+                    patient_id = f"t{index:03d}-{counter:08d}"
+                    counter += 1
+                    queue.add_patient(MedicalTurn(patient_id, "Paciente", rng.choice(levels)))
+                    own.append(patient_id)
+                elif op < 0.8:
+                    queue.next_patient()
+                elif op < 0.9 and own:
+                    queue.update_priority(own[rng.randrange(len(own))], rng.choice(levels))
+                elif own:
+                    queue.cancel_turn(own.pop())
+                samples.append(time.perf_counter() - begin)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        deadline[0] = time.perf_counter() + seconds
+        start_barrier.wait()
+        for thread in threads:
+            thread.join()
+        
+        samples = sorted(sample for per_thread in latencies for sample in per_thread)
+        p99 = samples[int(len(samples) * 0.99)] if samples else 0.0
+        print(f"{thread_count:>5} {len(samples) / seconds:>10.0f} {p99 * 1000000:>10.1f}")
+
+def benchmark_scheduling(minutes: int = 6000, service_rate: float = 1.3) -> None:
+    # Simulación por minutos: llegadas normales (1/min, mayoría REGULAR) con
+    # una racha en el tercio central (2/min, casi todos CRITICAL/URGENT) y
+    # capacidad de atención fija. Reporta espera media y máxima por nivel para
+    # cada política y el costo por despacho.
+    import random
+    
+    start = datetime(2024, 1, 1).timestamp()
+    
+    for name, policy_class in SCHEDULING_POLICIES.items():
+        rng = random.Random(0)
+        queue = HospitalQueue(policy=policy_class())
+        waits = {level: [] for level in PriorityLevel}
+        dispatch_time = 0.0
+        served = 0.0
+        arrivals = 0
+        minute = 0
+        while minute < minutes or len(queue):
+            now = start + minute * 60
+            if minute < minutes:
+                surge = minutes // 3 <= minute < 2 * minutes // 3
+                for level in rng.choices(
+                    list(PriorityLevel), weights=(45, 45, 10) if surge else (15, 30, 55), k=2 if surge else 1
+                ):
+                    queue.add_patient(MedicalTurn(f"{arrivals:08d}", "Paciente", level, timestamp=datetime.fromtimestamp(now)))
+                    arrivals += 1
+            served += service_rate
+            while served >= 1 and len(queue):
+                served -= 1
+                begin = time.perf_counter()
+                patient = queue.next_patient()
+                dispatch_time += time.perf_counter() - begin
+                waits[patient.priority].append((now - patient.timestamp.timestamp()) / 60)
+            minute += 1
+        
+        summary = ", ".join(
+            f"{level.name} {sum(values) / len(values):.0f}/{max(values):.0f}"
+            for level, values in waits.items() if values
+        )
+        print(f"{name:>15}: {summary} min (media/máx) | {dispatch_time / arrivals * 1000000:.1f} µs/despacho")
+
+def benchmark_http(seconds: float = 3.0, connections: int = 100, queue_size: int = 500) -> None:
+    # Solicitudes por segundo de GET /api/cola con conexiones keep-alive:
+    # foto completa con gzip y revalidación con If-None-Match (304). Cliente y
+    # servidor comparten el loop, así que la cifra es un piso.
+    async def run() -> None:
+        queue = SpecialtyDispatcher()
+        levels = list(PriorityLevel)
+        queue.add_patients(
+            MedicalTurn(f"{i:08d}", f"Paciente {i}", levels[i % 3], specialty=SPECIALTIES[i % len(SPECIALTIES)])
+            for i in range(queue_size)
+        )
+        api = HttpApiServer(queue)
+        server = await api.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        
+        async def client(conditional: bool, deadline: float, counts: List[int]) -> None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            etag = None
+            while time.perf_counter() < deadline:
+                request = "GET /api/cola HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: gzip\r\n"
+                if conditional and etag:
+                    request += f"If-None-Match: {etag}\r\n"
+                writer.write((request + "\r\n").encode())
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+                headers = dict(
+                    (name.lower(), value.strip())
+                    for name, _, value in (line.partition(":") for line in head.split("\r\n")[1:] if line)
+                )
+                counts[1] += len(await reader.readexactly(int(headers["content-length"])))
+                etag = headers.get("etag")
+                counts[0] += 1
+            writer.close()
+        
+        for label, conditional in (("200 + gzip", False), ("304 (ETag)", True)):
+            counts = [0, 0]
+            start = time.perf_counter()
+            await asyncio.gather(*(client(conditional, start + seconds, counts) for _ in range(connections)))
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {counts[0] / elapsed:.0f} req/s, {counts[1] / max(counts[0], 1):.0f} bytes/respuesta "
+                  f"({connections} conexiones, {queue_size} turnos en cola)")
+        server.close()
+    
+    asyncio.run(run())
 
 # --- Punto de entrada ---
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = LoginApp(root)
-    root.mainloop()
\ No newline at end of file
+    if "--servidor" in sys.argv:
+        run_queue_server()
+    elif "--benchmark-login" in sys.argv:
+        benchmark_login()
+    elif "--benchmark-memoria" in sys.argv:
+        benchmark_turn_memory()
+    elif "--benchmark-concurrencia" in sys.argv:
+        benchmark_concurrency()
+    elif "--benchmark-politicas" in sys.argv:
+        benchmark_scheduling()
+    elif "--benchmark-http" in sys.argv:
+        benchmark_http()
+    else:
+        root = tk.Tk()
+        app = LoginApp(root)
+        root.mainloop()
@@ -1,8 +1,12 @@
-const patientsDB = {}; // Simulación de base de datos de pacientes
-const staffDB = {
-    "doc123": { password: "admin123", name: "Dr. Juan Pérez", role: "Médico" },
-    "doc456": { password: "admin456", name: "Dra. María Gómez", role: "Enfermera Jefe" }
-};
+// Los usuarios viven en el backend (python "proyecto 1.2.py" --servidor)
+const API = location.protocol === "file:" ? "http://127.0.0.1:8080" : "";
+
+async function post(path, body, token) {
+    const headers = { "Content-Type": "application/json" };
+    if (token) headers["Authorization"] = `Bearer ${token}`;
+    const res = await fetch(API + path, { method: "POST", headers, body: JSON.stringify(body) });
+    return res.status === 204 ? null : res.json();
+}
 
 function showMessage(message, isError = false) {
     const msgDiv = document.getElementById("message");
@@ -38,7 +42,7 @@ function toggleLogin() {
     document.getElementById("toggle-text").style.display = "block";
 }
 
-function register() {
+async function register() {
     const userId = document.getElementById("user-id").value.trim();
     const password = document.getElementById("password").value;
     const name = document.getElementById("name").value.trim();
@@ -47,20 +51,20 @@ function register() {
         showMessage("Por favor, complete todos los campos.", true);
         return;
     }
-    if (patientsDB[userId] || staffDB[userId]) {
-        showMessage("El ID de usuario ya existe.", true);
-        return;
-    }
     if (userId.length < 8) {
         showMessage("El documento debe tener al menos 8 caracteres.", true);
         return;
     }
-    patientsDB[userId] = { password, name, type: "Paciente" };
-    showMessage("Registro exitoso. Ahora puede iniciar sesión.");
-    toggleLogin();
+    try {
+        const result = await post("/api/registro", { user_id: userId, password, name });
+        showMessage(result.message, !result.ok);
+        if (result.ok) toggleLogin();
+    } catch (e) {
+        showMessage("No se pudo contactar al servidor.", true);
+    }
 }
 
-function login() {
+async function login() {
     const userType = document.getElementById("user-type").value;
     const userId = document.getElementById("user-id").value.trim();
     const password = document.getElementById("password").value;
@@ -70,26 +74,19 @@ function login() {
         return;
     }
 
-    let user = null;
-
-    if (userType === "patient") {
-        user = patientsDB[userId];
-        if (!user) {
-            showMessage("Usuario no encontrado.", true);
-            return;
-        }
-    } else {
-        user = staffDB[userId];
-        if (!user) {
-            showMessage("Personal de salud no encontrado.", true);
-            return;
-        }
+    let result;
+    try {
+        result = await post("/api/login", { user_id: userId, password, staff: userType !== "patient" });
+    } catch (e) {
+        showMessage("No se pudo contactar al servidor.", true);
+        return;
     }
-
-    if (user.password !== password) {
-        showMessage("Contraseña incorrecta.", true);
+    if (!result.ok) {
+        showMessage(result.message, true);
         return;
     }
+    const user = result.user;
+    sessionStorage.setItem("token", result.token);
 
     showMessage(`Inicio de sesión exitoso. Bienvenido, ${user.name}.`);
     // Aquí podrías redirigir a otra sección o mostrar la interfaz principal.
@@ -102,12 +99,13 @@ function login() {
 }
 
 function logout() {
-    location.reload();
+    post("/api/logout", {}, sessionStorage.getItem("token")).finally(() => {
+        sessionStorage.removeItem("token");
+        location.reload();
+    });
 }
 
 // Inicialización
 window.onload = () => {
     toggleForm();
 };
-</content>
-</create_file>
@@ -1,27 +1,143 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import messagebox, simpledialog, ttk
 import sqlite3
-from datetime import datetime
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 
-class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('sistema_medico.db')
-        self.cursor = self.conn.cursor()
-        self._crear_tablas()
-
-    def _crear_tablas(self):
-        # Tabla de usuarios
-        self.cursor.execute('''
+DB_PATH = 'sistema_medico.db'
+ESPERA_BLOQUEO_SEGUNDOS = 5       # busy_timeout mientras el escritor tiene la base
+SENTENCIAS_CACHEADAS = 256        # sentencias preparadas que sqlite3 guarda por conexión
+ESCRITURA_LOTE_FILAS = 64         # filas máximas por transacción del escritor
+ESCRITURA_LOTE_MS = 5             # tiempo máximo juntando filas para una transacción
+ESCRITURA_COLA_MAX = 1024         # inserciones pendientes antes de frenar a quien escribe
+LECTORES_POOL = max(2, min(8, os.cpu_count() or 1))  # conexiones de solo lectura del pool
+BUSQUEDA_POR_PAGINA = 20
+BUSQUEDA_VENTANA = 2000           # coincidencias más recientes que se ordenan por relevancia
+PAGINA_FILAS = 50                 # filas por página en los listados por paciente
+VISOR_MAX_PAGINAS = 6             # páginas que un VisorPaginado tiene cargadas a la vez
+ESPECIALIDADES = [
+    "Clínica Médica", "Pediatría", "Cardiología", "Traumatología", "Ginecología",
+    "Dermatología", "Neurología", "Oftalmología", "Otorrinolaringología", "Psiquiatría"
+]
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+AGENDA_HORIZONTE_DIAS = 60        # días hacia adelante en los que se buscan turnos libres
+AGENDA_PROXIMOS = 10              # turnos libres que se ofrecen al reservar
+FORMATOS_FECHA = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y']
+MARCA_INICIO, MARCA_FIN = '\x02', '\x03'  # delimitan las coincidencias en los fragmentos
+
+# Las fechas se guardan como segundos desde 1970 (INTEGER): ordenan y
+# comparan como números y los rangos por día son búsquedas en un índice
+def a_epoch(valor):
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, datetime):
+        return int(valor.timestamp())
+    if isinstance(valor, date):
+        return int(datetime.combine(valor, datetime.min.time()).timestamp())
+    texto = str(valor).strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return int(datetime.strptime(texto, formato).timestamp())
+        except ValueError:
+            pass
+    raise ValueError(f"Fecha inválida: {texto!r}")
+
+def formatear_fecha(segundos, formato='%d/%m/%Y %H:%M', original=None):
+    # Fecha 0: la migración no pudo interpretar el texto que había cargado
+    # (queda en fechas_invalidas); se muestra ese texto en vez de 01/01/1970
+    if not segundos:
+        return f"{original} (fecha inválida)" if original else "Fecha inválida"
+    return datetime.fromtimestamp(segundos).strftime(formato)
+
+def reconstruir_tabla(conn, tabla, esquema, seleccion):
+    # SQLite no cambia el tipo de una columna: se crea la tabla nueva, se
+    # copian las filas (con los mismos id, así los índices FTS siguen
+    # valiendo), se reemplaza la vieja y se vuelven a crear sus índices y
+    # triggers, que desaparecen con el DROP
+    dependientes = [
+        sql for (sql,) in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name=? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+            (tabla,)
+        )
+    ]
+    conn.execute(f'CREATE TABLE {tabla}_nueva ({esquema})')
+    conn.execute(f'INSERT INTO {tabla}_nueva SELECT {seleccion} FROM {tabla}')
+    conn.execute(f'DROP TABLE {tabla}')
+    conn.execute(f'ALTER TABLE {tabla}_nueva RENAME TO {tabla}')
+    for sql in dependientes:
+        conn.execute(sql)
+
+def migrar_fechas(conn):
+    # Los turnos tenían la fecha como la tipeó el paciente (DD/MM/AAAA) y las
+    # historias y recetas como texto ISO. Lo que no se puede interpretar
+    # queda en 0 y el texto original se guarda en fechas_invalidas (tabla e
+    # id de la fila) para corregirlo a mano sin frenar la migración
+    def convertir(texto):
+        try:
+            return a_epoch(texto)
+        except ValueError:
+            return None
+    
+    conn.create_function('a_epoch', 1, convertir, deterministic=True)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fechas_invalidas (
+            tabla TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            texto TEXT,
+            PRIMARY KEY (tabla, id)
+        )
+    ''')
+    for tabla in ('turnos', 'historias', 'recetas'):
+        conn.execute(
+            f"INSERT INTO fechas_invalidas (tabla, id, texto) SELECT '{tabla}', id, fecha FROM {tabla} WHERE a_epoch(fecha) IS NULL"
+        )
+    reconstruir_tabla(conn, 'turnos', '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER NOT NULL,
+        fecha INTEGER NOT NULL CHECK (typeof(fecha) = 'integer'),
+        especialidad TEXT NOT NULL,
+        estado TEXT DEFAULT 'pendiente',
+        FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+    ''', 'id, usuario_id, coalesce(a_epoch(fecha), 0), especialidad, estado')
+    reconstruir_tabla(conn, 'historias', '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER NOT NULL,
+        fecha INTEGER NOT NULL CHECK (typeof(fecha) = 'integer'),
+        diagnostico TEXT NOT NULL,
+        observaciones TEXT,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+    ''', 'id, usuario_id, coalesce(a_epoch(fecha), 0), diagnostico, observaciones')
+    reconstruir_tabla(conn, 'recetas', '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER NOT NULL,
+        fecha INTEGER NOT NULL CHECK (typeof(fecha) = 'integer'),
+        contenido TEXT NOT NULL,
+        medico TEXT NOT NULL,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+    ''', 'id, usuario_id, coalesce(a_epoch(fecha), 0), contenido, medico')
+
+# Cada migración lleva la base de user_version = i a i + 1. La 1 es el esquema
+# original (IF NOT EXISTS: las bases creadas antes de las migraciones la pasan
+# sin tocar nada); nunca se editan, se agregan al final. Un paso puede ser SQL
+# o una función que recibe la conexión.
+MIGRACIONES = [
+    [
+        '''
             CREATE TABLE IF NOT EXISTS usuarios (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 usuario TEXT UNIQUE NOT NULL,
                 contraseña TEXT NOT NULL,
                 tipo TEXT NOT NULL DEFAULT 'paciente'
             )
-        ''')
-        
-        # Tabla de turnos
-        self.cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS turnos (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 usuario_id INTEGER NOT NULL,
@@ -30,10 +146,8 @@ class Database:
                 estado TEXT DEFAULT 'pendiente',
                 FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
             )
-        ''')
-        
-        # Tabla de historias clínicas
-        self.cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS historias (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 usuario_id INTEGER NOT NULL,
@@ -42,10 +156,8 @@ class Database:
                 observaciones TEXT,
                 FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
             )
-        ''')
-        
-        # Tabla de recetas
-        self.cursor.execute('''
+        ''',
+        '''
             CREATE TABLE IF NOT EXISTS recetas (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 usuario_id INTEGER NOT NULL,
@@ -54,68 +166,821 @@ class Database:
                 medico TEXT NOT NULL,
                 FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
             )
-        ''')
+        '''
+    ],
+    [
+        # Las consultas por paciente dejan de recorrer la tabla entera. El de
+        # turnos cubre todas las columnas que lee obtener_turnos; los otros dos
+        # ya devuelven las filas en el orden de ORDER BY fecha DESC
+        'CREATE INDEX IF NOT EXISTS idx_turnos_usuario ON turnos (usuario_id, fecha, especialidad, estado)',
+        'CREATE INDEX IF NOT EXISTS idx_historias_usuario ON historias (usuario_id, fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_recetas_usuario ON recetas (usuario_id, fecha)'
+    ],
+    [
+        # Índices de texto completo sobre las tablas originales (content=): no
+        # duplican el texto, los triggers los mantienen al día y "rebuild"
+        # indexa lo que ya estaba cargado. remove_diacritics hace que
+        # "neumonia" encuentre "neumonía"
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS historias_fts USING fts5(
+                diagnostico, observaciones,
+                content='historias', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS historias_fts_ai AFTER INSERT ON historias BEGIN
+                INSERT INTO historias_fts (rowid, diagnostico, observaciones)
+                VALUES (new.id, new.diagnostico, new.observaciones);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS historias_fts_ad AFTER DELETE ON historias BEGIN
+                INSERT INTO historias_fts (historias_fts, rowid, diagnostico, observaciones)
+                VALUES ('delete', old.id, old.diagnostico, old.observaciones);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS historias_fts_au AFTER UPDATE ON historias BEGIN
+                INSERT INTO historias_fts (historias_fts, rowid, diagnostico, observaciones)
+                VALUES ('delete', old.id, old.diagnostico, old.observaciones);
+                INSERT INTO historias_fts (rowid, diagnostico, observaciones)
+                VALUES (new.id, new.diagnostico, new.observaciones);
+            END
+        ''',
+        "INSERT INTO historias_fts (historias_fts) VALUES ('rebuild')",
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS recetas_fts USING fts5(
+                contenido,
+                content='recetas', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS recetas_fts_ai AFTER INSERT ON recetas BEGIN
+                INSERT INTO recetas_fts (rowid, contenido) VALUES (new.id, new.contenido);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS recetas_fts_ad AFTER DELETE ON recetas BEGIN
+                INSERT INTO recetas_fts (recetas_fts, rowid, contenido) VALUES ('delete', old.id, old.contenido);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS recetas_fts_au AFTER UPDATE ON recetas BEGIN
+                INSERT INTO recetas_fts (recetas_fts, rowid, contenido) VALUES ('delete', old.id, old.contenido);
+                INSERT INTO recetas_fts (rowid, contenido) VALUES (new.id, new.contenido);
+            END
+        ''',
+        "INSERT INTO recetas_fts (recetas_fts) VALUES ('rebuild')"
+    ],
+    [
+        migrar_fechas,
+        # Agenda del día por especialidad: una búsqueda por rango en el índice
+        'CREATE INDEX IF NOT EXISTS idx_turnos_agenda ON turnos (especialidad, fecha, estado)'
+    ],
+    [
+        # Bloques semanales de atención de cada médico (minutos desde las
+        # 00:00) partidos en franjas de duracion minutos
+        '''
+            CREATE TABLE IF NOT EXISTS agendas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                medico_id INTEGER NOT NULL,
+                especialidad TEXT NOT NULL,
+                dia_semana INTEGER NOT NULL CHECK (dia_semana BETWEEN 0 AND 6),
+                desde INTEGER NOT NULL CHECK (desde >= 0),
+                hasta INTEGER NOT NULL CHECK (hasta > desde AND hasta <= 1440),
+                duracion INTEGER NOT NULL CHECK (duracion > 0),
+                FOREIGN KEY (medico_id) REFERENCES usuarios (id)
+            )
+        ''',
+        'ALTER TABLE turnos ADD COLUMN medico_id INTEGER REFERENCES usuarios (id)',
+        # Garantía final contra el doble turno, aunque reserven dos procesos
+        '''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_turnos_medico ON turnos (medico_id, fecha)
+            WHERE medico_id IS NOT NULL AND estado != 'cancelado'
+        '''
+    ]
+]
+
+# Listados por paciente: columnas (la primera siempre es fecha), tabla y si
+# se muestran de la fecha más reciente a la más vieja
+LISTADOS = {
+    'turnos': ('fecha, especialidad, estado', 'turnos', False),
+    'historia': ('fecha, diagnostico, observaciones', 'historias', True),
+    'recetas': ('fecha, contenido, medico', 'recetas', True)
+}
+
+def abrir_conexion(ruta, sincronizacion='NORMAL', **opciones):
+    conn = sqlite3.connect(
+        ruta, timeout=ESPERA_BLOQUEO_SEGUNDOS, cached_statements=SENTENCIAS_CACHEADAS, **opciones
+    )
+    # WAL: las lecturas no esperan al escritor y cada commit es un append al
+    # log. Con synchronous=NORMAL solo se sincroniza en los checkpoints; un
+    # corte de luz puede perder la última transacción pero no corrompe la base
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={sincronizacion}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+class GroupCommitWriter:
+    # Hilo único que hace todas las inserciones. Junta lo que está encolado en
+    # una transacción de hasta ESCRITURA_LOTE_FILAS filas o ESCRITURA_LOTE_MS
+    # milisegundos de armado, así una tanda de diagnósticos al final del turno
+    # paga un commit por lote en lugar de uno por fila. enviar() devuelve un Future con el
+    # lastrowid (o la excepción de esa fila); si la cola se llena, enviar()
+    # bloquea hasta que el hilo se ponga al día.
+    def __init__(self, ruta, max_filas=ESCRITURA_LOTE_FILAS, max_espera_ms=ESCRITURA_LOTE_MS, capacidad=ESCRITURA_COLA_MAX,
+                 sincronizacion='NORMAL'):
+        self.max_filas = max_filas
+        self.max_espera = max_espera_ms / 1000
+        self.cola = queue.Queue(maxsize=capacidad)
+        self.lotes = 0
+        self.filas = 0
+        self._cerrado = False
+        self._lock = threading.Lock()
         
-        self.conn.commit()
+        abierta = Future()
+        self.hilo = threading.Thread(
+            target=self._ejecutar, args=(ruta, sincronizacion, abierta), name="sqlite-escritor", daemon=True
+        )
+        self.hilo.start()
+        abierta.result()
+
+    def enviar(self, sql, parametros):
+        futuro = Future()
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError("La base de datos está cerrada")
+            self.cola.put((sql, parametros, futuro))
+        return futuro
+
+    def cerrar(self):
+        # Lo encolado antes de cerrar se escribe; después no se acepta nada más
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self.cola.put(None)
+        self.hilo.join()
+
+    def _ejecutar(self, ruta, sincronizacion, abierta):
+        try:
+            conn = abrir_conexion(ruta, sincronizacion, isolation_level=None)
+        except sqlite3.Error as e:
+            abierta.set_exception(e)
+            return
+        abierta.set_result(None)
+        
+        terminar = False
+        while not terminar:
+            pedido = self.cola.get()
+            if pedido is None:
+                break
+            # Entra al lote todo lo que llegó mientras se escribía el anterior,
+            # sin quedarse esperando filas que todavía no se enviaron
+            lote = [pedido]
+            limite = time.monotonic() + self.max_espera
+            while len(lote) < self.max_filas and time.monotonic() < limite:
+                try:
+                    pedido = self.cola.get_nowait()
+                except queue.Empty:
+                    break
+                if pedido is None:
+                    terminar = True
+                    break
+                lote.append(pedido)
+            self._escribir(conn, lote)
+        conn.close()
+
+    def _escribir(self, conn, lote):
+        escritas = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for sql, parametros, futuro in lote:
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                try:
+                    escritas.append((futuro, conn.execute(sql, parametros).lastrowid))
+                except sqlite3.Error as e:
+                    # Solo se descarta esa sentencia; el resto del lote sigue
+                    futuro.set_exception(e)
+            conn.execute('COMMIT')
+        except BaseException as e:
+            # Falló el lote entero (base bloqueada por otro proceso, disco
+            # lleno...): se deshace, cada fila pendiente recibe el error y el
+            # hilo sigue atendiendo la cola
+            if conn.in_transaction:
+                try:
+                    conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    pass
+            for _, _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        self.lotes += 1
+        self.filas += len(escritas)
+        for futuro, fila_id in escritas:
+            futuro.set_result(fila_id)
+
+class ConnectionPool:
+    # Un escritor (GroupCommitWriter) y N conexiones de solo lectura. Con WAL
+    # los lectores no se bloquean entre sí ni con el escritor, y sqlite suelta
+    # el GIL mientras ejecuta, así que las consultas de varios paneles corren
+    # en paralelo. leer() presta una conexión al hilo que la pide y la devuelve
+    # al salir; si el mismo hilo vuelve a pedir dentro del bloque recibe la
+    # misma conexión. Si están todas prestadas, espera a que se libere una.
+    def __init__(self, ruta, lectores=LECTORES_POOL):
+        self.escritor = GroupCommitWriter(ruta)
+        self._libres = queue.LifoQueue()
+        for _ in range(lectores):
+            conn = abrir_conexion(ruta, check_same_thread=False)
+            conn.execute('PRAGMA query_only=1')
+            self._libres.put(conn)
+        self._conexiones = list(self._libres.queue)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.prestamos = 0
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.en_uso = 0
+        self.max_en_uso = 0
+
+    @contextmanager
+    def leer(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        try:
+            conn = self._libres.get_nowait()
+            espera = 0.0
+        except queue.Empty:
+            inicio = time.perf_counter()
+            conn = self._libres.get()
+            espera = time.perf_counter() - inicio
+        with self._lock:
+            self.prestamos += 1
+            if espera:
+                self.esperas += 1
+                self.espera_total += espera
+            self.en_uso += 1
+            self.max_en_uso = max(self.max_en_uso, self.en_uso)
+        
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            with self._lock:
+                self.en_uso -= 1
+            self._libres.put(conn)
+
+    def escribir(self, sql, parametros):
+        return self.escritor.enviar(sql, parametros)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'lectores': len(self._conexiones),
+                'en_uso': self.en_uso,
+                'max_en_uso': self.max_en_uso,
+                'prestamos': self.prestamos,
+                'esperas': self.esperas,
+                'espera_media_ms': self.espera_total / self.esperas * 1000 if self.esperas else 0.0,
+                'escrituras_pendientes': self.escritor.cola.qsize(),
+                'transacciones': self.escritor.lotes,
+                'filas_escritas': self.escritor.filas
+            }
+
+    def cerrar(self):
+        self.escritor.cerrar()
+        for conn in self._conexiones:
+            conn.close()
+
+def clave_de(fila):
+    return fila[0], fila[-1]
+
+def a_minutos(hora):
+    # "08:30" -> 510
+    horas, _, minutos = str(hora).strip().partition(':')
+    total = int(horas) * 60 + int(minutos or 0)
+    if not 0 <= total <= 1440:
+        raise ValueError(f"Hora inválida: {hora!r}")
+    return total
+
+Bloque = namedtuple('Bloque', 'id medico_id medico especialidad dia_semana desde hasta duracion')
+
+class SlotEngine:
+    # Turnos por franja. Cada bloque de agenda (un médico, un día de la semana,
+    # de desde a hasta) se parte en franjas de duración fija, y lo ocupado de
+    # un bloque en una fecha es un entero usado como bitmap: el bit i es la
+    # franja i. Los bitmaps se cargan de la base la primera vez que se mira
+    # ese día (una búsqueda en idx_turnos_medico, fuera del lock) y después se
+    # mantienen en memoria hasta que la fecha queda en el pasado, así buscar
+    # los próximos turnos libres son operaciones de bits sin releer turnos.
+    # Reservar marca el bit bajo el lock antes de escribir,
+    # por lo que dos pedidos simultáneos no pueden tomar la misma franja; si
+    # la escritura falla el bit se libera. El índice único de la base cubre a
+    # otros procesos que escriban en la misma base.
+    def __init__(self, db, horizonte_dias=AGENDA_HORIZONTE_DIAS):
+        self.db = db
+        self.horizonte = horizonte_dias
+        self._lock = threading.Lock()
+        self._bloques = {}   # especialidad -> día de la semana -> [Bloque]
+        self._ocupados = {}  # (id de bloque, ordinal de la fecha) -> bitmap
+        self._hoy = date.today().toordinal()
+        self._liberaciones = 0  # cancelaciones aplicadas, para validar cargas en curso
+        self.recargar_agendas()
+
+    def recargar_agendas(self):
+        with self.db.pool.leer() as conn:
+            filas = conn.execute('''
+                SELECT a.id, a.medico_id, u.usuario, a.especialidad, a.dia_semana, a.desde, a.hasta, a.duracion
+                FROM agendas a LEFT JOIN usuarios u ON u.id = a.medico_id
+            ''').fetchall()
+        bloques = {}
+        for fila in filas:
+            bloque = Bloque(*fila)
+            bloques.setdefault(bloque.especialidad, {}).setdefault(bloque.dia_semana, []).append(bloque)
+        with self._lock:
+            self._bloques = bloques
+
+    def bloques_de(self, medico_id):
+        with self._lock:
+            return [
+                bloque for por_dia in self._bloques.values() for lista in por_dia.values()
+                for bloque in lista if bloque.medico_id == medico_id
+            ]
+
+    def proximos_libres(self, especialidad, cantidad=AGENDA_PROXIMOS, desde=None):
+        # Las primeras franjas libres de la especialidad a partir de desde
+        # (ahora por defecto), en orden: [(inicio, medico_id, medico)]
+        desde = int(time.time()) if desde is None else a_epoch(desde)
+        primer_dia = datetime.fromtimestamp(desde).date()
+        while True:
+            libres_encontrados, sin_cargar = self._buscar_libres(especialidad, cantidad, desde, primer_dia)
+            if not sin_cargar:
+                return libres_encontrados
+            # El primer día sin bitmaps en memoria se carga sin el lock y se
+            # vuelve a buscar (lo anterior es solo aritmética de bits)
+            self._cargar(sin_cargar)
+
+    def _buscar_libres(self, especialidad, cantidad, desde, primer_dia):
+        libres_encontrados = []
+        with self._lock:
+            por_dia = self._bloques.get(especialidad, {})
+            for dias in range(self.horizonte):
+                dia = primer_dia + timedelta(days=dias)
+                bloques = por_dia.get(dia.weekday(), ())
+                sin_cargar = [(bloque, dia) for bloque in bloques if (bloque.id, dia.toordinal()) not in self._ocupados]
+                if sin_cargar:
+                    return libres_encontrados, sin_cargar
+                faltan = cantidad - len(libres_encontrados)
+                candidatos = []
+                for bloque in bloques:
+                    franjas = (bloque.hasta - bloque.desde) // bloque.duracion
+                    libres = ~self._ocupados[(bloque.id, dia.toordinal())] & ((1 << franjas) - 1)
+                    if dias == 0:
+                        # Se descartan las franjas que ya empezaron
+                        pasadas = -(-(desde - self._inicio(dia, bloque.desde)) // (bloque.duracion * 60))
+                        if pasadas > 0:
+                            libres &= ~((1 << pasadas) - 1)
+                    # De cada bloque alcanzan sus primeras franjas libres (el bit
+                    # más bajo encendido de libres)
+                    for _ in range(faltan):
+                        if not libres:
+                            break
+                        menor = libres & -libres
+                        libres ^= menor
+                        inicio = self._inicio(dia, bloque.desde + (menor.bit_length() - 1) * bloque.duracion)
+                        candidatos.append((inicio, bloque.medico_id, bloque.medico))
+                candidatos.sort()
+                libres_encontrados += candidatos[:faltan]
+                if len(libres_encontrados) >= cantidad:
+                    break
+        return libres_encontrados, []
+
+    def reservar(self, usuario_id, especialidad, inicio, medico_id=None):
+        # Toma la franja que empieza en inicio (con cualquier médico de la
+        # especialidad si no se indica uno) y devuelve el Future del INSERT,
+        # que se resuelve con el id del turno. ValueError si no hay agenda
+        # para ese médico o ese horario, o si la franja ya está tomada
+        inicio = a_epoch(inicio)
+        if inicio < time.time():
+            raise ValueError("No se pueden reservar turnos en el pasado")
+        dia = datetime.fromtimestamp(inicio).date()
+        with self._lock:
+            bloques = [
+                bloque for bloque in self._bloques.get(especialidad, {}).get(dia.weekday(), ())
+                if medico_id is None or bloque.medico_id == medico_id
+            ]
+        if not bloques:
+            if medico_id is None:
+                raise ValueError(f"No hay agenda de {especialidad} para ese día")
+            raise ValueError(f"El médico no tiene agenda de {especialidad} para ese día")
+        bloques = [bloque for bloque in bloques if self._franja(bloque, dia, inicio) is not None]
+        if not bloques:
+            raise ValueError("El horario elegido no corresponde a ninguna franja de la agenda")
+        self._cargar([(bloque, dia) for bloque in bloques])
+        
+        with self._lock:
+            for bloque in bloques:
+                franja = self._franja(bloque, dia, inicio)
+                clave = (bloque.id, dia.toordinal())
+                # Cargado arriba; una fecha futura no se descarta
+                ocupado = self._ocupados[clave]
+                if not ocupado >> franja & 1:
+                    self._ocupados[clave] = ocupado | 1 << franja
+                    break
+            else:
+                raise ValueError("El horario elegido ya no está disponible")
+        
+        futuro = self.db.pool.escribir(
+            'INSERT INTO turnos (usuario_id, fecha, especialidad, medico_id) VALUES (?, ?, ?, ?)',
+            (usuario_id, inicio, especialidad, bloque.medico_id)
+        )
+        futuro.add_done_callback(lambda f: self._confirmar(f, clave, franja))
+        return futuro
+
+    def cancelar(self, turno_id):
+        with self.db.pool.leer() as conn:
+            turno = conn.execute(
+                "SELECT fecha, especialidad, medico_id FROM turnos WHERE id=? AND estado != 'cancelado'", (turno_id,)
+            ).fetchone()
+        if turno is None:
+            raise ValueError("El turno no existe o ya fue cancelado")
+        fecha, especialidad, medico_id = turno
+        futuro = self.db.pool.escribir("UPDATE turnos SET estado='cancelado' WHERE id=?", (turno_id,))
+        futuro.add_done_callback(lambda f: f.exception() is None and self._liberar(especialidad, medico_id, fecha))
+        return futuro
+
+    def _confirmar(self, futuro, clave, franja):
+        # Si otro proceso tomó la franja (índice único) queda ocupada; con
+        # cualquier otro error se devuelve
+        error = futuro.exception()
+        if error is None or (isinstance(error, sqlite3.IntegrityError) and 'UNIQUE' in str(error)):
+            return
+        with self._lock:
+            if clave in self._ocupados:
+                self._ocupados[clave] &= ~(1 << franja)
+
+    def _liberar(self, especialidad, medico_id, fecha):
+        dia = datetime.fromtimestamp(fecha).date()
+        with self._lock:
+            self._liberaciones += 1
+            for bloque in self._bloques.get(especialidad, {}).get(dia.weekday(), ()):
+                franja = self._franja(bloque, dia, fecha)
+                clave = (bloque.id, dia.toordinal())
+                if bloque.medico_id == medico_id and franja is not None and clave in self._ocupados:
+                    self._ocupados[clave] &= ~(1 << franja)
+
+    def _cargar(self, pares):
+        # Trae de la base los bitmaps de los (bloque, día) que no están en
+        # memoria, sin tener el lock mientras se consulta. Si otro hilo ya
+        # cargó uno se deja el suyo (puede tener reservas nuevas); si en el
+        # medio se liberó alguna franja la lectura puede estar vieja y se
+        # repite. Al cambiar el día se descartan los bitmaps de fechas pasadas
+        while True:
+            with self._lock:
+                pares = [(bloque, dia) for bloque, dia in pares if (bloque.id, dia.toordinal()) not in self._ocupados]
+                liberaciones = self._liberaciones
+            if not pares:
+                return
+            
+            cargados = {}
+            with self.db.pool.leer() as conn:
+                for bloque, dia in pares:
+                    ocupado = 0
+                    for (fecha,) in conn.execute(
+                        '''
+                            SELECT fecha FROM turnos
+                            WHERE medico_id = ? AND fecha >= ? AND fecha < ? AND estado != 'cancelado'
+                        ''',
+                        (bloque.medico_id, self._inicio(dia, bloque.desde), self._inicio(dia, bloque.hasta))
+                    ):
+                        franja = self._franja(bloque, dia, fecha)
+                        if franja is not None:
+                            ocupado |= 1 << franja
+                    cargados[(bloque.id, dia.toordinal())] = ocupado
+            
+            with self._lock:
+                if self._liberaciones != liberaciones:
+                    continue
+                hoy = date.today().toordinal()
+                if hoy != self._hoy:
+                    self._hoy = hoy
+                    for clave in [clave for clave in self._ocupados if clave[1] < hoy]:
+                        del self._ocupados[clave]
+                for clave, ocupado in cargados.items():
+                    self._ocupados.setdefault(clave, ocupado)
+                return
+
+    @staticmethod
+    def _inicio(dia, minutos):
+        # Se suma sobre la hora local, así los cambios de horario no corren las franjas
+        return int((datetime.combine(dia, datetime.min.time()) + timedelta(minutes=minutos)).timestamp())
+
+    @staticmethod
+    def _franja(bloque, dia, fecha):
+        minutos, resto = divmod((datetime.fromtimestamp(fecha) - datetime.combine(dia, datetime.min.time())).total_seconds(), 60)
+        franja, desfase = divmod(int(minutos) - bloque.desde, bloque.duracion)
+        if resto or desfase or not 0 <= franja < (bloque.hasta - bloque.desde) // bloque.duracion:
+            return None
+        return franja
+
+class Database:
+    # Las lecturas piden prestada una conexión del pool; todas las escrituras
+    # pasan por su GroupCommitWriter y devuelven un Future
+    def __init__(self, ruta=DB_PATH, lectores=LECTORES_POOL):
+        self._migrar(ruta)
+        self.pool = ConnectionPool(ruta, lectores)
+        self.agenda = SlotEngine(self)
+
+    @staticmethod
+    def _migrar(ruta):
+        conn = abrir_conexion(ruta)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for numero, sentencias in enumerate(MIGRACIONES[version:], start=version + 1):
+                conn.execute('BEGIN')
+                try:
+                    for paso in sentencias:
+                        if callable(paso):
+                            paso(conn)
+                        else:
+                            conn.execute(paso)
+                    conn.execute(f'PRAGMA user_version = {numero}')
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+        finally:
+            conn.close()
 
     def registrar_usuario(self, usuario, contraseña, tipo='paciente'):
         try:
-            self.cursor.execute(
+            self.pool.escribir(
                 'INSERT INTO usuarios (usuario, contraseña, tipo) VALUES (?, ?, ?)', 
                 (usuario, contraseña, tipo)
-            )
-            self.conn.commit()
+            ).result()
             return True
         except sqlite3.IntegrityError:
             return False
 
     def validar_usuario(self, usuario, contraseña):
-        self.cursor.execute(
-            'SELECT id, tipo FROM usuarios WHERE usuario=? AND contraseña=?', 
-            (usuario, contraseña)
-        )
-        return self.cursor.fetchone()
+        with self.pool.leer() as conn:
+            return conn.execute(
+                'SELECT id, tipo FROM usuarios WHERE usuario=? AND contraseña=?', 
+                (usuario, contraseña)
+            ).fetchone()
 
     def agregar_turno(self, usuario_id, fecha, especialidad):
-        self.cursor.execute(
-            'INSERT INTO turnos (usuario_id, fecha, especialidad) VALUES (?, ?, ?)',
-            (usuario_id, fecha, especialidad)
-        )
-        self.conn.commit()
+        # Firma anterior a las agendas: la fecha tiene que ser el inicio de
+        # una franja libre de la especialidad y se reserva con el médico que
+        # la tenga, igual que reservar_turno
+        return self.agenda.reservar(usuario_id, especialidad, fecha)
+
+    def agregar_agenda(self, medico_id, especialidad, dia_semana, desde, hasta, duracion):
+        # desde y hasta como "HH:MM"; duracion en minutos
+        desde, hasta, duracion = a_minutos(desde), a_minutos(hasta), int(duracion)
+        if duracion <= 0 or hasta - desde < duracion:
+            raise ValueError("El bloque tiene que tener al menos una franja")
+        for bloque in self.agenda.bloques_de(medico_id):
+            if bloque.dia_semana == dia_semana and bloque.desde < hasta and desde < bloque.hasta:
+                raise ValueError("El bloque se superpone con otro de la misma agenda")
+        agenda_id = self.pool.escribir(
+            'INSERT INTO agendas (medico_id, especialidad, dia_semana, desde, hasta, duracion) VALUES (?, ?, ?, ?, ?, ?)',
+            (medico_id, especialidad, dia_semana, desde, hasta, duracion)
+        ).result()
+        self.agenda.recargar_agendas()
+        return agenda_id
+
+    def reservar_turno(self, usuario_id, especialidad, inicio, medico_id=None):
+        return self.agenda.reservar(usuario_id, especialidad, inicio, medico_id)
+
+    def cancelar_turno(self, turno_id):
+        return self.agenda.cancelar(turno_id)
+
+    def turnos_del_dia(self, especialidad, dia, estado=None):
+        # Turnos de una especialidad entre las 00:00 de dia y las del día
+        # siguiente: rango sobre idx_turnos_agenda (especialidad, fecha, estado).
+        # Devuelve (id, fecha, usuario, estado) ordenados por hora
+        desde = a_epoch(dia)
+        hasta = a_epoch(datetime.fromtimestamp(desde).date() + timedelta(days=1))
+        sql = '''
+            SELECT t.id, t.fecha, u.usuario, t.estado
+            FROM turnos t LEFT JOIN usuarios u ON u.id = t.usuario_id
+            WHERE t.especialidad = ? AND t.fecha >= ? AND t.fecha < ?
+        '''
+        parametros = (especialidad, desde, hasta)
+        if estado is not None:
+            sql += ' AND t.estado = ?'
+            parametros += (estado,)
+        with self.pool.leer() as conn:
+            return conn.execute(sql + ' ORDER BY t.fecha', parametros).fetchall()
 
     def obtener_turnos(self, usuario_id):
-        self.cursor.execute(
-            'SELECT fecha, especialidad, estado FROM turnos WHERE usuario_id=?', 
-            (usuario_id,)
-        )
-        return self.cursor.fetchall()
+        return list(self.iterar('turnos', usuario_id))
 
     def agregar_diagnostico(self, usuario_id, diagnostico, observaciones=''):
-        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.cursor.execute(
+        fecha = int(time.time())
+        return self.pool.escribir(
             'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)',
             (usuario_id, fecha, diagnostico, observaciones)
         )
-        self.conn.commit()
 
     def obtener_historia(self, usuario_id):
-        self.cursor.execute(
-            'SELECT fecha, diagnostico, observaciones FROM historias WHERE usuario_id=? ORDER BY fecha DESC', 
-            (usuario_id,)
-        )
-        return self.cursor.fetchall()
+        return list(self.iterar('historia', usuario_id))
+
+    def obtener_recetas(self, usuario_id):
+        return list(self.iterar('recetas', usuario_id))
+
+    def pagina(self, listado, usuario_id, clave=None, hacia_atras=False, por_pagina=PAGINA_FILAS):
+        # Paginación por clave (fecha, id): la página sigue a partir de la fila
+        # clave, no de un OFFSET, así que pedir la página mil cuesta lo mismo
+        # que la primera (el índice (usuario_id, fecha) va directo) y entre
+        # páginas no queda ninguna conexión tomada. Con hacia_atras se piden
+        # las filas anteriores a la clave, devueltas en el orden del listado.
+        # Cada fila trae el id al final, precedido por el texto original de la
+        # fecha si la migración la dejó en 0 (None si no); clave_de(fila) da la
+        # clave para seguir. fechas_invalidas solo se consulta para esas filas
+        columnas, tabla, recientes_primero = LISTADOS[listado]
+        descendente = recientes_primero != hacia_atras
+        orden = 'DESC' if descendente else 'ASC'
+        original = (f"CASE WHEN fecha = 0 THEN (SELECT texto FROM fechas_invalidas "
+                    f"WHERE tabla = '{tabla}' AND id = {tabla}.id) END")
+        sql = f'SELECT {columnas}, {original}, id FROM {tabla} WHERE usuario_id=?'
+        parametros = (usuario_id,)
+        if clave is not None:
+            sql += f' AND (fecha, id) {"<" if descendente else ">"} (?, ?)'
+            parametros += tuple(clave)
+        with self.pool.leer() as conn:
+            filas = conn.execute(f'{sql} ORDER BY fecha {orden}, id {orden} LIMIT ?', parametros + (por_pagina,)).fetchall()
+        if hacia_atras:
+            filas.reverse()
+        return filas
+
+    def iterar(self, listado, usuario_id, por_pagina=PAGINA_FILAS):
+        # Recorre el listado completo de a una página por consulta, sin el id
+        clave = None
+        while True:
+            filas = self.pagina(listado, usuario_id, clave, por_pagina=por_pagina)
+            for fila in filas:
+                yield fila[:-1]
+            if len(filas) < por_pagina:
+                return
+            clave = clave_de(filas[-1])
+
+    def buscar_historias(self, texto, pagina=0, por_pagina=BUSQUEDA_POR_PAGINA):
+        # Busca en diagnósticos, observaciones y recetas de todos los pacientes;
+        # tienen que aparecer todas las palabras, sin importar acentos ni
+        # mayúsculas, y "neumon*" busca por prefijo. Devuelve (resultados,
+        # hay_mas); cada resultado es (tipo, id, usuario_id, fecha, fragmento)
+        # con las coincidencias entre MARCA_INICIO y MARCA_FIN.
+        # Calcular bm25 cuesta por fila: con una palabra que está en medio
+        # millón de notas ordenar todo tarda casi un segundo. Por eso se ordenan
+        # solo las BUSQUEDA_VENTANA coincidencias más recientes de cada tabla
+        # (recorrer por rowid en FTS5 es barato); con menos coincidencias que
+        # eso el orden es exacto
+        consulta = self._consulta_fts(texto)
+        if not consulta:
+            return [], False
+        cantidad = (pagina + 1) * por_pagina + 1
+        filas = []
+        with self.pool.leer() as conn:
+            for tipo, tabla, fts, pesos in (('historia', 'historias', 'historias_fts', '2.0, 1.0'),
+                                            ('receta', 'recetas', 'recetas_fts', '1.0')):
+                corte = conn.execute(
+                    f'SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?',
+                    (consulta, BUSQUEDA_VENTANA - 1)
+                ).fetchone()
+                filas += conn.execute(
+                    f'''
+                        SELECT '{tipo}', t.id, t.usuario_id, t.fecha,
+                               snippet({fts}, -1, ?, ?, '…', 12), bm25({fts}, {pesos}) AS puntaje
+                        FROM {fts} JOIN {tabla} t ON t.id = {fts}.rowid
+                        WHERE {fts} MATCH ? AND {fts}.rowid >= ?
+                        ORDER BY puntaje
+                        LIMIT ?
+                    ''',
+                    (MARCA_INICIO, MARCA_FIN, consulta, corte[0] if corte else 0, cantidad)
+                ).fetchall()
+        filas.sort(key=lambda fila: fila[5])
+        filas = filas[pagina * por_pagina:cantidad]
+        return [fila[:5] for fila in filas[:por_pagina]], len(filas) > por_pagina
+
+    @staticmethod
+    def _consulta_fts(texto):
+        # Cada palabra va entre comillas para que lo que escribe el médico no
+        # se interprete como sintaxis de FTS5 (AND, NEAR, paréntesis...)
+        terminos = []
+        for palabra in texto.split():
+            prefijo = palabra.endswith('*')
+            palabra = palabra.strip('*').replace('"', '""')
+            if palabra:
+                terminos.append(f'"{palabra}"*' if prefijo else f'"{palabra}"')
+        return ' '.join(terminos)
 
     def generar_receta(self, usuario_id, contenido, medico):
-        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.cursor.execute(
+        # El Future se resuelve con el id de la receta
+        fecha = int(time.time())
+        return self.pool.escribir(
             'INSERT INTO recetas (usuario_id, fecha, contenido, medico) VALUES (?, ?, ?, ?)',
             (usuario_id, fecha, contenido, medico)
         )
-        self.conn.commit()
-        return self.cursor.lastrowid
 
     def cerrar(self):
-        self.conn.close()
+        self.pool.cerrar()
+
+class VisorPaginado:
+    # Text con scrollbar que muestra un listado de Database.pagina: pide la
+    # página siguiente cuando el usuario se acerca al final y la anterior
+    # cuando vuelve al principio. Nunca tiene más de max_paginas cargadas; las
+    # que salen de la ventana se descartan y se vuelven a pedir si hace falta,
+    # así la memoria no depende del largo de la historia.
+    def __init__(self, padre, db, listado, usuario_id, formatear, por_pagina=PAGINA_FILAS, max_paginas=VISOR_MAX_PAGINAS):
+        self.db = db
+        self.listado = listado
+        self.usuario_id = usuario_id
+        self.formatear = formatear
+        self.por_pagina = por_pagina
+        self.max_paginas = max_paginas
+        self.paginas = deque()  # (clave de la primera fila, clave de la última, líneas)
+        self.hay_antes = False
+        self.hay_despues = True
+        self.cargando = False
+        
+        # Crear un frame con scrollbar
+        self.frame = tk.Frame(padre)
+        self.frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.scrollbar = tk.Scrollbar(self.frame)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.texto = tk.Text(self.frame, wrap=tk.WORD, yscrollcommand=self._desplazado, state=tk.DISABLED)
+        self.texto.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar.config(command=self.texto.yview)
+        
+        self.vacio = not self._cargar(hacia_atras=False)
+
+    def _desplazado(self, inicio, fin):
+        self.scrollbar.set(inicio, fin)
+        if self.cargando:
+            return
+        if float(fin) > 0.9 and self.hay_despues:
+            hacia_atras = False
+        elif float(inicio) < 0.1 and self.hay_antes:
+            hacia_atras = True
+        else:
+            return
+        # Se carga fuera del callback de scroll, que Tk llama en pleno redibujo
+        self.cargando = True
+        self.texto.after_idle(self._cargar, hacia_atras)
+
+    def _cargar(self, hacia_atras):
+        self.cargando = False
+        if not self.paginas:
+            clave = None
+        else:
+            clave = self.paginas[0][0] if hacia_atras else self.paginas[-1][1]
+        filas = self.db.pagina(self.listado, self.usuario_id, clave, hacia_atras, self.por_pagina)
+        completa = len(filas) == self.por_pagina
+        if hacia_atras:
+            self.hay_antes = completa
+        else:
+            self.hay_despues = completa
+        if not filas:
+            return False
+        
+        contenido = "".join(self.formatear(fila[:-1]) for fila in filas)
+        lineas = contenido.count("\n")
+        pagina = (clave_de(filas[0]), clave_de(filas[-1]), lineas)
+        # Al agregar o quitar líneas arriba de lo visible se corrige la vista
+        # para que el texto que el usuario está leyendo no salte
+        arriba = int(self.texto.index("@0,0").split(".")[0])
+        
+        self.texto.config(state=tk.NORMAL)
+        if hacia_atras:
+            self.texto.insert("1.0", contenido)
+            self.paginas.appendleft(pagina)
+            arriba += lineas
+            if len(self.paginas) > self.max_paginas:
+                quitadas = self.paginas.pop()[2]
+                ultima = int(self.texto.index("end-1c").split(".")[0])
+                self.texto.delete(f"{ultima - quitadas}.0", "end-1c")
+                self.hay_despues = True
+        else:
+            self.texto.insert("end-1c", contenido)
+            self.paginas.append(pagina)
+            if len(self.paginas) > self.max_paginas:
+                quitadas = self.paginas.popleft()[2]
+                self.texto.delete("1.0", f"{quitadas + 1}.0")
+                arriba -= quitadas
+                self.hay_antes = True
+        self.texto.config(state=tk.DISABLED)
+        self.texto.yview(f"{max(1, arriba)}.0")
+        return True
 
 class LoginWindow:
     def __init__(self, master, db):
@@ -192,117 +1057,90 @@ class PanelPacienteWindow:
         tk.Button(frame_botones, text="Cerrar Sesión", command=self.cerrar_sesion, width=20).grid(row=2, column=0, columnspan=2, pady=10)
 
     def reservar_turno(self):
-        # Ventana para reservar turno
+        # Ventana para reservar turno: se elige entre las próximas franjas
+        # libres de la especialidad
         ventana_turno = tk.Toplevel(self.window)
         ventana_turno.title("Reservar Turno")
-        ventana_turno.geometry("300x200")
-        
-        tk.Label(ventana_turno, text="Fecha (DD/MM/AAAA):").pack(pady=5)
-        entrada_fecha = tk.Entry(ventana_turno)
-        entrada_fecha.pack()
+        ventana_turno.geometry("400x350")
         
         tk.Label(ventana_turno, text="Especialidad:").pack(pady=5)
-        entrada_especialidad = tk.Entry(ventana_turno)
+        entrada_especialidad = ttk.Combobox(ventana_turno, values=ESPECIALIDADES, state="readonly")
         entrada_especialidad.pack()
         
+        tk.Label(ventana_turno, text="Turnos disponibles:").pack(pady=5)
+        lista = tk.Listbox(ventana_turno, width=50, height=AGENDA_PROXIMOS)
+        lista.pack()
+        libres = []
+        
+        def buscar_libres(event=None):
+            libres[:] = self.db.agenda.proximos_libres(entrada_especialidad.get())
+            lista.delete(0, tk.END)
+            if not libres:
+                lista.insert(tk.END, "No hay turnos disponibles")
+            for inicio, _, medico in libres:
+                dia = DIAS_SEMANA[datetime.fromtimestamp(inicio).weekday()]
+                lista.insert(tk.END, f"{dia} {formatear_fecha(inicio)} - Dr. {medico}")
+        
         def guardar_turno():
-            fecha = entrada_fecha.get()
-            especialidad = entrada_especialidad.get()
-            
-            if fecha and especialidad:
-                try:
-                    self.db.agregar_turno(self.usuario_id, fecha, especialidad)
-                    messagebox.showinfo("Éxito", "Turno reservado correctamente")
-                    ventana_turno.destroy()
-                except Exception as e:
-                    messagebox.showerror("Error", f"No se pudo reservar el turno: {str(e)}")
-            else:
-                messagebox.showerror("Error", "Todos los campos son obligatorios")
+            seleccion = lista.curselection()
+            if not libres or not seleccion:
+                messagebox.showerror("Error", "Elija un turno de la lista", parent=ventana_turno)
+                return
+            inicio, medico_id, _ = libres[seleccion[0]]
+            try:
+                self.db.reservar_turno(self.usuario_id, entrada_especialidad.get(), inicio, medico_id).result()
+                messagebox.showinfo("Éxito", "Turno reservado correctamente")
+                ventana_turno.destroy()
+            except Exception as e:
+                # Otro paciente pudo haberlo tomado mientras tanto
+                messagebox.showerror("Error", f"No se pudo reservar el turno: {str(e)}", parent=ventana_turno)
+                buscar_libres()
         
+        entrada_especialidad.bind("<<ComboboxSelected>>", buscar_libres)
         tk.Button(ventana_turno, text="Reservar", command=guardar_turno).pack(pady=10)
 
     def ver_turnos(self):
-        turnos = self.db.obtener_turnos(self.usuario_id)
-        
         ventana_turnos = tk.Toplevel(self.window)
         ventana_turnos.title("Mis Turnos")
         ventana_turnos.geometry("500x300")
         
-        if not turnos:
+        visor = VisorPaginado(
+            ventana_turnos, self.db, 'turnos', self.usuario_id,
+            lambda turno: f"Fecha: {formatear_fecha(turno[0], original=turno[3])} - Especialidad: {turno[1]} - Estado: {turno[2]}\n"
+        )
+        if visor.vacio:
+            visor.frame.destroy()
             tk.Label(ventana_turnos, text="No tienes turnos reservados").pack(pady=20)
-            return
-        
-        # Crear un frame con scrollbar
-        frame = tk.Frame(ventana_turnos)
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        scrollbar = tk.Scrollbar(frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        lista = tk.Listbox(frame, yscrollcommand=scrollbar.set, width=60)
-        for turno in turnos:
-            lista.insert(tk.END, f"Fecha: {turno[0]} - Especialidad: {turno[1]} - Estado: {turno[2]}")
-        lista.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        scrollbar.config(command=lista.yview)
 
     def ver_historia(self):
-        historias = self.db.obtener_historia(self.usuario_id)
-        
         ventana_historia = tk.Toplevel(self.window)
         ventana_historia.title("Historia Clínica")
         ventana_historia.geometry("600x400")
         
-        if not historias:
-            tk.Label(ventana_historia, text="No hay registros en tu historia clínica").pack(pady=20)
-            return
-        
-        # Crear un frame con scrollbar
-        frame = tk.Frame(ventana_historia)
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        scrollbar = tk.Scrollbar(frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        texto = tk.Text(frame, wrap=tk.WORD, yscrollcommand=scrollbar.set)
-        texto.pack(fill=tk.BOTH, expand=True)
-        
-        for historia in historias:
-            texto.insert(tk.END, f"Fecha: {historia[0]}\n")
-            texto.insert(tk.END, f"Diagnóstico: {historia[1]}\n")
+        def formatear(historia):
+            texto = f"Fecha: {formatear_fecha(historia[0], original=historia[3])}\nDiagnóstico: {historia[1]}\n"
             if historia[2]:
-                texto.insert(tk.END, f"Observaciones: {historia[2]}\n")
-            texto.insert(tk.END, "-"*50 + "\n\n")
+                texto += f"Observaciones: {historia[2]}\n"
+            return texto + "-"*50 + "\n\n"
         
-        texto.config(state=tk.DISABLED)
-        scrollbar.config(command=texto.yview)
+        # Las páginas se cargan a medida que el usuario se desplaza
+        visor = VisorPaginado(ventana_historia, self.db, 'historia', self.usuario_id, formatear)
+        if visor.vacio:
+            visor.frame.destroy()
+            tk.Label(ventana_historia, text="No hay registros en tu historia clínica").pack(pady=20)
 
     def ver_recetas(self):
-        recetas = self.db.obtener_recetas(self.usuario_id)  # Asegúrate de tener esta función
         ventana_recetas = tk.Toplevel(self.window)
         ventana_recetas.title("Mis Recetas")
         ventana_recetas.geometry("600x400")
         
-        if not recetas:
+        visor = VisorPaginado(
+            ventana_recetas, self.db, 'recetas', self.usuario_id,
+            lambda receta: f"Fecha: {formatear_fecha(receta[0], original=receta[3])}\nContenido: {receta[1]}\nMédico: {receta[2]}\n" + "-"*50 + "\n"
+        )
+        if visor.vacio:
+            visor.frame.destroy()
             tk.Label(ventana_recetas, text="No tienes recetas").pack(pady=20)
-            return
-        
-        # Crear un frame con scrollbar
-        frame = tk.Frame(ventana_recetas)
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        scrollbar = tk.Scrollbar(frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        texto = tk.Text(frame, wrap=tk.WORD, yscrollcommand=scrollbar.set)
-        texto.pack(fill=tk.BOTH, expand=True)
-        
-        for receta in recetas:
-            texto.insert(tk.END, f"Fecha: {receta[0]}\nContenido: {receta[1]}\nMédico: {receta[2]}\n")
-            texto.insert(tk.END, "-"*50 + "\n")
-        
-        texto.config(state=tk.DISABLED)
-        scrollbar.config(command=texto.yview)
 
     def cerrar_sesion(self):
         self.window.destroy()
@@ -331,11 +1169,109 @@ class PanelMedicoWindow:
         tk.Button(frame_botones, text="Agregar Diagnóstico", command=self.agregar_diagnostico, width=25).grid(row=0, column=1, padx=5, pady=5)
         tk.Button(frame_botones, text="Generar Receta", command=self.generar_receta, width=25).grid(row=1, column=0, padx=5, pady=5)
         tk.Button(frame_botones, text="Ver Historias Clínicas", command=self.ver_historias, width=25).grid(row=1, column=1, padx=5, pady=5)
-        tk.Button(frame_botones, text="Cerrar Sesión", command=self.cerrar_sesion, width=25).grid(row=2, column=0, columnspan=2, pady=10)
+        tk.Button(frame_botones, text="Configurar Agenda", command=self.configurar_agenda, width=25).grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+        tk.Button(frame_botones, text="Cerrar Sesión", command=self.cerrar_sesion, width=25).grid(row=3, column=0, columnspan=2, pady=10)
 
     def ver_turnos_dia(self):
-        # Implementar la visualización de turnos del día
-        messagebox.showinfo("Turnos del Día", "Funcionalidad de turnos del día en desarrollo")
+        # Agenda de una especialidad para un día (hoy por defecto)
+        ventana_agenda = tk.Toplevel(self.window)
+        ventana_agenda.title("Turnos del Día")
+        ventana_agenda.geometry("500x400")
+        
+        frame_filtros = tk.Frame(ventana_agenda)
+        frame_filtros.pack(pady=10)
+        
+        tk.Label(frame_filtros, text="Especialidad:").grid(row=0, column=0, padx=5)
+        entrada_especialidad = ttk.Combobox(frame_filtros, values=ESPECIALIDADES, state="readonly")
+        entrada_especialidad.current(0)
+        entrada_especialidad.grid(row=0, column=1, padx=5)
+        
+        tk.Label(frame_filtros, text="Día (DD/MM/AAAA):").grid(row=1, column=0, padx=5)
+        entrada_dia = tk.Entry(frame_filtros)
+        entrada_dia.insert(0, date.today().strftime('%d/%m/%Y'))
+        entrada_dia.grid(row=1, column=1, padx=5)
+        
+        # Crear un frame con scrollbar
+        frame = tk.Frame(ventana_agenda)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = tk.Scrollbar(frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        lista = tk.Listbox(frame, yscrollcommand=scrollbar.set, width=60)
+        lista.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=lista.yview)
+        
+        def mostrar(event=None):
+            try:
+                turnos = self.db.turnos_del_dia(entrada_especialidad.get(), entrada_dia.get())
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=ventana_agenda)
+                return
+            lista.delete(0, tk.END)
+            if not turnos:
+                lista.insert(tk.END, "No hay turnos para ese día")
+            for turno_id, fecha, paciente, estado in turnos:
+                lista.insert(tk.END, f"{formatear_fecha(fecha, '%H:%M')} - Turno #{turno_id} - {paciente or 'Paciente desconocido'} - {estado}")
+        
+        tk.Button(frame_filtros, text="Ver", command=mostrar).grid(row=0, column=2, rowspan=2, padx=5)
+        entrada_especialidad.bind("<<ComboboxSelected>>", mostrar)
+        entrada_dia.bind("<Return>", mostrar)
+        mostrar()
+
+    def configurar_agenda(self):
+        # Bloques semanales en los que el médico atiende; de ellos salen las
+        # franjas que los pacientes pueden reservar
+        ventana_agenda = tk.Toplevel(self.window)
+        ventana_agenda.title("Configurar Agenda")
+        ventana_agenda.geometry("450x400")
+        
+        lista = tk.Listbox(ventana_agenda, width=60, height=8)
+        lista.pack(pady=10)
+        
+        def mostrar_bloques():
+            lista.delete(0, tk.END)
+            for bloque in sorted(self.db.agenda.bloques_de(self.usuario_id), key=lambda b: (b.dia_semana, b.desde)):
+                lista.insert(
+                    tk.END,
+                    f"{DIAS_SEMANA[bloque.dia_semana]} {bloque.desde // 60:02d}:{bloque.desde % 60:02d}-"
+                    f"{bloque.hasta // 60:02d}:{bloque.hasta % 60:02d} - {bloque.especialidad} "
+                    f"(turnos de {bloque.duracion} min)"
+                )
+        
+        frame_campos = tk.Frame(ventana_agenda)
+        frame_campos.pack()
+        campos = {}
+        for fila, (etiqueta, campo) in enumerate((
+            ("Especialidad:", ttk.Combobox(frame_campos, values=ESPECIALIDADES, state="readonly")),
+            ("Día:", ttk.Combobox(frame_campos, values=DIAS_SEMANA, state="readonly")),
+            ("Desde (HH:MM):", tk.Entry(frame_campos)),
+            ("Hasta (HH:MM):", tk.Entry(frame_campos)),
+            ("Duración (min):", tk.Entry(frame_campos))
+        )):
+            tk.Label(frame_campos, text=etiqueta).grid(row=fila, column=0, sticky=tk.E, padx=5, pady=2)
+            campo.grid(row=fila, column=1, padx=5, pady=2)
+            campos[etiqueta] = campo
+        campos["Duración (min):"].insert(0, "20")
+        
+        def agregar_bloque():
+            dia = campos["Día:"].get()
+            especialidad = campos["Especialidad:"].get()
+            if not dia or not especialidad:
+                messagebox.showerror("Error", "Todos los campos son obligatorios", parent=ventana_agenda)
+                return
+            try:
+                self.db.agregar_agenda(
+                    self.usuario_id, especialidad, DIAS_SEMANA.index(dia),
+                    campos["Desde (HH:MM):"].get(), campos["Hasta (HH:MM):"].get(), campos["Duración (min):"].get()
+                )
+            except (ValueError, sqlite3.Error) as e:
+                messagebox.showerror("Error", f"No se pudo agregar el bloque: {str(e)}", parent=ventana_agenda)
+                return
+            mostrar_bloques()
+        
+        tk.Button(ventana_agenda, text="Agregar Bloque", command=agregar_bloque).pack(pady=10)
+        mostrar_bloques()
 
     def agregar_diagnostico(self):
         # Ventana para agregar diagnóstico
@@ -362,7 +1298,7 @@ class PanelMedicoWindow:
             
             if paciente_id and diagnostico:
                 try:
-                    self.db.agregar_diagnostico(paciente_id, diagnostico, observaciones)
+                    self.db.agregar_diagnostico(paciente_id, diagnostico, observaciones).result()
                     messagebox.showinfo("Éxito", "Diagnóstico agregado correctamente")
                     ventana_diag.destroy()
                 except Exception as e:
@@ -392,7 +1328,7 @@ class PanelMedicoWindow:
             
             if paciente_id and contenido:
                 try:
-                    receta_id = self.db.generar_receta(paciente_id, contenido, self.usuario)
+                    receta_id = self.db.generar_receta(paciente_id, contenido, self.usuario).result()
                     messagebox.showinfo("Éxito", f"Receta generada con ID: {receta_id}")
                     ventana_receta.destroy()
                 except Exception as e:
@@ -403,13 +1339,454 @@ class PanelMedicoWindow:
         tk.Button(ventana_receta, text="Generar Receta", command=guardar_receta).pack(pady=10)
 
     def ver_historias(self):
-        # Implementar la visualización de historias clínicas
-        messagebox.showinfo("Historias Clínicas", "Funcionalidad de ver historias clínicas en desarrollo")
+        # Búsqueda de texto completo en historias clínicas y recetas
+        ventana_historias = tk.Toplevel(self.window)
+        ventana_historias.title("Historias Clínicas")
+        ventana_historias.geometry("700x500")
+        
+        tk.Label(
+            ventana_historias, text="Palabras a buscar (termine una palabra con * para buscar por prefijo):"
+        ).pack(anchor=tk.W, padx=10, pady=(10, 0))
+        frame_busqueda = tk.Frame(ventana_historias)
+        frame_busqueda.pack(fill=tk.X, padx=10, pady=5)
+        entrada_busqueda = tk.Entry(frame_busqueda)
+        entrada_busqueda.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Crear un frame con scrollbar
+        frame = tk.Frame(ventana_historias)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = tk.Scrollbar(frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        texto = tk.Text(frame, wrap=tk.WORD, yscrollcommand=scrollbar.set, state=tk.DISABLED)
+        texto.pack(fill=tk.BOTH, expand=True)
+        texto.tag_configure("resaltado", background="yellow")
+        texto.tag_configure("titulo", font=("Arial", 10, "bold"))
+        scrollbar.config(command=texto.yview)
+        
+        frame_paginas = tk.Frame(ventana_historias)
+        frame_paginas.pack(pady=5)
+        boton_anterior = tk.Button(frame_paginas, text="< Anterior", state=tk.DISABLED)
+        boton_anterior.pack(side=tk.LEFT, padx=5)
+        etiqueta_pagina = tk.Label(frame_paginas, text="")
+        etiqueta_pagina.pack(side=tk.LEFT, padx=5)
+        boton_siguiente = tk.Button(frame_paginas, text="Siguiente >", state=tk.DISABLED)
+        boton_siguiente.pack(side=tk.LEFT, padx=5)
+        
+        estado = {"consulta": "", "pagina": 0}
+        
+        def mostrar(pagina):
+            resultados, hay_mas = self.db.buscar_historias(estado["consulta"], pagina)
+            estado["pagina"] = pagina
+            
+            texto.config(state=tk.NORMAL)
+            texto.delete("1.0", tk.END)
+            if not resultados:
+                texto.insert(tk.END, "No se encontraron registros")
+            for tipo, registro_id, paciente_id, fecha, fragmento in resultados:
+                titulo = "Historia" if tipo == 'historia' else "Receta"
+                texto.insert(tk.END, f"{titulo} #{registro_id} - Paciente {paciente_id} - {formatear_fecha(fecha)}\n", "titulo")
+                # Lo que está entre las marcas se pinta resaltado
+                for i, parte in enumerate(fragmento.replace(MARCA_FIN, MARCA_INICIO).split(MARCA_INICIO)):
+                    texto.insert(tk.END, parte, "resaltado" if i % 2 else ())
+                texto.insert(tk.END, "\n" + "-"*50 + "\n\n")
+            texto.config(state=tk.DISABLED)
+            
+            etiqueta_pagina.config(text=f"Página {pagina + 1}")
+            boton_anterior.config(state=tk.NORMAL if pagina > 0 else tk.DISABLED)
+            boton_siguiente.config(state=tk.NORMAL if hay_mas else tk.DISABLED)
+        
+        def buscar(event=None):
+            estado["consulta"] = entrada_busqueda.get().strip()
+            if estado["consulta"]:
+                mostrar(0)
+        
+        boton_anterior.config(command=lambda: mostrar(estado["pagina"] - 1))
+        boton_siguiente.config(command=lambda: mostrar(estado["pagina"] + 1))
+        tk.Button(frame_busqueda, text="Buscar", command=buscar).pack(side=tk.LEFT, padx=5)
+        entrada_busqueda.bind("<Return>", buscar)
+        entrada_busqueda.focus_set()
 
     def cerrar_sesion(self):
         self.window.destroy()
         self.master.deiconify()
 
+def benchmark_historias(filas=10_000_000, historias_por_paciente=20, consultas=2000):
+    # Carga historias de a tandas (20 por paciente, mezcladas como llegan en la
+    # realidad) y después de cada tanda mide obtener_historia para pacientes al
+    # azar. Con el índice (usuario_id, fecha) el costo depende de las filas del
+    # paciente, no del tamaño de la tabla: la latencia tiene que quedar plana.
+    import random
+    import tempfile
+    
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as carpeta:
+        db = Database(os.path.join(carpeta, 'benchmark.db'))
+        # La carga masiva va directo y sin fsync: lo que se mide son las lecturas
+        carga = sqlite3.connect(os.path.join(carpeta, 'benchmark.db'))
+        carga.execute('PRAGMA synchronous=OFF')
+        
+        cargadas = 0
+        for objetivo in (10_000, 100_000, 1_000_000, filas):
+            if objetivo > filas:
+                continue
+            pacientes = range(cargadas // historias_por_paciente, objetivo // historias_por_paciente)
+            nuevas = [p for p in pacientes for _ in range(historias_por_paciente)]
+            rng.shuffle(nuevas)
+            for inicio in range(0, len(nuevas), 500_000):
+                with carga:
+                    carga.executemany(
+                        'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)',
+                        ((p, 1_700_000_000 + i, 'Control', '')
+                         for i, p in enumerate(nuevas[inicio:inicio + 500_000], start=cargadas + inicio))
+                    )
+            cargadas = objetivo
+            
+            total_pacientes = objetivo // historias_por_paciente
+            tiempos = []
+            for _ in range(consultas):
+                usuario_id = rng.randrange(total_pacientes)
+                inicio = time.perf_counter()
+                db.obtener_historia(usuario_id)
+                tiempos.append(time.perf_counter() - inicio)
+            tiempos.sort()
+            print(
+                f"{objetivo:>11,} filas: media {sum(tiempos) / len(tiempos) * 1e6:7.1f} µs | "
+                f"p99 {tiempos[int(len(tiempos) * 0.99)] * 1e6:7.1f} µs"
+            )
+        
+        with db.pool.leer() as conn:
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT fecha, diagnostico, observaciones FROM historias WHERE usuario_id=? ORDER BY fecha DESC',
+                (0,)
+            ).fetchall()
+        print("Plan:", "; ".join(fila[-1] for fila in plan))
+        carga.close()
+        db.cerrar()
+
+def benchmark_escritura(filas=4000, clientes=8):
+    # Varios médicos guardando diagnósticos a la vez: un commit por fila (como
+    # antes) contra el GroupCommitWriter. Con synchronous=FULL cada commit paga
+    # un fsync, como en la base original; con NORMAL (el modo WAL que usa
+    # Database) el commit ya es barato y la diferencia es menor.
+    import tempfile
+    
+    for sincronizacion in ('FULL', 'NORMAL'):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, 'benchmark.db')
+            Database(ruta).cerrar()
+            conn = abrir_conexion(ruta, sincronizacion, check_same_thread=False)
+            escritor = GroupCommitWriter(ruta, sincronizacion=sincronizacion)
+            lock = threading.Lock()
+            sql = 'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)'
+            
+            def por_fila(cliente):
+                for i in range(filas // clientes):
+                    with lock:
+                        conn.execute(sql, (cliente, int(time.time()), 'Control', ''))
+                        conn.commit()
+            
+            def agrupado(cliente):
+                for i in range(filas // clientes):
+                    escritor.enviar(sql, (cliente, int(time.time()), 'Control', '')).result()
+            
+            for nombre, funcion in (("commit por fila", por_fila), ("group commit", agrupado)):
+                inicio = time.perf_counter()
+                hilos = [threading.Thread(target=funcion, args=(c,)) for c in range(clientes)]
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                duracion = time.perf_counter() - inicio
+                print(f"synchronous={sincronizacion:<6} {nombre:>16}: {filas / duracion:9,.0f} filas/s")
+            print(f"synchronous={sincronizacion:<6} {escritor.filas} filas en {escritor.lotes} transacciones")
+            escritor.cerrar()
+            conn.close()
+
+def benchmark_lecturas(filas=1_000_000, historias_por_paciente=20, consultas=4000):
+    # Varios paneles de médico leyendo historias a la vez, con un pool de una
+    # sola conexión (lo mismo que el cursor compartido de antes) y con varias.
+    # La mejora escala con los núcleos disponibles.
+    import random
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'benchmark.db')
+        Database(ruta).cerrar()
+        carga = sqlite3.connect(ruta)
+        carga.execute('PRAGMA synchronous=OFF')
+        with carga:
+            carga.executemany(
+                'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)',
+                ((i % (filas // historias_por_paciente), 1_700_000_000 + i,
+                  'Control de rutina sin novedades', 'Sin observaciones') for i in range(filas))
+            )
+        carga.close()
+        
+        for lectores in sorted({1, 4, LECTORES_POOL}):
+            db = Database(ruta, lectores)
+            for paneles in (1, 2, 4, 8):
+                def panel(semilla):
+                    rng = random.Random(semilla)
+                    for _ in range(consultas // paneles):
+                        db.obtener_historia(rng.randrange(filas // historias_por_paciente))
+                
+                hilos = [threading.Thread(target=panel, args=(i,)) for i in range(paneles)]
+                inicio = time.perf_counter()
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                duracion = time.perf_counter() - inicio
+                print(f"{lectores} lector(es), {paneles} paneles: {consultas / duracion:9,.0f} consultas/s")
+            estadisticas = db.pool.estadisticas()
+            print(
+                f"  préstamos {estadisticas['prestamos']}, esperas {estadisticas['esperas']} "
+                f"(media {estadisticas['espera_media_ms']:.2f} ms), máximo en uso {estadisticas['max_en_uso']}"
+            )
+            db.cerrar()
+
+def benchmark_busqueda(filas=2_000_000, repeticiones=20):
+    # Historias sintéticas armadas con un vocabulario clínico (las palabras
+    # raras aparecen en pocas filas, las comunes en casi todas). Compara la
+    # primera página de buscar_historias contra buscar con LIKE en toda la tabla.
+    import random
+    import tempfile
+    
+    comunes = ["control", "paciente", "refiere", "dolor", "evolución", "favorable", "tratamiento", "reposo"]
+    medias = ["neumonía", "bronquitis", "hipertensión", "diabetes", "gastritis", "migraña", "lumbalgia", "asma"]
+    raras = ["warfarina", "amiodarona", "sarcoidosis", "feocromocitoma", "tularemia"]
+    rng = random.Random(0)
+    
+    def nota():
+        palabras = rng.choices(comunes, k=6) + rng.choices(medias, k=2)
+        if rng.random() < 0.001:
+            palabras.append(rng.choice(raras))
+        rng.shuffle(palabras)
+        return " ".join(palabras)
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'benchmark.db')
+        db = Database(ruta)
+        carga = sqlite3.connect(ruta)
+        carga.execute('PRAGMA synchronous=OFF')
+        inicio = time.perf_counter()
+        for desde in range(0, filas, 200_000):
+            with carga:
+                carga.executemany(
+                    'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)',
+                    ((i % 100_000, 1_700_000_000 + i, nota(), nota()) for i in range(desde, min(filas, desde + 200_000)))
+                )
+        print(f"{filas:,} historias cargadas e indexadas en {time.perf_counter() - inicio:.1f} s")
+        
+        for texto in ("warfarina", "sarcoidosis warfarina", "neumonia", "neumonía asma", "neumon*", "control"):
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultados, _ = db.buscar_historias(texto)
+                tiempos.append(time.perf_counter() - inicio)
+            with db.pool.leer() as conn:
+                coincidencias = conn.execute(
+                    'SELECT count(*) FROM historias_fts WHERE historias_fts MATCH ?', (db._consulta_fts(texto),)
+                ).fetchone()[0]
+            print(f"FTS5 {texto!r:>24}: {sorted(tiempos)[len(tiempos) // 2] * 1000:8.2f} ms ({coincidencias:,} coincidencias)")
+        
+        with db.pool.leer() as conn:
+            inicio = time.perf_counter()
+            conn.execute(
+                'SELECT id FROM historias WHERE diagnostico LIKE ? OR observaciones LIKE ?',
+                ('%warfarina%', '%warfarina%')
+            ).fetchall()
+            print(f"LIKE {'warfarina'!r:>24}: {(time.perf_counter() - inicio) * 1000:8.2f} ms")
+        carga.close()
+        db.cerrar()
+
+def benchmark_paginas(filas=200_000):
+    # Un paciente crónico con muchas entradas: costo de pedir una página
+    # profunda por clave y con OFFSET, y memoria pico de recorrer la historia
+    # completa con iterar() contra traerla entera con fetchall().
+    import tempfile
+    import tracemalloc
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'benchmark.db')
+        db = Database(ruta)
+        carga = sqlite3.connect(ruta)
+        with carga:
+            carga.executemany(
+                'INSERT INTO historias (usuario_id, fecha, diagnostico, observaciones) VALUES (?, ?, ?, ?)',
+                ((1, 1_700_000_000 + i, 'Control de rutina sin novedades', 'Sin observaciones')
+                 for i in range(filas))
+            )
+        carga.close()
+        
+        profunda = filas - PAGINA_FILAS
+        clave = clave_de(db.pagina('historia', 1, por_pagina=profunda)[-1])
+        inicio = time.perf_counter()
+        db.pagina('historia', 1, clave)
+        print(f"Página en la fila {profunda:,} por clave:  {(time.perf_counter() - inicio) * 1000:8.2f} ms")
+        with db.pool.leer() as conn:
+            inicio = time.perf_counter()
+            conn.execute(
+                'SELECT fecha, diagnostico, observaciones FROM historias WHERE usuario_id=? ORDER BY fecha DESC LIMIT ? OFFSET ?',
+                (1, PAGINA_FILAS, profunda)
+            ).fetchall()
+            print(f"Página en la fila {profunda:,} con OFFSET: {(time.perf_counter() - inicio) * 1000:8.2f} ms")
+            
+            for nombre, recorrer in (
+                ("fetchall", lambda: conn.execute(
+                    'SELECT fecha, diagnostico, observaciones FROM historias WHERE usuario_id=? ORDER BY fecha DESC', (1,)
+                ).fetchall()),
+                ("iterar", lambda: sum(1 for _ in db.iterar('historia', 1)))
+            ):
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                recorrer()
+                duracion = time.perf_counter() - inicio
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{nombre:>8}: {duracion * 1000:8.1f} ms, memoria pico {pico / 1024:9,.0f} KB")
+        db.cerrar()
+
+def benchmark_agenda(filas=2_000_000, consultas=200):
+    # Turnos de dos años repartidos entre las especialidades: agenda de un día
+    # con turnos_del_dia (rango en idx_turnos_agenda) contra la misma consulta
+    # recorriendo la tabla, que es lo que hacía falta con las fechas en texto.
+    import random
+    import tempfile
+    
+    rng = random.Random(0)
+    inicio_periodo = a_epoch(date(2024, 1, 1))
+    dias = 730
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'benchmark.db')
+        db = Database(ruta)
+        carga = sqlite3.connect(ruta)
+        carga.execute('PRAGMA synchronous=OFF')
+        with carga:
+            carga.executemany(
+                'INSERT INTO turnos (usuario_id, fecha, especialidad, estado) VALUES (?, ?, ?, ?)',
+                ((rng.randrange(100_000), inicio_periodo + rng.randrange(dias * 86_400),
+                  rng.choice(ESPECIALIDADES), rng.choice(('pendiente', 'atendido', 'cancelado'))) for _ in range(filas))
+            )
+        carga.close()
+        
+        pedidos = [(rng.choice(ESPECIALIDADES), date(2024, 1, 1) + timedelta(days=rng.randrange(dias))) for _ in range(consultas)]
+        inicio = time.perf_counter()
+        total = sum(len(db.turnos_del_dia(especialidad, dia)) for especialidad, dia in pedidos)
+        duracion = (time.perf_counter() - inicio) / consultas
+        print(f"turnos_del_dia: {duracion * 1000:8.3f} ms por agenda ({total / consultas:.0f} turnos en promedio)")
+        
+        with db.pool.leer() as conn:
+            inicio = time.perf_counter()
+            for especialidad, dia in pedidos[:10]:
+                desde = a_epoch(dia)
+                conn.execute(
+                    'SELECT id, fecha, estado FROM turnos NOT INDEXED WHERE especialidad = ? AND fecha >= ? AND fecha < ? ORDER BY fecha',
+                    (especialidad, desde, desde + 86_400)
+                ).fetchall()
+            print(f"recorriendo la tabla: {(time.perf_counter() - inicio) / 10 * 1000:8.3f} ms por agenda")
+        db.cerrar()
+
+def benchmark_turnos(medicos_por_especialidad=5, ocupacion=0.7, dias=30, reservas=2000, pacientes=8):
+    # Agendas de lunes a viernes de 08:00 a 18:00 con turnos de 15 minutos,
+    # ocupadas al 70% durante el próximo mes. Mide proximos_libres con el
+    # motor en frío y en caliente, lo mismo releyendo los turnos de la base
+    # en cada pedido, y reservas concurrentes de varios pacientes peleando por
+    # las mismas franjas (al final no puede haber ningún turno repetido).
+    import random
+    import tempfile
+    
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'benchmark.db')
+        db = Database(ruta)
+        manana = date.today() + timedelta(days=1)
+        turnos = []
+        for especialidad in ESPECIALIDADES:
+            for n in range(medicos_por_especialidad):
+                medico_id = db.pool.escribir(
+                    "INSERT INTO usuarios (usuario, contraseña, tipo) VALUES (?, '', 'medico')", (f"{especialidad} {n}",)
+                ).result()
+                for dia_semana in range(5):
+                    db.agregar_agenda(medico_id, especialidad, dia_semana, "08:00", "18:00", 15)
+                for d in range(dias):
+                    dia = manana + timedelta(days=d)
+                    if dia.weekday() < 5:
+                        turnos += [
+                            (1, SlotEngine._inicio(dia, 480 + franja * 15), especialidad, medico_id)
+                            for franja in range(40) if rng.random() < ocupacion
+                        ]
+        carga = sqlite3.connect(ruta)
+        with carga:
+            carga.executemany('INSERT INTO turnos (usuario_id, fecha, especialidad, medico_id) VALUES (?, ?, ?, ?)', turnos)
+        carga.close()
+        desde = datetime.combine(manana, datetime.min.time())
+        print(f"{len(turnos):,} turnos ocupados en {len(ESPECIALIDADES) * medicos_por_especialidad} agendas")
+        
+        inicio = time.perf_counter()
+        for especialidad in ESPECIALIDADES:
+            db.agenda.proximos_libres(especialidad, desde=desde)
+        print(f"proximos_libres en frío:   {(time.perf_counter() - inicio) / len(ESPECIALIDADES) * 1000:8.3f} ms")
+        pedidos = [rng.choice(ESPECIALIDADES) for _ in range(5000)]
+        inicio = time.perf_counter()
+        for especialidad in pedidos:
+            db.agenda.proximos_libres(especialidad, desde=desde)
+        print(f"proximos_libres:           {(time.perf_counter() - inicio) / len(pedidos) * 1000:8.3f} ms")
+        
+        # Sin motor: releer los turnos del horizonte y buscar huecos en Python
+        inicio = time.perf_counter()
+        for especialidad in pedidos[:50]:
+            with db.pool.leer() as conn:
+                ocupados = set(conn.execute(
+                    "SELECT medico_id, fecha FROM turnos WHERE especialidad = ? AND fecha >= ? AND estado != 'cancelado'",
+                    (especialidad, a_epoch(desde))
+                ).fetchall())
+            libres = []
+            for d in range(AGENDA_HORIZONTE_DIAS):
+                dia = manana + timedelta(days=d)
+                for bloque in db.agenda._bloques[especialidad].get(dia.weekday(), ()):
+                    for franja in range((bloque.hasta - bloque.desde) // bloque.duracion):
+                        fecha = SlotEngine._inicio(dia, bloque.desde + franja * bloque.duracion)
+                        if (bloque.medico_id, fecha) not in ocupados:
+                            libres.append((fecha, bloque.medico_id))
+                if len(libres) >= AGENDA_PROXIMOS:
+                    break
+            sorted(libres)[:AGENDA_PROXIMOS]
+        print(f"releyendo turnos:          {(time.perf_counter() - inicio) / 50 * 1000:8.3f} ms")
+        
+        hechas = []
+        rechazos = []
+        
+        def paciente():
+            while len(hechas) < reservas:
+                especialidad = rng.choice(ESPECIALIDADES[:2])
+                libres = db.agenda.proximos_libres(especialidad, 1, desde)
+                if not libres:
+                    return
+                try:
+                    hechas.append(db.reservar_turno(2, especialidad, libres[0][0], libres[0][1]).result())
+                except ValueError:
+                    rechazos.append(1)
+        
+        hilos = [threading.Thread(target=paciente) for _ in range(pacientes)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        with db.pool.leer() as conn:
+            repetidos = conn.execute(
+                "SELECT count(*) FROM (SELECT 1 FROM turnos WHERE estado != 'cancelado' GROUP BY medico_id, fecha HAVING count(*) > 1)"
+            ).fetchone()[0]
+        print(
+            f"{len(hechas):,} reservas concurrentes ({pacientes} pacientes): {len(hechas) / duracion:,.0f}/s, "
+            f"{len(rechazos)} franjas ya tomadas, {repetidos} turnos repetidos"
+        )
+        db.cerrar()
+
 def main():
     db = Database()
     
@@ -422,4 +1799,19 @@ def main():
         db.cerrar()
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark-historias" in sys.argv:
+        benchmark_historias()
+    elif "--benchmark-escritura" in sys.argv:
+        benchmark_escritura()
+    elif "--benchmark-lecturas" in sys.argv:
+        benchmark_lecturas()
+    elif "--benchmark-busqueda" in sys.argv:
+        benchmark_busqueda()
+    elif "--benchmark-paginas" in sys.argv:
+        benchmark_paginas()
+    elif "--benchmark-agenda" in sys.argv:
+        benchmark_agenda()
+    elif "--benchmark-turnos" in sys.argv:
+        benchmark_turnos()
+    else:
+        main()
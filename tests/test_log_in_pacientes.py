@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+RUTA = os.path.join(os.path.dirname(__file__), "..", "releases", "log in pacientes.py")
+
+def cargar_modulo():
+    spec = importlib.util.spec_from_file_location("log_in_pacientes", RUTA)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+lp = cargar_modulo()
+
+class GroupCommitWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, "base.db")
+        conn = lp.abrir_conexion(self.ruta)
+        conn.execute("CREATE TABLE filas (id INTEGER PRIMARY KEY, valor TEXT NOT NULL)")
+        conn.commit()
+        conn.close()
+        self.espera = lp.ESPERA_BLOQUEO_SEGUNDOS
+        lp.ESPERA_BLOQUEO_SEGUNDOS = 0.1
+        self.escritor = lp.GroupCommitWriter(self.ruta)
+    
+    def tearDown(self):
+        self.escritor.cerrar()
+        lp.ESPERA_BLOQUEO_SEGUNDOS = self.espera
+        self.directorio.cleanup()
+    
+    def test_devuelve_el_id_de_cada_fila(self):
+        futuros = [self.escritor.enviar("INSERT INTO filas (valor) VALUES (?)", (str(i),)) for i in range(20)]
+        self.assertEqual(sorted(f.result(timeout=5) for f in futuros), list(range(1, 21)))
+    
+    def test_error_de_una_sentencia_no_afecta_al_lote(self):
+        bien = self.escritor.enviar("INSERT INTO filas (valor) VALUES (?)", ("a",))
+        mal = self.escritor.enviar("INSERT INTO filas (valor) VALUES (?)", (None,))
+        self.assertEqual(bien.result(timeout=5), 1)
+        self.assertIsInstance(mal.exception(timeout=5), sqlite3.IntegrityError)
+    
+    def test_base_bloqueada_por_otra_conexion(self):
+        # Otra conexión tiene el lock de escritura: el lote falla con "database
+        # is locked", pero el hilo escritor sigue vivo y atiende lo siguiente
+        otra = sqlite3.connect(self.ruta, timeout=0, isolation_level=None)
+        otra.execute("BEGIN IMMEDIATE")
+        bloqueado = self.escritor.enviar("INSERT INTO filas (valor) VALUES (?)", ("bloqueado",))
+        self.assertIsInstance(bloqueado.exception(timeout=5), sqlite3.OperationalError)
+        otra.execute("ROLLBACK")
+        otra.close()
+        
+        self.assertTrue(self.escritor.hilo.is_alive())
+        siguiente = self.escritor.enviar("INSERT INTO filas (valor) VALUES (?)", ("despues",))
+        try:
+            fila_id = siguiente.result(timeout=5)
+        except FutureTimeoutError:
+            self.fail("El escritor dejó de atender la cola después del error")
+        self.assertEqual(fila_id, 1)
+
+class MigracionFechasTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, "base.db")
+        # Base con el esquema viejo (fechas como texto), antes de migrar_fechas
+        with mock.patch.object(lp, "MIGRACIONES", lp.MIGRACIONES[:3]), \
+                mock.patch.object(lp, "SlotEngine", lambda db: None):
+            db = lp.Database(self.ruta)
+            escribir = db.pool.escritor.enviar
+            escribir("INSERT INTO usuarios (usuario, contraseña) VALUES ('ana', '1')", ()).result()
+            for fecha in ("15/03/2024", "mañana"):
+                escribir("INSERT INTO turnos (usuario_id, fecha, especialidad) VALUES (1, ?, 'Cardiología')",
+                         (fecha,)).result()
+            db.cerrar()
+        self.db = lp.Database(self.ruta)
+    
+    def tearDown(self):
+        self.db.cerrar()
+        self.directorio.cleanup()
+    
+    def test_convierte_fechas_a_epoch(self):
+        with self.db.pool.leer() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            tipos = conn.execute("SELECT DISTINCT typeof(fecha) FROM turnos").fetchall()
+        self.assertEqual(version, len(lp.MIGRACIONES))
+        self.assertEqual(tipos, [("integer",)])
+        turnos = self.db.obtener_turnos(1)
+        self.assertEqual(turnos[-1][0], lp.a_epoch("15/03/2024"))
+    
+    def test_fecha_invalida_muestra_el_texto_original(self):
+        fecha, especialidad, estado, original = self.db.obtener_turnos(1)[0]
+        self.assertEqual((fecha, original), (0, "mañana"))
+        self.assertEqual(lp.formatear_fecha(fecha, original=original), "mañana (fecha inválida)")
+        self.assertIsNone(self.db.obtener_turnos(1)[1][3])
+
+class SlotEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.db = lp.Database(os.path.join(self.directorio.name, "base.db"))
+        for usuario in ("drA", "drB", "pac"):
+            self.db.registrar_usuario(usuario, "1", "medico" if usuario.startswith("dr") else "paciente")
+        self.medico_a, self.medico_b, self.paciente = [
+            self.db.validar_usuario(usuario, "1")[0] for usuario in ("drA", "drB", "pac")
+        ]
+        self.db.agregar_agenda(self.medico_a, "Cardiología", 0, "08:00", "09:00", 20)
+        hoy = date.today()
+        self.lunes = hoy + timedelta(days=7 - hoy.weekday())
+    
+    def tearDown(self):
+        self.db.cerrar()
+        self.directorio.cleanup()
+    
+    def a_las(self, hora, minutos=0, dias=0):
+        return datetime.combine(self.lunes + timedelta(days=dias), time(hora, minutos))
+    
+    def test_reserva_ocupa_la_franja(self):
+        self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8)).result(timeout=5)
+        with self.assertRaisesRegex(ValueError, "ya no está disponible"):
+            self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8))
+        libres = self.db.agenda.proximos_libres("Cardiología", 2, self.a_las(0))
+        self.assertEqual([inicio for inicio, _, _ in libres], [lp.a_epoch(self.a_las(8, 20)), lp.a_epoch(self.a_las(8, 40))])
+    
+    def test_reservas_simultaneas_toman_una_sola_franja(self):
+        resultados = []
+        def reservar():
+            try:
+                resultados.append(self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8, 40)).result(timeout=5))
+            except ValueError:
+                resultados.append(None)
+        hilos = [threading.Thread(target=reservar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(sum(resultado is not None for resultado in resultados), 1)
+    
+    def test_medico_o_agenda_desconocidos(self):
+        with self.assertRaisesRegex(ValueError, "El médico no tiene agenda"):
+            self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8), self.medico_b)
+        with self.assertRaisesRegex(ValueError, "No hay agenda de Cardiología"):
+            self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8, dias=1))
+        with self.assertRaisesRegex(ValueError, "no corresponde a ninguna franja"):
+            self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8, 5))
+    
+    def test_cancelar_libera_la_franja(self):
+        turno_id = self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8)).result(timeout=5)
+        self.db.cancelar_turno(turno_id).result(timeout=5)
+        self.db.reservar_turno(self.paciente, "Cardiología", self.a_las(8)).result(timeout=5)
+    
+    def test_descarta_bitmaps_de_dias_pasados(self):
+        agenda = self.db.agenda
+        bloque = agenda.bloques_de(self.medico_a)[0]
+        ayer = date.today() - timedelta(days=1)
+        agenda._hoy = ayer.toordinal()
+        agenda._ocupados[(bloque.id, ayer.toordinal())] = 1
+        agenda.proximos_libres("Cardiología", 1, self.a_las(0))
+        self.assertNotIn((bloque.id, ayer.toordinal()), agenda._ocupados)
+        self.assertIn((bloque.id, self.lunes.toordinal()), agenda._ocupados)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+RUTA = os.path.join(os.path.dirname(__file__), "..", "proyecto 1.2.py")
+
+def cargar_modulo():
+    spec = importlib.util.spec_from_file_location("proyecto", RUTA)
+    modulo = importlib.util.module_from_spec(spec)
+    # dataclasses busca el módulo en sys.modules
+    sys.modules[spec.name] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+proyecto = cargar_modulo()
+PriorityLevel = proyecto.PriorityLevel
+BASE = datetime(2024, 3, 15, 8, 0)
+
+def turno(numero, prioridad=PriorityLevel.REGULAR, segundos=None, especialidad=proyecto.GENERAL_SPECIALTY):
+    return proyecto.MedicalTurn(
+        f"paciente{numero:04d}", f"Paciente {numero}", prioridad,
+        timestamp=BASE + timedelta(seconds=numero if segundos is None else segundos),
+        specialty=especialidad
+    )
+
+def ids(filas):
+    return [fila["patient_id"] for fila in filas]
+
+class HospitalQueueTest(unittest.TestCase):
+    def assertIndices(self, cola):
+        # _positions apunta a cada entrada del heap y el heap está ordenado
+        self.assertEqual(len(cola._positions), len(cola._queue))
+        for posicion, entrada in enumerate(cola._queue):
+            self.assertEqual(cola._positions[entrada[1].patient_id], posicion)
+            if posicion:
+                self.assertLessEqual(cola._queue[(posicion - 1) // 2][0], entrada[0])
+    
+    def test_orden_por_prioridad_y_llegada(self):
+        cola = proyecto.HospitalQueue(policy=proyecto.StrictPriorityPolicy())
+        cola.add_patient(turno(1, PriorityLevel.REGULAR))
+        cola.add_patient(turno(2, PriorityLevel.CRITICAL))
+        cola.add_patient(turno(3, PriorityLevel.URGENT))
+        cola.add_patient(turno(4, PriorityLevel.CRITICAL))
+        self.assertEqual(ids(cola.get_queue_status()), ["paciente0002", "paciente0004", "paciente0003", "paciente0001"])
+        self.assertEqual(cola.next_patient().patient_id, "paciente0002")
+        self.assertEqual(cola.position_of("paciente0001"), 2)
+    
+    def test_posiciones_tras_operaciones_aleatorias(self):
+        azar = random.Random(7)
+        cola = proyecto.HospitalQueue()
+        en_cola = set()
+        for numero in range(400):
+            cola.add_patient(turno(numero, azar.choice(list(PriorityLevel))))
+            en_cola.add(f"paciente{numero:04d}")
+            operacion = azar.random()
+            if operacion < 0.2:
+                en_cola.discard(cola.next_patient().patient_id)
+            elif operacion < 0.35:
+                elegido = azar.choice(sorted(en_cola))
+                self.assertTrue(cola.cancel_turn(elegido))
+                en_cola.discard(elegido)
+            elif operacion < 0.5:
+                self.assertTrue(cola.update_priority(azar.choice(sorted(en_cola)), azar.choice(list(PriorityLevel))))
+        self.assertIndices(cola)
+        self.assertEqual(set(ids(cola.get_queue_status())), en_cola)
+        self.assertEqual(len(cola), len(en_cola))
+    
+    def test_alta_masiva_mantiene_indices(self):
+        cola = proyecto.HospitalQueue()
+        cola.add_patient(turno(0, PriorityLevel.URGENT))
+        cola.add_patients(turno(numero, PriorityLevel(numero % 3 + 1)) for numero in range(1, 200))
+        self.assertIndices(cola)
+        with self.assertRaises(ValueError):
+            cola.add_patients([turno(500), turno(0)])
+        self.assertEqual(len(cola), 200)
+    
+    def test_cancelar_turno(self):
+        cola = proyecto.HospitalQueue()
+        primero, segundo = turno(1), turno(2)
+        cola.add_patient(primero)
+        cola.add_patient(segundo)
+        self.assertTrue(cola.cancel_turn("paciente0001"))
+        self.assertFalse(cola.cancel_turn("paciente0001"))
+        self.assertEqual(primero.status, proyecto.PatientStatus.CANCELLED)
+        self.assertIsNone(cola.patient_status("paciente0001"))
+        self.assertEqual(cola.next_patient(), segundo)
+        self.assertIsNone(cola.next_patient())
+    
+    def test_reclasificar(self):
+        cola = proyecto.HospitalQueue(policy=proyecto.StrictPriorityPolicy())
+        for numero in range(1, 4):
+            cola.add_patient(turno(numero))
+        self.assertTrue(cola.update_priority("paciente0003", PriorityLevel.CRITICAL))
+        self.assertEqual(ids(cola.get_queue_status()), ["paciente0003", "paciente0001", "paciente0002"])
+        self.assertFalse(cola.update_priority("paciente9999", PriorityLevel.URGENT))
+        with self.assertRaises(ValueError):
+            cola.update_priority("paciente0001", 1)
+        self.assertIndices(cola)
+    
+    def test_duplicado(self):
+        cola = proyecto.HospitalQueue()
+        cola.add_patient(turno(1))
+        with self.assertRaisesRegex(ValueError, "ya en cola"):
+            cola.add_patient(turno(1))
+
+class QueueJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.wal = os.path.join(self.directorio.name, "cola.wal")
+        self.snapshot = os.path.join(self.directorio.name, "cola.snap")
+        self.journales = []
+    
+    def tearDown(self):
+        for journal in self.journales:
+            journal.close()
+        self.directorio.cleanup()
+    
+    def journal(self, **opciones):
+        journal = proyecto.QueueJournal(self.wal, self.snapshot, **opciones)
+        self.journales.append(journal)
+        return journal
+    
+    def cargar_cola(self, azar, cola):
+        for numero in range(300):
+            cola.add_patient(turno(numero, azar.choice(list(PriorityLevel))))
+            if numero % 7 == 0:
+                cola.next_patient()
+            if numero % 11 == 0:
+                cola.cancel_turn(f"paciente{numero - 3:04d}")
+        for numero in azar.sample(range(300), 30):
+            cola.update_priority(f"paciente{numero:04d}", azar.choice(list(PriorityLevel)))
+    
+    def recuperar(self, cola, politica):
+        cola.journal.durable().result(timeout=5)
+        cola.journal.close()
+        self.journales.remove(cola.journal)
+        return proyecto.HospitalQueue.recover(self.journal(), politica())
+    
+    def test_recupera_el_orden_desde_el_wal(self):
+        for politica in (proyecto.StrictPriorityPolicy, proyecto.WeightedFairPolicy):
+            with self.subTest(politica=politica.name):
+                for archivo in (self.wal, self.snapshot):
+                    if os.path.exists(archivo):
+                        os.remove(archivo)
+                cola = proyecto.HospitalQueue.recover(self.journal(snapshot_every=10 ** 9), politica())
+                self.cargar_cola(random.Random(3), cola)
+                antes = ids(cola.get_queue_status())
+                claves = sorted(entrada[0] for entrada in cola._queue)
+                
+                recuperada = self.recuperar(cola, politica)
+                self.assertEqual(ids(recuperada.get_queue_status()), antes)
+                self.assertEqual(sorted(entrada[0] for entrada in recuperada._queue), claves)
+                for _ in range(50):
+                    self.assertEqual(recuperada.next_patient(), cola.next_patient())
+    
+    def test_recupera_snapshot_mas_wal(self):
+        cola = proyecto.HospitalQueue.recover(self.journal(snapshot_every=50), proyecto.WeightedFairPolicy())
+        self.cargar_cola(random.Random(5), cola)
+        self.assertTrue(os.path.getsize(self.snapshot))
+        antes = ids(cola.get_queue_status())
+        recuperada = self.recuperar(cola, proyecto.WeightedFairPolicy)
+        self.assertEqual(ids(recuperada.get_queue_status()), antes)
+    
+    def test_descarta_registro_incompleto(self):
+        cola = proyecto.HospitalQueue.recover(self.journal())
+        cola.add_patient(turno(1))
+        cola.add_patient(turno(2))
+        cola.journal.durable().result(timeout=5)
+        cola.journal.close()
+        self.journales.remove(cola.journal)
+        with open(self.wal, "r+b") as f:
+            f.truncate(os.path.getsize(self.wal) - 3)
+        
+        recuperada = proyecto.HospitalQueue.recover(self.journal())
+        self.assertEqual(ids(recuperada.get_queue_status()), ["paciente0001"])
+        # Lo que se agrega después no queda detrás del registro roto
+        recuperada.add_patient(turno(3))
+        recuperada = self.recuperar(recuperada, proyecto.StrictPriorityPolicy)
+        self.assertEqual(ids(recuperada.get_queue_status()), ["paciente0001", "paciente0003"])
+    
+    def test_lee_registros_sin_clave(self):
+        journal = self.journal()
+        journal.load()
+        for numero, prioridad in ((1, PriorityLevel.REGULAR), (2, PriorityLevel.URGENT)):
+            journal._append(journal.OP_ADD, journal._encode_add(turno(numero, prioridad)))
+        journal._append(journal.OP_PRIORITY, bytes([PriorityLevel.CRITICAL.value]) + b"paciente0001")
+        journal.durable().result(timeout=5)
+        journal.close()
+        self.journales.remove(journal)
+        
+        cola = proyecto.HospitalQueue.recover(self.journal(), proyecto.StrictPriorityPolicy())
+        self.assertEqual(ids(cola.get_queue_status()), ["paciente0001", "paciente0002"])
+        self.assertEqual(cola.get_queue_status()[0]["priority"], "CRITICAL")
+
+class SpecialtyDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.wal = os.path.join(self.directorio.name, "cola.wal")
+        self.snapshot = os.path.join(self.directorio.name, "cola.snap")
+    
+    def tearDown(self):
+        self.directorio.cleanup()
+    
+    def test_recupera_el_orden_global(self):
+        azar = random.Random(11)
+        especialidades = list(proyecto.SPECIALTIES)
+        journal = proyecto.QueueJournal(self.wal, self.snapshot, snapshot_every=120)
+        journal.load()
+        despachador = proyecto.SpecialtyDispatcher(journal, policy="wfq")
+        for numero in range(300):
+            despachador.add_patient(turno(numero, azar.choice(list(PriorityLevel)), especialidad=azar.choice(especialidades)))
+            if numero % 5 == 0:
+                despachador.next_patient(azar.choice(especialidades))
+        for numero in azar.sample(range(300), 30):
+            despachador.update_priority(f"paciente{numero:04d}", azar.choice(list(PriorityLevel)))
+        antes = ids(despachador.get_queue_status())
+        journal.durable().result(timeout=5)
+        journal.close()
+        
+        journal = proyecto.QueueJournal(self.wal, self.snapshot)
+        try:
+            recuperado = proyecto.SpecialtyDispatcher.recover(journal, policy="wfq")
+            self.assertEqual(ids(recuperado.get_queue_status()), antes)
+            self.assertEqual(len(recuperado), len(antes))
+        finally:
+            journal.close()
+    
+    def test_alta_masiva_es_todo_o_nada(self):
+        despachador = proyecto.SpecialtyDispatcher()
+        especialidades = list(proyecto.SPECIALTIES)
+        despachador.add_patient(turno(5, especialidad=especialidades[1]))
+        lote = [turno(numero, especialidad=especialidades[numero % 2]) for numero in range(4, 8)]
+        with self.assertRaisesRegex(ValueError, "paciente0005"):
+            despachador.add_patients(lote)
+        self.assertEqual(len(despachador), 1)
+        self.assertEqual(sum(despachador.sizes().values()), 1)
+
+class ConcurrentHospitalQueueTest(unittest.TestCase):
+    def test_miembros_consistentes_con_el_heap(self):
+        cola = proyecto.ConcurrentHospitalQueue()
+        errores = []
+    
+        def trabajar(desde):
+            try:
+                for numero in range(desde, desde + 200):
+                    cola.add_patient(turno(numero))
+                    if numero % 3 == 0:
+                        atendido = cola.next_patient()
+                        # Volver a encolar al que se acaba de atender no es un duplicado
+                        if atendido is not None:
+                            cola.add_patient(turno(int(atendido.patient_id[-4:]), segundos=numero + 10000))
+                    if numero % 5 == 0:
+                        cola.cancel_turn(f"paciente{numero:04d}")
+            except Exception as e:
+                errores.append(e)
+        
+        hilos = [threading.Thread(target=trabajar, args=(desde,)) for desde in range(0, 1600, 200)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertEqual(set(cola._members), set(cola._positions))
+
+if __name__ == "__main__":
+    unittest.main()